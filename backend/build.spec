@@ -27,7 +27,10 @@ a = Analysis(
         'python-multipart',
         'docx',
         'openpyxl',
+        'python_calamine',
         'PyPDF2',
+        'pypdfium2',
+        'file_extractor',
     ],
     hookspath=[],
     hooksconfig={},
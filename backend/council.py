@@ -4,20 +4,235 @@
 """
 
 import asyncio
+import io
 import logging
+import math
 import re
+import statistics
 from typing import List, Dict, Any, Optional, Tuple
-from datetime import datetime
 
-from llm_client import query_model, query_models_parallel
-from models import Stage1Result, Stage2Result, Stage3Result, Attachment
+from llm_client import (
+    query_model,
+    query_models_parallel,
+    get_shared_client,
+    get_backoff_time,
+    post_with_deadline,
+    extract_openai_content,
+    get_content_extractor,
+    get_api_model_name,
+    parse_json_response
+)
+from models import Stage1Result, Stage2Result, Stage3Result, Attachment, get_iso_timestamp
+from llm_cache import llm_cache, is_cacheable_result
+from log_context import get_meeting_logger
 
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
-logger = logging.getLogger(__name__)
+logger = get_meeting_logger(__name__)
+
+# 常见的 LaTeX 数学命令和符号
+_MATH_INDICATORS = [
+    # LaTeX 命令
+    r'\\boxed', r'\\frac', r'\\sqrt', r'\\sum', r'\\int', r'\\prod',
+    r'\\lim', r'\\exp', r'\\log', r'\\sin', r'\\cos', r'\\tan',
+    r'\\alpha', r'\\beta', r'\\gamma', r'\\delta', r'\\epsilon',
+    r'\\theta', r'\\lambda', r'\\mu', r'\\pi', r'\\sigma', r'\\omega',
+    # 关系符号
+    r'\\le', r'\\ge', r'\\leq', r'\\geq', r'\\ne', r'\\approx',
+    r'\\in', r'\\notin', r'\\subset', r'\\supset', r'\\to', r'\\rightarrow',
+    # 括号和修饰
+    r'\\left', r'\\right', r'\\bigl', r'\\bigr', r'\\Bigl', r'\\Bigr',
+    # 其他
+    r'\\tag', r'\\qquad', r'\\quad', r'\\forall', r'\\exists',
+    r'\\mathbb', r'\\mathcal', r'\\mathrm',
+    # 上下标（简单检测）
+    r'\^', r'_'
+]
+# 合并为单个交替模式，一次扫描即可判断是否包含任意指示符
+_RE_MATH_INDICATORS = re.compile('|'.join(_MATH_INDICATORS))
+
+# 数学运算符集合
+_MATH_OPS = frozenset('+-*/=<>|')
+
+# 各阶段的输出 token 上限，避免个别模型输出过长拖慢整个会议
+STAGE1_MAX_OUTPUT_TOKENS = 4096  # Stage 1 回答
+STAGE2_MAX_OUTPUT_TOKENS = 1024  # Stage 2 打分(每个编号一行简短评价)
+STAGE3_MAX_OUTPUT_TOKENS = 4096  # Stage 3 主席综合
+
+# 掉队判定：剩余任务耗时超过已完成任务耗时中位数的该倍数时视为掉队
+DEFAULT_STRAGGLER_MULTIPLIER = 1.5
+
+# 打分解析使用的正则（模块加载时预编译）
+# 模式 1: "#1: 8分" 或 "#1: 8"
+_RE_SCORE_COLON = re.compile(r'#?(\d+)\s*[:：]\s*(\d+(?:\.\d+)?)\s*分?')
+# 模式 2: "#1=8" 或 "#1 = 8"
+_RE_SCORE_EQ = re.compile(r'#?(\d+)\s*=\s*(\d+(?:\.\d+)?)')
+
+# Stage 1 提示词中的固定部分（格式规范），模块加载时拼接一次；council_streaming 共用同一份
+STAGE1_SYSTEM_PROMPT = "\n".join([
+    "你是一个专业的AI助手。请根据以下信息回答用户的问题。",
+    "\n" + "="*60,
+    "⚠️ 关键警告：Mermaid 流程图中绝对禁止使用任何数学符号！",
+    "="*60,
+    "",
+    "如果你在 Mermaid 流程图的节点中使用了以下任何内容，流程图将无法渲染：",
+    "  • $...$ 或 $$...$$ 包裹",
+    "  • 数学符号：= + - * / ^ | < > ≤ ≥",
+    "  • 括号：( ) { } [ ]",
+    "  • 任何标点符号",
+    "",
+    "正确做法：在 Mermaid 中只用纯文字描述，数学公式写在流程图外面！",
+    "="*60,
+    "",
+    "\n【数学公式格式规范 - 必须严格遵守】",
+    "在回答中使用数学公式时，必须使用以下标准格式：",
+    "",
+    "✅ 正确格式：",
+    "  • 行内公式：$f(x) = x^2$",
+    "  • 块级公式（独立成行）：",
+    "    $$",
+    "    f(x) = \\int_{0}^{\\infty} e^{-x^2} dx",
+    "    $$",
+    "",
+    "❌ 错误格式（禁止使用）：",
+    "  • 不要使用 \\[...\\] 格式",
+    "  • 不要使用 \\(...\\) 格式",
+    "  • 不要使用 [...] 格式",
+    "  • 不要使用 (f) 这种括号表示变量",
+    "",
+    "示例对比：",
+    "  ❌ 错误：设 (f) 为整函数，满足 [|f(z)| \\le e^{|z|^{3/2}}]",
+    "  ✅ 正确：设 $f$ 为整函数，满足 $$|f(z)| \\le e^{|z|^{3/2}}$$",
+    "",
+    "支持的 LaTeX 命令：\\frac、\\sqrt、\\sum、\\int、\\prod、\\lim、\\sin、\\cos、\\exp、\\log、\\alpha、\\beta、\\pi、\\theta、\\le、\\ge、\\in、\\to 等",
+    "",
+    "\n【其他富文本格式】",
+    "1. **表格**：使用 Markdown 表格语法 (| 列1 | 列2 |)",
+    "   - 表格中的数学公式必须使用行内格式 $...$",
+    "   - 如果公式包含竖线 |（绝对值），必须转义为 \\| 或使用 \\vert",
+    "   - 示例：$\\vert x \\vert$ 或 $\\|x\\|$",
+    "2. **代码块**：使用 ```语言名 代码 ``` 格式，支持语法高亮（如 ```python, ```javascript 等）",
+    "3. **流程图 Mermaid**：使用 ```mermaid 图表代码 ``` 格式",
+    "   支持的图表类型：flowchart、sequenceDiagram、classDiagram、stateDiagram、erDiagram、gantt 等",
+    "   ",
+    "   【Mermaid 语法规范 - 必须严格遵守】：",
+    "   a) 节点文本规范：",
+    "      - 使用方括号 [] 包裹节点文本，如：A[开始]",
+    "      - 节点文本必须简短（建议不超过15个字符）",
+    "      - 只能使用：汉字、英文字母、数字、空格",
+    "      ",
+    "   b) 严格禁止的内容：",
+    "      ❌ 不能使用 $...$ 或 $$...$$ 包裹文本",
+    "      ❌ 不能使用数学符号：| = < > ≤ ≥ ∈ ∀ π ^ 等",
+    "      ❌ 不能使用括号：( ) { } [ ]",
+    "      ❌ 不能使用标点符号：: ; , . ! ?",
+    "      ❌ 不能使用特殊字符：& \" ' * # @ 等",
+    "      ",
+    "   c) 连接线文本规范：",
+    "      - 使用竖线包裹，如：A -->|是| B",
+    "      - 文本必须极简（建议不超过5个字符）",
+    "      - 避免使用任何标点符号",
+    "   ",
+    "   d) 决策节点规范：",
+    "      - 使用花括号，如：B{是否通过}",
+    "      - 问题描述要简短明确",
+    "   ",
+    "   e) 正确示例：",
+    "      ```mermaid",
+    "      flowchart TD",
+    "          A[收到告警] --> B{包含关键词}",
+    "          B -->|端口告警| C[端口流量告警]",
+    "          B -->|NQA| D[NQA告警]",
+    "          C --> E[提取端口描述]",
+    "          E --> F[反查专线号]",
+    "      ```",
+    "   ",
+    "   f) 错误示例（禁止）：",
+    "      ❌ A$$选取因子 Φ_m$$ → 包含 $$",
+    "      ❌ B[g(n)=0] → 包含括号和等号",
+    "      ❌ C[|f(z)|≤exp] → 包含竖线和数学符号",
+    "      ❌ B{告警内容是否包含\"端口\"?} → 包含引号",
+    "      ❌ D -->|是: 匹配成功| E → 包含冒号",
+    "   ",
+    "   g) 如需表达数学内容：",
+    "      - 在流程图中用简短文字描述",
+    "      - 详细的数学公式写在流程图外面",
+    "   ",
+    "4. **其他 Markdown**：支持标题、列表、引用、粗体、斜体、链接等标准 Markdown 语法",
+    "\n请充分利用这些格式来提供更清晰、更专业的回答。",
+])
+STAGE1_SYSTEM_MESSAGE = {"role": "system", "content": STAGE1_SYSTEM_PROMPT}
+
+
+def _replace_delimited(text: str, open_mark: str, close_mark: str, left: str, right: str) -> str:
+    """
+    将 open_mark ... close_mark 替换为 left ... right
+    
+    结果与非贪婪正则 open(.*?)close (DOTALL) 相同，但用 str.find 线性扫描：
+    某个起始标记之后找不到结束标记时，后面的起始标记也不可能闭合，直接结束，
+    不会像正则那样对每个未闭合的起始标记都扫描到文本末尾（O(n²)）
+    """
+    parts = []
+    pos = 0
+    open_len = len(open_mark)
+    close_len = len(close_mark)
+    while True:
+        start = text.find(open_mark, pos)
+        if start == -1:
+            break
+        end = text.find(close_mark, start + open_len)
+        if end == -1:
+            break
+        parts.append(text[pos:start])
+        parts.append(left)
+        parts.append(text[start + open_len:end])
+        parts.append(right)
+        pos = end + close_len
+    
+    if not parts:
+        return text
+    parts.append(text[pos:])
+    return ''.join(parts)
+
+
+def _iter_bracket_spans(text: str):
+    """
+    线性扫描所有 [ ... ] 片段，等价于正则 (?<!`)\\[\\s*(.*?)\\s*\\](?!\\()（DOTALL）
+    
+    - 排除代码块中的（前一个字符是 `）
+    - 排除 Markdown 链接（] 后紧跟 (）
+    
+    Yields:
+        (起始位置, 结束位置(不含), 去掉首尾空白的内容)
+    """
+    pos = 0
+    close = -1  # 当前已知的下一个有效 ]（不跟 ( 的 ]）位置
+    while True:
+        start = text.find('[', pos)
+        if start == -1:
+            return
+        if start > 0 and text[start - 1] == '`':
+            pos = start + 1
+            continue
+        
+        # 有效 ] 的位置随起点单调递增，上次找到的仍在起点之后时可直接复用
+        if close <= start:
+            close = text.find(']', start + 1)
+            while close != -1 and text.startswith('(', close + 1):
+                close = text.find(']', close + 1)
+            if close == -1:
+                return
+        
+        yield start, close + 1, text[start + 1:close].strip()
+        pos = close + 1
+
+
+def _needs_latex_convert(text: str) -> bool:
+    """判断文本是否包含需要转换的公式标记（\\[ 包含 [，因此只需检查 [ 和 \\(）"""
+    return '[' in text or '\\(' in text
 
 
 def convert_latex_format(text: str) -> str:
@@ -38,33 +253,24 @@ def convert_latex_format(text: str) -> str:
     if not text:
         return text
     
+    # 快速路径：不包含任何公式标记时直接返回，跳过所有正则扫描
+    if not _needs_latex_convert(text):
+        return text
+    
     original_text = text  # 保存原始文本用于调试
     
     # 转换 \[ ... \] 为 $$ ... $$
-    text = re.sub(r'\\\[(.*?)\\\]', r'$$\1$$', text, flags=re.DOTALL)
+    if '\\[' in text:
+        text = _replace_delimited(text, '\\[', '\\]', '$$', '$$')
     
     # 转换 \( ... \) 为 $ ... $
-    text = re.sub(r'\\\((.*?)\\\)', r'$\1$', text, flags=re.DOTALL)
+    if '\\(' in text:
+        text = _replace_delimited(text, '\\(', '\\)', '$', '$')
     
     # 转换单独行的 [ ... ] 为 $$ ... $$（更智能的检测）
-    # 常见的 LaTeX 数学命令和符号
-    math_indicators = [
-        # LaTeX 命令
-        r'\\boxed', r'\\frac', r'\\sqrt', r'\\sum', r'\\int', r'\\prod',
-        r'\\lim', r'\\exp', r'\\log', r'\\sin', r'\\cos', r'\\tan',
-        r'\\alpha', r'\\beta', r'\\gamma', r'\\delta', r'\\epsilon',
-        r'\\theta', r'\\lambda', r'\\mu', r'\\pi', r'\\sigma', r'\\omega',
-        # 关系符号
-        r'\\le', r'\\ge', r'\\leq', r'\\geq', r'\\ne', r'\\approx',
-        r'\\in', r'\\notin', r'\\subset', r'\\supset', r'\\to', r'\\rightarrow',
-        # 括号和修饰
-        r'\\left', r'\\right', r'\\bigl', r'\\bigr', r'\\Bigl', r'\\Bigr',
-        # 其他
-        r'\\tag', r'\\qquad', r'\\quad', r'\\forall', r'\\exists',
-        r'\\mathbb', r'\\mathcal', r'\\mathrm',
-        # 上下标（简单检测）
-        r'\^', r'_'
-    ]
+    
+    # 每次调用只检查一次日志级别，未开启 DEBUG 时跳过调试信息的切片和格式化
+    debug_on = logger.isEnabledFor(logging.DEBUG)
     
     def is_likely_math(content: str) -> bool:
         """检查内容是否可能是数学公式"""
@@ -73,57 +279,48 @@ def convert_latex_format(text: str) -> str:
             return False
         
         # 检查是否包含任何数学指示符
-        for indicator in math_indicators:
-            if re.search(indicator, content):
-                logger.debug(f"检测到数学符号: {indicator} in [{content[:50]}...]")
-                return True
+        indicator_match = _RE_MATH_INDICATORS.search(content)
+        if indicator_match:
+            if debug_on:
+                logger.debug("检测到数学符号: %s in [%s...]", indicator_match.group(0), content[:50])
+            return True
         
         # 检查是否包含多个数学运算符
-        math_ops = ['+', '-', '*', '/', '=', '<', '>', '|']
-        op_count = sum(1 for op in math_ops if op in content)
+        # 单次扫描统计出现的不同运算符种类数
+        op_count = len(_MATH_OPS.intersection(content))
         if op_count >= 2:
-            logger.debug(f"检测到 {op_count} 个数学运算符 in [{content[:50]}...]")
+            if debug_on:
+                logger.debug("检测到 %d 个数学运算符 in [%s...]", op_count, content[:50])
             return True
         
-        logger.debug(f"未检测到数学符号 in [{content[:50]}...]")
+        if debug_on:
+            logger.debug("未检测到数学符号 in [%s...]", content[:50])
         return False
     
     # 处理 [ ... ] 格式的公式
-    # 策略：匹配所有 [...]，但只转换看起来像数学公式的
-    def replace_bracket_formula(match):
-        full_match = match.group(0)
-        content = match.group(1)  # 公式内容
-        
-        # 如果内容看起来像数学公式，转换它
-        if is_likely_math(content):
-            # 检查是否是独立成行的（前后有换行）
-            # 如果是，使用块级公式 $$...$$
-            # 否则使用行内公式 $...$
-            return f'$${content}$$'
-        return full_match
-    
-    # 匹配所有 [ ... ]，但要避免：
-    # 1. 代码块中的（用 (?<!`) 排除）
-    # 2. Markdown 链接（用 (?!\() 排除）
+    # 策略：扫描所有 [...]，但只转换看起来像数学公式的，要避免：
+    # 1. 代码块中的（前一个字符是 `）
+    # 2. Markdown 链接（] 后紧跟 (）
     converted_count = 0
     
-    def replace_and_count(match):
-        nonlocal converted_count
-        result = replace_bracket_formula(match)
-        if result != match.group(0):
-            converted_count += 1
-            logger.debug(f"转换公式 #{converted_count}: [{match.group(1)[:50]}...] -> $${match.group(1)[:50]}...$$")
-        return result
-    
-    text = re.sub(
-        r'(?<!`)\[\s*(.*?)\s*\](?!\()',
-        replace_and_count,
-        text,
-        flags=re.DOTALL
-    )
+    if '[' in text:
+        parts = []
+        pos = 0
+        for start, end, content in _iter_bracket_spans(text):
+            # 如果内容看起来像数学公式，转换为 $$...$$
+            if is_likely_math(content):
+                parts.append(text[pos:start])
+                parts.append(f'$${content}$$')
+                pos = end
+                converted_count += 1
+                if debug_on:
+                    logger.debug("转换公式 #%d: [%s...] -> $$%s...$$", converted_count, content[:50], content[:50])
+        if parts:
+            parts.append(text[pos:])
+            text = ''.join(parts)
     
     if converted_count > 0:
-        logger.info(f"LaTeX 格式转换: 共转换 {converted_count} 个公式")
+        logger.info("LaTeX 格式转换: 共转换 %s 个公式", converted_count)
     
     return text
 
@@ -142,8 +339,8 @@ def build_context(history: List[dict], max_turns: int = 3) -> str:
     if not history:
         return ""
     
-    # 提取最近的对话轮次
-    recent_history = history[-max_turns * 2:] if len(history) > max_turns * 2 else history
+    # 提取最近的对话轮次（只处理末尾 max_turns * 2 条消息，与历史总长度无关）
+    recent_history = history[-max_turns * 2:]
     
     # 构建上下文
     context_parts = []
@@ -188,51 +385,110 @@ def parse_scores(score_text: str, response_labels: List[str], reviewer_label: Op
         return {}
     
     scores = {}
-    valid_labels = set(response_labels)
+    # 标签固定为 #1..#N，直接按编号范围校验，无需构建标签集合
+    label_count = len(response_labels)
     
-    # 移除评审者自己的标签
-    if reviewer_label:
-        valid_labels.discard(reviewer_label)
+    # 评审者自己的编号(不对自己打分)
+    reviewer_num = int(reviewer_label[1:]) if reviewer_label else None
     
-    # 尝试多种解析模式
+    # 尝试多种解析模式（文本中没有对应分隔符时直接跳过该模式的正则匹配）
     
     # 模式 1: "#1: 8分" 或 "#1: 8"
-    pattern1 = r'#?(\d+)\s*[:：]\s*(\d+(?:\.\d+)?)\s*分?'
-    matches = re.findall(pattern1, score_text)
+    matches = _RE_SCORE_COLON.findall(score_text) if (':' in score_text or '：' in score_text) else []
     for num, score in matches:
-        label = f"#{num}"
-        if label in valid_labels:
+        num_i = int(num)
+        if 1 <= num_i <= label_count and num_i != reviewer_num:
             try:
                 score_val = float(score)
                 if 0 <= score_val <= 10:
-                    scores[label] = score_val
+                    scores[f"#{num_i}"] = score_val
             except ValueError:
                 continue
     
     # 模式 2: "#1=8" 或 "#1 = 8"
-    if not scores:
-        pattern2 = r'#?(\d+)\s*=\s*(\d+(?:\.\d+)?)'
-        matches = re.findall(pattern2, score_text)
+    if not scores and '=' in score_text:
+        matches = _RE_SCORE_EQ.findall(score_text)
         for num, score in matches:
-            label = f"#{num}"
-            if label in valid_labels:
+            num_i = int(num)
+            if 1 <= num_i <= label_count and num_i != reviewer_num:
                 try:
                     score_val = float(score)
                     if 0 <= score_val <= 10:
-                        scores[label] = score_val
+                        scores[f"#{num_i}"] = score_val
                 except ValueError:
                     continue
     
     # 如果解析失败，返回空字典，让调用方处理
     if not scores:
-        logger.warning(f"无法解析打分文本: {score_text[:200]}...")
-        logger.warning(f"期望的标签: {valid_labels}")
+        logger.warning("无法解析打分文本: %s...", score_text[:200])
+        logger.warning("期望的标签: %s", [label for label in response_labels if label != reviewer_label])
     
-    logger.info(f"解析打分: 找到 {len(scores)} 个有效评分")
+    logger.info("解析打分: 找到 %s 个有效评分", len(scores))
     return scores
 
 
-async def collect_responses(
+async def _iter_with_quorum(
+    jobs: List[Tuple[str, Any]],
+    make_timeout_result,
+    quorum_fraction: Optional[float] = None,
+    straggler_multiplier: float = DEFAULT_STRAGGLER_MULTIPLIER
+):
+    """
+    按完成顺序返回任务结果，支持达到法定人数后提前结束
+    
+    当已完成的任务数达到 ceil(quorum_fraction * N)，且剩余任务的耗时超过
+    已完成任务耗时中位数的 straggler_multiplier 倍时，取消剩余的掉队任务，
+    并为其返回 make_timeout_result(model_name) 生成的超时结果
+    
+    Args:
+        jobs: (模型名称, 协程) 列表
+        make_timeout_result: 根据模型名称生成超时结果的函数
+        quorum_fraction: 法定人数比例(0~1]，为 None 时等待所有任务完成
+        straggler_multiplier: 掉队阈值相对耗时中位数的倍数
+    
+    Yields:
+        每个任务的结果
+    """
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    task_to_model = {asyncio.create_task(coro): model_name for model_name, coro in jobs}
+    pending = set(task_to_model)
+    quorum = math.ceil(quorum_fraction * len(task_to_model)) if quorum_fraction else len(task_to_model)
+    durations = []  # 已完成任务的耗时(秒)
+    
+    try:
+        while pending:
+            wait_timeout = None
+            if len(durations) >= quorum:
+                deadline = start + statistics.median(durations) * straggler_multiplier
+                wait_timeout = max(0.0, deadline - loop.time())
+            
+            done, pending = await asyncio.wait(
+                pending,
+                timeout=wait_timeout,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            
+            if not done:
+                # 已达到法定人数且剩余任务均已掉队，取消并提前结束
+                for task in pending:
+                    task.cancel()
+                    model_name = task_to_model[task]
+                    logger.warning("模型 %s 响应过慢(已达法定人数 %s/%s)，取消该任务", model_name, quorum, len(task_to_model))
+                    yield make_timeout_result(model_name)
+                pending = set()
+                break
+            
+            for task in done:
+                durations.append(loop.time() - start)
+                yield task.result()
+    finally:
+        # 调用方提前停止迭代时，确保不留下后台任务
+        for task in pending:
+            task.cancel()
+
+
+async def collect_responses_with_progress(
     query: str,
     context: str,
     attachments: Optional[List[Dict[str, Any]]],
@@ -241,10 +497,14 @@ async def collect_responses(
     temperature: float = 0.7,
     timeout: int = 120,
     max_retries: int = 3,
-    max_concurrent: int = 10
-) -> List[Dict[str, Any]]:
+    max_concurrent: int = 10,
+    max_output_tokens: int = STAGE1_MAX_OUTPUT_TOKENS,
+    quorum_fraction: Optional[float] = None,
+    straggler_multiplier: float = DEFAULT_STRAGGLER_MULTIPLIER,
+    semaphore: Optional[asyncio.Semaphore] = None
+):
     """
-    Stage 1: 并行查询选定的模型
+    Stage 1: 并行查询选定的模型 - 生成器版本,按完成顺序实时返回结果
     
     Args:
         query: 用户问题
@@ -253,102 +513,45 @@ async def collect_responses(
         models: 参会模型名称列表
         model_configs: 模型配置字典
         max_concurrent: 最大并发数
+        max_output_tokens: 最大输出 token 数
+        quorum_fraction: 法定人数比例，达到后可取消掉队的模型(None 表示等待全部完成)
+        straggler_multiplier: 掉队阈值相对已完成耗时中位数的倍数
+        semaphore: 外部共享的并发信号量(None 时按 max_concurrent 新建，仅限本次调用)
     
-    Returns:
-        Stage1Result 列表
+    Yields:
+        每个模型的 Stage1Result(已转换 LaTeX 公式格式)
     """
-    logger.info(f"Stage 1: 开始收集 {len(models)} 个模型的响应")
-    
-    # 构建提示词
-    prompt_parts = []
+    logger.info("Stage 1: 开始收集 %s 个模型的响应", len(models))
     
-    prompt_parts.append("你是一个专业的AI助手。请根据以下信息回答用户的问题。")
-    
-    prompt_parts.append("\n【数学公式格式规范 - 必须严格遵守】")
-    prompt_parts.append("在回答中使用数学公式时，必须使用以下标准格式：")
-    prompt_parts.append("")
-    prompt_parts.append("✅ 正确格式：")
-    prompt_parts.append("  • 行内公式：$f(x) = x^2$")
-    prompt_parts.append("  • 块级公式（独立成行）：")
-    prompt_parts.append("    $$")
-    prompt_parts.append("    f(x) = \\int_{0}^{\\infty} e^{-x^2} dx")
-    prompt_parts.append("    $$")
-    prompt_parts.append("")
-    prompt_parts.append("❌ 错误格式（禁止使用）：")
-    prompt_parts.append("  • 不要使用 \\[...\\] 格式")
-    prompt_parts.append("  • 不要使用 \\(...\\) 格式")
-    prompt_parts.append("  • 不要使用 [...] 格式")
-    prompt_parts.append("  • 不要使用 (f) 这种括号表示变量")
-    prompt_parts.append("")
-    prompt_parts.append("示例对比：")
-    prompt_parts.append("  ❌ 错误：设 (f) 为整函数，满足 [|f(z)| \\le e^{|z|^{3/2}}]")
-    prompt_parts.append("  ✅ 正确：设 $f$ 为整函数，满足 $$|f(z)| \\le e^{|z|^{3/2}}$$")
-    prompt_parts.append("")
-    prompt_parts.append("支持的 LaTeX 命令：\\frac、\\sqrt、\\sum、\\int、\\prod、\\lim、\\sin、\\cos、\\exp、\\log、\\alpha、\\beta、\\pi、\\theta、\\le、\\ge、\\in、\\to 等")
-    prompt_parts.append("")
-    prompt_parts.append("\n【其他富文本格式】")
-    prompt_parts.append("1. **表格**：使用 Markdown 表格语法 (| 列1 | 列2 |)")
-    prompt_parts.append("2. **代码块**：使用 ```语言名 代码 ``` 格式，支持语法高亮（如 ```python, ```javascript 等）")
-    prompt_parts.append("3. **流程图 Mermaid**：使用 ```mermaid 图表代码 ``` 格式")
-    prompt_parts.append("2. **表格**：使用 Markdown 表格语法 (| 列1 | 列2 |)")
-    prompt_parts.append("3. **代码块**：使用 ```语言名 代码 ``` 格式，支持语法高亮（如 ```python, ```javascript 等）")
-    prompt_parts.append("4. **流程图 Mermaid**：使用 ```mermaid 图表代码 ``` 格式")
-    prompt_parts.append("   支持的图表类型：flowchart、sequenceDiagram、classDiagram、stateDiagram、erDiagram、gantt 等")
-    prompt_parts.append("   ")
-    prompt_parts.append("   【Mermaid 语法规范 - 必须严格遵守】：")
-    prompt_parts.append("   a) 节点文本规范：")
-    prompt_parts.append("      - 使用方括号 [] 包裹节点文本，如：A[开始]")
-    prompt_parts.append("      - 节点文本必须简短（建议不超过15个字符）")
-    prompt_parts.append("      - 禁止使用特殊字符：& < > \" ' : ; ( ) { } [ ] 等")
-    prompt_parts.append("      - 禁止使用中文标点符号（如：、。！？：；）")
-    prompt_parts.append("      - 如需表达复杂内容，用简短关键词代替，详细说明写在流程图外")
-    prompt_parts.append("   ")
-    prompt_parts.append("   b) 连接线文本规范：")
-    prompt_parts.append("      - 使用竖线包裹，如：A -->|是| B")
-    prompt_parts.append("      - 文本必须极简（建议不超过5个字符）")
-    prompt_parts.append("      - 避免使用任何标点符号")
-    prompt_parts.append("   ")
-    prompt_parts.append("   c) 决策节点规范：")
-    prompt_parts.append("      - 使用花括号，如：B{是否通过}")
-    prompt_parts.append("      - 问题描述要简短明确")
-    prompt_parts.append("   ")
-    prompt_parts.append("   d) 正确示例：")
-    prompt_parts.append("      ```mermaid")
-    prompt_parts.append("      flowchart TD")
-    prompt_parts.append("          A[收到告警] --> B{包含关键词}")
-    prompt_parts.append("          B -->|端口告警| C[端口流量告警]")
-    prompt_parts.append("          B -->|NQA| D[NQA告警]")
-    prompt_parts.append("          C --> E[提取端口描述]")
-    prompt_parts.append("          E --> F[反查专线号]")
-    prompt_parts.append("      ```")
-    prompt_parts.append("   ")
-    prompt_parts.append("   e) 错误示例（禁止）：")
-    prompt_parts.append("      - B{告警内容是否包含\"端口\"?}  ❌ 包含引号")
-    prompt_parts.append("      - C[提取\"端口描述:xxxx\"]  ❌ 包含冒号和引号")
-    prompt_parts.append("      - D -->|是: 匹配成功| E  ❌ 包含冒号")
-    prompt_parts.append("   ")
-    prompt_parts.append("5. **其他 Markdown**：支持标题、列表、引用、粗体、斜体、链接等标准 Markdown 语法")
-    prompt_parts.append("\n请充分利用这些格式来提供更清晰、更专业的回答。")
+    # 构建用户消息（只包含本次请求的动态内容）
+    # 直接写入缓冲区，避免大附件内容在 prompt_parts 列表、f-string 临时对象
+    # 和最终拼接结果中各保留一份副本
+    buf = io.StringIO()
     
     # 添加历史对话上下文
     if context:
-        prompt_parts.append(f"\n历史对话:\n{context}")
+        buf.write("历史对话:\n")
+        buf.write(context)
+        buf.write("\n\n")
     
     # 添加附件内容
     if attachments:
-        prompt_parts.append("\n附件内容:")
+        buf.write("附件内容:")
         for i, att in enumerate(attachments, 1):
-            name = att.get("name", f"附件{i}")
-            content = att.get("content", "")
-            prompt_parts.append(f"\n[{name}]\n{content}")
+            buf.write("\n\n[")
+            buf.write(att.get("name", f"附件{i}"))
+            buf.write("]\n")
+            buf.write(att.get("content", ""))
+        buf.write("\n\n")
     
-    prompt_parts.append(f"\n用户问题: {query}")
-    prompt_parts.append("\n请提供详细、准确的回答。")
+    buf.write("用户问题: ")
+    buf.write(query)
+    buf.write("\n\n请提供详细、准确的回答。")
     
-    prompt = "\n".join(prompt_parts)
+    user_message = {"role": "user", "content": buf.getvalue()}
     
-    # 构建消息列表
-    messages = [{"role": "user", "content": prompt}]
+    # 构建消息列表（固定的格式规范作为 system 消息，供应商可复用其前缀缓存）
+    messages = [STAGE1_SYSTEM_MESSAGE, user_message]
     
     # 获取模型配置
     selected_configs = []
@@ -357,134 +560,177 @@ async def collect_responses(
         if config:
             selected_configs.append(config)
         else:
-            logger.warning(f"模型 {model_name} 配置不存在")
+            logger.warning("模型 %s 配置不存在", model_name)
     
     if not selected_configs:
         logger.error("没有有效的模型配置")
-        return []
+        return
     
     # 并行查询模型 - 使用信号量控制并发数
-    semaphore = asyncio.Semaphore(max_concurrent)
-    
-    # 创建共享的HTTP客户端以提高并发性能
-    import httpx
-    async with httpx.AsyncClient(timeout=timeout) as shared_client:
-        async def query_with_semaphore(config):
-            async with semaphore:
-                # 使用共享客户端进行查询
-                model_name = config.get("name", "unknown")
-                url = config.get("url")
-                api_key = config.get("api_key")
-                
-                if not url or not api_key:
-                    error_msg = f"模型 {model_name} 配置不完整"
-                    logger.error(error_msg)
-                    return {
-                        "model": model_name,
-                        "response": "",
-                        "timestamp": datetime.utcnow().isoformat() + "Z",
-                        "error": error_msg
-                    }
-                
-                # 构建请求体
-                api_model_name = config.get("api_model_name", model_name)
-                request_body = {
-                    "model": api_model_name,
-                    "messages": messages,
-                    "temperature": temperature
-                }
-                
-                headers = {
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {api_key}"
-                }
-                
-                # 重试逻辑
-                last_error = None
-                for attempt in range(max_retries):
-                    try:
-                        logger.info(f"查询模型 {model_name} (尝试 {attempt + 1}/{max_retries})")
-                        
-                        response = await shared_client.post(
-                            url,
-                            json=request_body,
-                            headers=headers
-                        )
-                        
-                        response.raise_for_status()
-                        data = response.json()
-                        
-                        # 提取响应内容
-                        content = ""
-                        if "choices" in data and len(data["choices"]) > 0:
-                            choice = data["choices"][0]
-                            if "message" in choice:
-                                content = choice["message"].get("content", "")
-                            elif "text" in choice:
-                                content = choice.get("text", "")
-                        
-                        logger.info(f"模型 {model_name} 响应成功")
-                        return {
-                            "model": model_name,
-                            "response": content,
-                            "timestamp": datetime.utcnow().isoformat() + "Z"
-                        }
-                        
-                    except Exception as e:
-                        last_error = str(e)
-                        logger.warning(f"模型 {model_name} 查询失败 (尝试 {attempt + 1}/{max_retries}): {last_error}")
-                        
-                        if attempt < max_retries - 1:
-                            await asyncio.sleep(1 * (2 ** attempt))
-                
-                # 所有重试都失败
-                error_msg = f"查询失败,已重试 {max_retries} 次: {last_error}"
-                logger.error(f"模型 {model_name} {error_msg}")
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(max_concurrent)
+    
+    # 复用全局共享的HTTP客户端（连接池跨阶段、跨请求复用）
+    shared_client = get_shared_client()
+
+    async def query_with_semaphore(config):
+        async with semaphore:
+            # 使用共享客户端进行查询
+            model_name = config.get("name", "unknown")
+            url = config.get("url")
+            api_key = config.get("api_key")
+            
+            if not url or not api_key:
+                error_msg = f"模型 {model_name} 配置不完整"
+                logger.error(error_msg)
                 return {
                     "model": model_name,
                     "response": "",
-                    "timestamp": datetime.utcnow().isoformat() + "Z",
+                    "timestamp": get_iso_timestamp(),
                     "error": error_msg
                 }
-        
-        # 创建所有任务并立即启动(不等待)
-        tasks = [asyncio.create_task(query_with_semaphore(config)) for config in selected_configs]
-        # 等待所有任务完成
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-    
-    # 处理异常结果
-    processed_results = []
-    for i, result in enumerate(results):
-        if isinstance(result, Exception):
-            model_name = selected_configs[i].get("name", "unknown")
-            logger.error(f"模型 {model_name} 查询异常: {str(result)}")
-            processed_results.append({
+            
+            # 构建请求体
+            request_body = {
+                "model": get_api_model_name(config),
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_output_tokens
+            }
+            
+            headers = {
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {api_key}"
+            }
+            
+            # 重试逻辑
+            last_error = None
+            for attempt in range(max_retries):
+                try:
+                    logger.info("查询模型 %s (尝试 %s/%s)", model_name, attempt + 1, max_retries)
+                    
+                    response = await post_with_deadline(
+                        shared_client,
+                        url,
+                        request_body,
+                        headers,
+                        timeout,
+                        latency_key=f"{model_name}/stage1",
+                        final_attempt=attempt == max_retries - 1
+                    )
+                    
+                    response.raise_for_status()
+                    data = parse_json_response(response)
+                    
+                    content = extract_openai_content(data)
+                    
+                    logger.info("模型 %s 响应成功", model_name)
+                    return {
+                        "model": model_name,
+                        "response": content,
+                        "timestamp": get_iso_timestamp()
+                    }
+                    
+                except Exception as e:
+                    last_error = str(e)
+                    logger.warning("模型 %s 查询失败 (尝试 %s/%s): %s", model_name, attempt + 1, max_retries, last_error)
+                    
+                    if attempt < max_retries - 1:
+                        await asyncio.sleep(get_backoff_time(attempt, e))
+            
+            # 所有重试都失败
+            error_msg = f"查询失败,已重试 {max_retries} 次: {last_error}"
+            logger.error("模型 %s %s", model_name, error_msg)
+            return {
                 "model": model_name,
                 "response": "",
-                "timestamp": datetime.utcnow().isoformat() + "Z",
-                "error": f"查询异常: {str(result)}"
-            })
-        else:
-            processed_results.append(result)
+                "timestamp": get_iso_timestamp(),
+                "error": error_msg
+            }
     
-    results = processed_results
+    async def query_safely(config):
+        # 兜底捕获异常，保证每个任务都能返回带模型名的结果
+        try:
+            return await query_with_semaphore(config)
+        except Exception as e:
+            model_name = config.get("name", "unknown")
+            logger.error("模型 %s 查询异常: %s", model_name, str(e))
+            return {
+                "model": model_name,
+                "response": "",
+                "timestamp": get_iso_timestamp(),
+                "error": f"查询异常: {str(e)}"
+            }
     
-    # 转换为 Stage1Result 格式，并转换 LaTeX 公式格式
-    stage1_results = []
-    for result in results:
+    def make_timeout_result(model_name: str):
+        return {
+            "model": model_name,
+            "response": "",
+            "timestamp": get_iso_timestamp(),
+            "error": "响应过慢，已达到法定人数，提前结束"
+        }
+    
+    # 按完成顺序实时返回结果，不必等待最慢的模型
+    jobs = [(config.get("name", "unknown"), query_safely(config)) for config in selected_configs]
+    async for result in _iter_with_quorum(jobs, make_timeout_result, quorum_fraction, straggler_multiplier):
         response = result.get("response", "")
         # 转换 LaTeX 公式格式
-        if response:
+        if response and _needs_latex_convert(response):
             response = convert_latex_format(response)
         
-        stage1_results.append({
+        yield {
             "model": result.get("model", "unknown"),
             "response": response,
-            "timestamp": result.get("timestamp", datetime.utcnow().isoformat() + "Z"),
+            "timestamp": result.get("timestamp") or get_iso_timestamp(),
             "error": result.get("error")
-        })
+        }
+
+
+async def collect_responses(
+    query: str,
+    context: str,
+    attachments: Optional[List[Dict[str, Any]]],
+    models: List[str],
+    model_configs: Dict[str, Any],
+    temperature: float = 0.7,
+    timeout: int = 120,
+    max_retries: int = 3,
+    max_concurrent: int = 10,
+    max_output_tokens: int = STAGE1_MAX_OUTPUT_TOKENS,
+    quorum_fraction: Optional[float] = None,
+    straggler_multiplier: float = DEFAULT_STRAGGLER_MULTIPLIER
+) -> List[Dict[str, Any]]:
+    """
+    Stage 1: 并行查询选定的模型 - 非生成器版本
+    
+    Args:
+        query: 用户问题
+        context: 历史对话上下文
+        attachments: 附件列表
+        models: 参会模型名称列表
+        model_configs: 模型配置字典
+        max_concurrent: 最大并发数
+        max_output_tokens: 最大输出 token 数
+        quorum_fraction: 法定人数比例，达到后可取消掉队的模型(None 表示等待全部完成)
+        straggler_multiplier: 掉队阈值相对已完成耗时中位数的倍数
     
-    logger.info(f"Stage 1: 完成,收集到 {len(stage1_results)} 个响应")
+    Returns:
+        Stage1Result 列表(按 models 中的顺序排列)
+    """
+    # 使用生成器版本收集所有结果
+    stage1_results = []
+    async for result in collect_responses_with_progress(
+        query, context, attachments, models, model_configs,
+        temperature, timeout, max_retries, max_concurrent, max_output_tokens,
+        quorum_fraction, straggler_multiplier
+    ):
+        stage1_results.append(result)
+    
+    # 恢复为参会模型的原始顺序，保证后续匿名标签稳定
+    model_order = {model_name: i for i, model_name in enumerate(models)}
+    stage1_results.sort(key=lambda r: model_order.get(r["model"], len(models)))
+    
+    logger.info("Stage 1: 完成,收集到 %s 个响应", len(stage1_results))
     return stage1_results
 
 
@@ -497,7 +743,11 @@ async def collect_scores_with_progress(
     temperature: float = 0.7,
     timeout: int = 120,
     max_retries: int = 3,
-    max_concurrent: int = 10
+    max_concurrent: int = 10,
+    max_output_tokens: int = STAGE2_MAX_OUTPUT_TOKENS,
+    quorum_fraction: Optional[float] = None,
+    straggler_multiplier: float = DEFAULT_STRAGGLER_MULTIPLIER,
+    semaphore: Optional[asyncio.Semaphore] = None
 ):
     """
     Stage 2: 并行进行匿名打分(满分10分,不对自己打分) - 生成器版本,实时返回进度
@@ -511,27 +761,32 @@ async def collect_scores_with_progress(
         models: 参会模型名称列表（原始选择的所有模型）
         model_configs: 模型配置字典
         max_concurrent: 最大并发数
+        max_output_tokens: 最大输出 token 数
+        quorum_fraction: 法定人数比例，达到后可取消掉队的模型(None 表示等待全部完成)
+        straggler_multiplier: 掉队阈值相对已完成耗时中位数的倍数
+        semaphore: 外部共享的并发信号量(None 时按 max_concurrent 新建，仅限本次调用)
     
     Yields:
         每个模型的打分结果(Stage2Result)，包含参与状态和原因
     """
-    logger.info(f"Stage 2: 开始收集模型的匿名打分")
+    logger.info("Stage 2: 开始收集模型的匿名打分")
     
     # 过滤出有效的响应(没有错误的)
     valid_responses = [r for r in stage1_results if not r.get("error")]
     successful_models = [r.get("model") for r in valid_responses]
     
-    logger.info(f"Stage 1 成功的模型: {successful_models} (共 {len(successful_models)} 个)")
+    logger.info("Stage 1 成功的模型: %s (共 %s 个)", successful_models, len(successful_models))
     
     if len(valid_responses) < 2:
         logger.warning("Stage 2: 有效响应少于2个,跳过打分")
-        # 为所有模型返回未参与评分的结果
+        # 为所有模型返回未参与评分的结果(共用同一个时间戳)
+        skipped_at = get_iso_timestamp()
         for model_name in models:
             yield {
                 "model": model_name,
                 "scores": {},
                 "raw_text": "",
-                "timestamp": datetime.utcnow().isoformat() + "Z",
+                "timestamp": skipped_at,
                 "participated": False,
                 "skip_reason": "Stage 1 成功模型少于2个，无法进行评分",
                 "error": None
@@ -542,13 +797,15 @@ async def collect_scores_with_progress(
     labels = [f"#{i+1}" for i in range(len(valid_responses))]  # #1, #2, #3, ...
     # 创建标签到模型的映射
     label_to_model = {labels[i]: valid_responses[i].get("model") for i in range(len(valid_responses))}
+    # 反向映射：模型到标签，供评审者 O(1) 查找自己的标签
+    model_to_label = {model: label for label, model in label_to_model.items()}
     
     # 首先发送 label_to_model 映射，让前端立即知道标签对应关系
-    logger.info(f"Stage 2: 发送 label_to_model 映射: {label_to_model}")
+    logger.info("Stage 2: 发送 label_to_model 映射: %s", label_to_model)
     yield {
         "type": "label_mapping",
         "label_to_model": label_to_model,
-        "timestamp": datetime.utcnow().isoformat() + "Z"
+        "timestamp": get_iso_timestamp()
     }
     
     anonymized_responses = []
@@ -557,231 +814,238 @@ async def collect_scores_with_progress(
         response = result.get("response", "")
         anonymized_responses.append(f"[{label}]\n{response}")
     
+    # 构建打分提示词中与评审者无关的部分（所有评审者共用，只构建一次）
+    prompt_parts = []
+    
+    prompt_parts.append("你是一个公正的评审专家。请对以下回答进行打分(满分10分)。")
+    prompt_parts.append(f"\n用户问题: {query}")
+    
+    # 添加历史对话上下文
+    if context:
+        prompt_parts.append(f"\n历史对话:\n{context}")
+    
+    prompt_parts.append("\n候选回答:")
+    prompt_parts.append("\n\n".join(anonymized_responses))
+    
+    prompt_parts.append("\n请根据以下标准对每个回答打分(满分10分):")
+    prompt_parts.append("1. 准确性 (是否正确回答问题)")
+    prompt_parts.append("2. 完整性 (是否全面覆盖问题要点)")
+    prompt_parts.append("3. 清晰度 (表达是否清晰易懂)")
+    prompt_parts.append("4. 实用性 (是否有实际应用价值)")
+    
+    prompt_parts.append("\n【重要】请严格按照以下格式输出评价：")
+    prompt_parts.append("```")
+    prompt_parts.append("#1: 8.5分 - 回答准确且详细，逻辑清晰，但可以更简洁。")
+    prompt_parts.append("#2: 9.0分 - 非常全面的回答，覆盖了所有要点，表达清晰。")
+    prompt_parts.append("#3: 7.5分 - 回答基本正确，但缺少一些细节。")
+    prompt_parts.append("```")
+    prompt_parts.append("\n格式说明：")
+    prompt_parts.append("- 每个评价独占一行")
+    prompt_parts.append("- 格式：#编号: 分数 - 评价内容")
+    prompt_parts.append("- 分数后必须加空格和短横线(-)，然后是评价")
+    prompt_parts.append("- 评价要简短明确，一句话说明优缺点")
+    
+    prompt_prefix = "\n".join(prompt_parts)
+    
     # 创建信号量控制并发
-    semaphore = asyncio.Semaphore(max_concurrent)
-    
-    # 创建共享的HTTP客户端以提高并发性能
-    import httpx
-    async with httpx.AsyncClient(timeout=timeout) as shared_client:
-        # 为每个模型构建打分任务（只为 Stage 1 成功的模型）
-        async def score_with_model(model_name: str):
-            """单个模型的打分任务"""
-            async with semaphore:
-                # 检查该模型是否在 Stage 1 中成功
-                if model_name not in successful_models:
-                    logger.info(f"模型 {model_name} 在 Stage 1 中失败，跳过打分")
-                    return {
-                        "model": model_name,
-                        "scores": {},
-                        "raw_text": "",
-                        "timestamp": datetime.utcnow().isoformat() + "Z",
-                        "participated": False,
-                        "skip_reason": "该模型在 Stage 1 中执行失败",
-                        "error": None
-                    }
-                
-                # 找到该模型对应的标签
-                reviewer_label = None
-                for label, m in label_to_model.items():
-                    if m == model_name:
-                        reviewer_label = label
-                        break
-                
-                # 构建打分提示词
-                prompt_parts = []
-                
-                prompt_parts.append("你是一个公正的评审专家。请对以下回答进行打分(满分10分)。")
-                prompt_parts.append(f"\n用户问题: {query}")
-                
-                # 添加历史对话上下文
-                if context:
-                    prompt_parts.append(f"\n历史对话:\n{context}")
-                
-                prompt_parts.append("\n候选回答:")
-                prompt_parts.append("\n\n".join(anonymized_responses))
-                
-                prompt_parts.append("\n请根据以下标准对每个回答打分(满分10分):")
-                prompt_parts.append("1. 准确性 (是否正确回答问题)")
-                prompt_parts.append("2. 完整性 (是否全面覆盖问题要点)")
-                prompt_parts.append("3. 清晰度 (表达是否清晰易懂)")
-                prompt_parts.append("4. 实用性 (是否有实际应用价值)")
-                
-                prompt_parts.append("\n【重要】请严格按照以下格式输出评价：")
-                prompt_parts.append("```")
-                prompt_parts.append("#1: 8.5分 - 回答准确且详细，逻辑清晰，但可以更简洁。")
-                prompt_parts.append("#2: 9.0分 - 非常全面的回答，覆盖了所有要点，表达清晰。")
-                prompt_parts.append("#3: 7.5分 - 回答基本正确，但缺少一些细节。")
-                prompt_parts.append("```")
-                prompt_parts.append("\n格式说明：")
-                prompt_parts.append("- 每个评价独占一行")
-                prompt_parts.append("- 格式：#编号: 分数 - 评价内容")
-                prompt_parts.append("- 分数后必须加空格和短横线(-)，然后是评价")
-                prompt_parts.append("- 评价要简短明确，一句话说明优缺点")
-                
-                if reviewer_label:
-                    prompt_parts.append(f"\n注意: 请不要对 [{reviewer_label}] 打分(这是你自己的回答)，跳过该编号。")
-                
-                prompt_parts.append("\n请现在开始评分：")
-                
-                prompt = "\n".join(prompt_parts)
-                
-                # 构建消息列表
-                messages = [{"role": "user", "content": prompt}]
-                
-                # 获取模型配置
-                model_config = model_configs.get(model_name)
-                if not model_config:
-                    logger.warning(f"模型 {model_name} 配置不存在")
-                    return {
-                        "model": model_name,
-                        "scores": {},
-                        "raw_text": "",
-                        "timestamp": datetime.utcnow().isoformat() + "Z",
-                        "error": "模型配置不存在"
-                    }
-                
-                # 提取模型配置信息
-                url = model_config.get("url")
-                api_key = model_config.get("api_key")
-                api_type = model_config.get("api_type", "openai")
-                
-                if not url or not api_key:
-                    error_msg = f"模型 {model_name} 配置不完整"
-                    logger.error(error_msg)
-                    return {
-                        "model": model_name,
-                        "scores": {},
-                        "raw_text": "",
-                        "timestamp": datetime.utcnow().isoformat() + "Z",
-                        "error": error_msg
-                    }
-                
-                # 提取实际的模型名称（去掉供应商后缀）
-                if '/' in model_name:
-                    parts = model_name.rsplit('/', 1)
-                    actual_model_name = parts[0]
-                else:
-                    actual_model_name = model_name
-                
-                # 构建请求体
-                request_body = {
-                    "model": actual_model_name,
-                    "messages": messages,
-                    "temperature": temperature
-                }
-                
-                # 根据 API 类型设置请求头
-                if api_type == "anthropic":
-                    headers = {
-                        "Content-Type": "application/json",
-                        "x-api-key": api_key,
-                        "anthropic-version": "2023-06-01"
-                    }
-                    if "max_tokens" not in request_body:
-                        request_body["max_tokens"] = 4096
-                else:
-                    headers = {
-                        "Content-Type": "application/json",
-                        "Authorization": f"Bearer {api_key}"
-                    }
-                
-                # 重试逻辑
-                last_error = None
-                for attempt in range(max_retries):
-                    try:
-                        logger.info(f"查询模型 {model_name} (尝试 {attempt + 1}/{max_retries})")
-                        
-                        response = await shared_client.post(
-                            url,
-                            json=request_body,
-                            headers=headers
-                        )
-                        
-                        response.raise_for_status()
-                        data = response.json()
-                        
-                        # 根据 API 类型提取响应内容
-                        content = ""
-                        if api_type == "anthropic":
-                            if "content" in data and len(data["content"]) > 0:
-                                content = data["content"][0].get("text", "")
-                        else:
-                            if "choices" in data and len(data["choices"]) > 0:
-                                choice = data["choices"][0]
-                                if "message" in choice:
-                                    content = choice["message"].get("content", "")
-                                elif "text" in choice:
-                                    content = choice.get("text", "")
-                        
-                        logger.info(f"模型 {model_name} 响应成功")
-                        
-                        # 解析打分
-                        scores = parse_scores(content, labels, reviewer_label)
-                        
-                        actual_score_count = len(scores)
-                        expected_score_count = len(successful_models) - 1
-                        
-                        logger.info(
-                            f"模型 {model_name} 打分完成: "
-                            f"解析到 {actual_score_count} 个评分（期望 {expected_score_count} 个）"
-                        )
-                        
-                        return {
-                            "model": model_name,
-                            "scores": scores,
-                            "raw_text": content,
-                            "label_to_model": label_to_model,
-                            "timestamp": datetime.utcnow().isoformat() + "Z",
-                            "participated": True,
-                            "expected_count": expected_score_count,
-                            "actual_count": actual_score_count,
-                            "error": None
-                        }
-                        
-                    except Exception as e:
-                        last_error = str(e)
-                        logger.warning(f"模型 {model_name} 查询失败 (尝试 {attempt + 1}/{max_retries}): {last_error}")
-                        
-                        if attempt < max_retries - 1:
-                            await asyncio.sleep(1 * (2 ** attempt))
-                
-                # 所有重试都失败
-                error_msg = f"查询失败,已重试 {max_retries} 次: {last_error}"
-                logger.error(f"模型 {model_name} {error_msg}")
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(max_concurrent)
+    
+    # 复用全局共享的HTTP客户端（连接池跨阶段、跨请求复用）
+    shared_client = get_shared_client()
+
+    # 为每个模型构建打分任务（只为 Stage 1 成功的模型）
+    async def score_with_model(model_name: str):
+        """单个模型的打分任务"""
+        async with semaphore:
+            # 检查该模型是否在 Stage 1 中成功
+            if model_name not in successful_models:
+                logger.info("模型 %s 在 Stage 1 中失败，跳过打分", model_name)
                 return {
                     "model": model_name,
                     "scores": {},
                     "raw_text": "",
-                    "label_to_model": label_to_model,
-                    "timestamp": datetime.utcnow().isoformat() + "Z",
+                    "timestamp": get_iso_timestamp(),
                     "participated": False,
-                    "skip_reason": error_msg,
+                    "skip_reason": "该模型在 Stage 1 中执行失败",
+                    "error": None
+                }
+            
+            # 找到该模型对应的标签
+            reviewer_label = model_to_label.get(model_name)
+            
+            # 构建打分提示词：共用前缀在前，评审者相关部分只放在末尾，
+            # 保证各评审者的提示词前缀逐字节一致，便于服务端命中前缀缓存
+            reviewer_suffix = ""
+            if reviewer_label:
+                reviewer_suffix += f"\n\n注意: 请不要对 [{reviewer_label}] 打分(这是你自己的回答)，跳过该编号。"
+            reviewer_suffix += "\n\n请现在开始评分："
+            
+            # 构建消息列表
+            messages = [{"role": "user", "content": prompt_prefix + reviewer_suffix}]
+            
+            # 获取模型配置
+            model_config = model_configs.get(model_name)
+            if not model_config:
+                logger.warning("模型 %s 配置不存在", model_name)
+                return {
+                    "model": model_name,
+                    "scores": {},
+                    "raw_text": "",
+                    "timestamp": get_iso_timestamp(),
+                    "error": "模型配置不存在"
+                }
+            
+            # 提取模型配置信息
+            url = model_config.get("url")
+            api_key = model_config.get("api_key")
+            api_type = model_config.get("api_type", "openai")
+            
+            if not url or not api_key:
+                error_msg = f"模型 {model_name} 配置不完整"
+                logger.error(error_msg)
+                return {
+                    "model": model_name,
+                    "scores": {},
+                    "raw_text": "",
+                    "timestamp": get_iso_timestamp(),
                     "error": error_msg
                 }
-        
-        # 并行执行所有打分任务,并实时yield结果
-        # 只为 Stage 1 成功的模型创建打分任务
-        tasks = [asyncio.create_task(score_with_model(model_name)) for model_name in successful_models]
-        
-        # 使用 asyncio.as_completed 来实时获取完成的任务
-        for task in asyncio.as_completed(tasks):
-            try:
-                result = await task
-                yield result
-            except Exception as e:
-                logger.error(f"打分任务异常: {str(e)}")
-                # 找出是哪个模型的任务失败了
-                for model_name in models:
-                    yield {
+            
+            # 构建请求体
+            request_body = {
+                "model": get_api_model_name(model_config),
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_output_tokens
+            }
+            
+            # 根据 API 类型设置请求头
+            if api_type == "anthropic":
+                headers = {
+                    "Content-Type": "application/json",
+                    "x-api-key": api_key,
+                    "anthropic-version": "2023-06-01"
+                }
+                # Anthropic 支持显式缓存控制，将共用前缀标记为可缓存块
+                request_body["messages"] = [{
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": prompt_prefix, "cache_control": {"type": "ephemeral"}},
+                        {"type": "text", "text": reviewer_suffix}
+                    ]
+                }]
+            else:
+                headers = {
+                    "Content-Type": "application/json",
+                    "Authorization": f"Bearer {api_key}"
+                }
+            
+            # 根据 API 类型确定响应内容提取方式
+            extract_content = get_content_extractor(api_type)
+            
+            # 重试逻辑
+            last_error = None
+            for attempt in range(max_retries):
+                try:
+                    logger.info("查询模型 %s (尝试 %s/%s)", model_name, attempt + 1, max_retries)
+                    
+                    response = await post_with_deadline(
+                        shared_client,
+                        url,
+                        request_body,
+                        headers,
+                        timeout,
+                        latency_key=f"{model_name}/stage2",
+                        final_attempt=attempt == max_retries - 1
+                    )
+                    
+                    response.raise_for_status()
+                    data = parse_json_response(response)
+                    
+                    content = extract_content(data)
+                    
+                    logger.info("模型 %s 响应成功", model_name)
+                    
+                    # 解析打分
+                    scores = parse_scores(content, labels, reviewer_label)
+                    
+                    actual_score_count = len(scores)
+                    expected_score_count = len(successful_models) - 1
+                    
+                    logger.info(
+                        "模型 %s 打分完成: 解析到 %s 个评分（期望 %s 个）",
+                        model_name, actual_score_count, expected_score_count
+                    )
+                    
+                    return {
                         "model": model_name,
-                        "scores": {},
-                        "raw_text": "",
-                        "timestamp": datetime.utcnow().isoformat() + "Z",
-                        "error": f"打分异常: {str(e)}"
+                        "scores": scores,
+                        "raw_text": content,
+                        "label_to_model": label_to_model,
+                        "timestamp": get_iso_timestamp(),
+                        "participated": True,
+                        "expected_count": expected_score_count,
+                        "actual_count": actual_score_count,
+                        "error": None
                     }
-                    break
+                    
+                except Exception as e:
+                    last_error = str(e)
+                    logger.warning("模型 %s 查询失败 (尝试 %s/%s): %s", model_name, attempt + 1, max_retries, last_error)
+                    
+                    if attempt < max_retries - 1:
+                        await asyncio.sleep(get_backoff_time(attempt, e))
+            
+            # 所有重试都失败
+            error_msg = f"查询失败,已重试 {max_retries} 次: {last_error}"
+            logger.error("模型 %s %s", model_name, error_msg)
+            return {
+                "model": model_name,
+                "scores": {},
+                "raw_text": "",
+                "label_to_model": label_to_model,
+                "timestamp": get_iso_timestamp(),
+                "participated": False,
+                "skip_reason": error_msg,
+                "error": error_msg
+            }
     
-    logger.info(f"Stage 2: 完成")
+    async def score_safely(model_name: str):
+        # 兜底捕获异常，保证异常结果对应的是实际失败的模型
+        try:
+            return await score_with_model(model_name)
+        except Exception as e:
+            logger.error("模型 %s 打分任务异常: %s", model_name, str(e))
+            return {
+                "model": model_name,
+                "scores": {},
+                "raw_text": "",
+                "timestamp": get_iso_timestamp(),
+                "error": f"打分异常: {str(e)}"
+            }
+    
+    def make_timeout_result(model_name: str):
+        error_msg = "打分过慢，已达到法定人数，提前结束"
+        return {
+            "model": model_name,
+            "scores": {},
+            "raw_text": "",
+            "label_to_model": label_to_model,
+            "timestamp": get_iso_timestamp(),
+            "participated": False,
+            "skip_reason": error_msg,
+            "timed_out": True,
+            "error": error_msg
+        }
+    
+    # 并行执行所有打分任务,并实时yield结果
+    # 只为 Stage 1 成功的模型创建打分任务
+    jobs = [(model_name, score_safely(model_name)) for model_name in successful_models]
+    async for result in _iter_with_quorum(jobs, make_timeout_result, quorum_fraction, straggler_multiplier):
+        yield result
+    
+    logger.info("Stage 2: 完成")
 
 
 async def collect_scores(
@@ -793,7 +1057,10 @@ async def collect_scores(
     temperature: float = 0.7,
     timeout: int = 120,
     max_retries: int = 3,
-    max_concurrent: int = 10
+    max_concurrent: int = 10,
+    max_output_tokens: int = STAGE2_MAX_OUTPUT_TOKENS,
+    quorum_fraction: Optional[float] = None,
+    straggler_multiplier: float = DEFAULT_STRAGGLER_MULTIPLIER
 ) -> List[Dict[str, Any]]:
     """
     Stage 2: 并行进行匿名打分(满分10分,不对自己打分) - 非生成器版本
@@ -805,6 +1072,9 @@ async def collect_scores(
         models: 参会模型名称列表
         model_configs: 模型配置字典
         max_concurrent: 最大并发数
+        max_output_tokens: 最大输出 token 数
+        quorum_fraction: 法定人数比例，达到后可取消掉队的模型(None 表示等待全部完成)
+        straggler_multiplier: 掉队阈值相对已完成耗时中位数的倍数
     
     Returns:
         Stage2Result 列表(打分制)
@@ -813,7 +1083,8 @@ async def collect_scores(
     results = []
     async for result in collect_scores_with_progress(
         query, stage1_results, context, models, model_configs,
-        temperature, timeout, max_retries, max_concurrent
+        temperature, timeout, max_retries, max_concurrent, max_output_tokens,
+        quorum_fraction, straggler_multiplier
     ):
         results.append(result)
     return results
@@ -828,7 +1099,8 @@ async def synthesize_final(
     model_configs: Dict[str, Any],
     temperature: float = 0.7,
     timeout: int = 120,
-    max_retries: int = 3
+    max_retries: int = 3,
+    max_output_tokens: int = STAGE3_MAX_OUTPUT_TOKENS
 ) -> Dict[str, Any]:
     """
     Stage 3: 主席模型综合答案和解析
@@ -840,11 +1112,12 @@ async def synthesize_final(
         context: 历史对话上下文
         chairman_model: 主席模型名称
         model_configs: 模型配置字典
+        max_output_tokens: 最大输出 token 数
     
     Returns:
         Stage3Result (包含综合答案和解析)
     """
-    logger.info(f"Stage 3: 主席模型 {chairman_model} 开始综合答案和解析")
+    logger.info("Stage 3: 主席模型 %s 开始综合答案和解析", chairman_model)
     
     # 构建综合提示词
     prompt_parts = []
@@ -896,7 +1169,7 @@ async def synthesize_final(
         logger.error(error_msg)
         return {
             "response": "",
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": get_iso_timestamp(),
             "error": error_msg
         }
     
@@ -905,18 +1178,19 @@ async def synthesize_final(
         chairman_config,
         messages,
         temperature=temperature,
+        max_tokens=max_output_tokens,
         timeout=timeout,
         max_retries=max_retries
     )
     
     # 转换为 Stage3Result 格式，并转换 LaTeX 公式格式
     response = result.get("response", "")
-    if response:
+    if response and _needs_latex_convert(response):
         response = convert_latex_format(response)
     
     stage3_result = {
         "response": response,
-        "timestamp": result.get("timestamp", datetime.utcnow().isoformat() + "Z"),
+        "timestamp": result.get("timestamp") or get_iso_timestamp(),
         "error": result.get("error")
     }
     
@@ -924,166 +1198,221 @@ async def synthesize_final(
     return stage3_result
 
 
-async def calculate_final_ranking(
-    stage1_results: List[Dict[str, Any]],
-    stage2_results: List[Dict[str, Any]]
-) -> Dict[str, Any]:
+class IncrementalRanker:
     """
-    Stage 4: 汇总打分结果并排名,输出最终答案
-    
-    在这里统一验证所有打分的有效性，只使用有效打分来计算平均分
-    所有 Stage 1 成功的模型都参与排名（即使它们的打分无效）
-    
-    Args:
-        stage1_results: Stage 1 的响应结果
-        stage2_results: Stage 2 的打分结果
+    Stage 4 打分汇总器 - 随 Stage 2 结果到达增量累加
     
-    Returns:
-        Stage4Result (包含排名、最佳答案和打分有效性信息)
+    每收到一个评分者的结果调用一次 update()，可随时通过 partial_ranking() 获取
+    当前的临时排名，全部结果到达后调用 finalize() 得到最终的 Stage4Result
     """
-    logger.info("Stage 4: 开始汇总打分结果并排名")
-    
-    # 过滤出有效的响应（Stage 1 成功的模型）
-    valid_responses = [r for r in stage1_results if not r.get("error")]
-    
-    if not valid_responses:
-        logger.error("Stage 4: 没有有效的响应")
-        return {
-            "rankings": [],
-            "best_answer": "",
-            "scoring_summary": {},
-            "timestamp": datetime.utcnow().isoformat() + "Z",
-            "error": "没有有效的响应"
-        }
-    
-    # 创建标签到响应的映射 (使用数字编号)
-    labels = [f"#{i+1}" for i in range(len(valid_responses))]
-    label_to_response = {labels[i]: valid_responses[i] for i in range(len(valid_responses))}
     
-    # 期望的打分数量（每个模型应该给其他所有模型打分）
-    expected_score_count = len(valid_responses) - 1
-    
-    # 验证每个模型的打分有效性
-    valid_scorers = []  # 有效的评分者
-    invalid_scorers = []  # 无效的评分者
-    scoring_summary = {}  # 打分摘要信息
-    
-    for stage2_result in stage2_results:
+    def __init__(self, stage1_results: List[Dict[str, Any]]):
+        """
+        Args:
+            stage1_results: Stage 1 的响应结果
+        """
+        # 过滤出有效的响应（Stage 1 成功的模型）
+        self.valid_responses = [r for r in stage1_results if not r.get("error")]
+        
+        # 标签 (使用数字编号) 只在输入输出时使用，内部统一用 0..N-1 的整数下标
+        self.labels = [f"#{i+1}" for i in range(len(self.valid_responses))]
+        self.label_to_idx = {label: i for i, label in enumerate(self.labels)}
+        
+        # 期望的打分数量（每个模型应该给其他所有模型打分）
+        self.expected_score_count = len(self.valid_responses) - 1
+        
+        self.valid_scorers = []  # 有效的评分者
+        self.invalid_scorers = []  # 无效的评分者
+        self.scoring_summary = {}  # 打分摘要信息
+        self.score_sums = [0.0] * len(self.labels)  # 每个答案的有效打分总和
+        self.score_counts = [0] * len(self.labels)  # 每个答案收到的有效打分数量
+    
+    def update(self, stage2_result: Dict[str, Any]):
+        """
+        验证一个评分者的打分有效性，有效时累加到汇总中
+        
+        Args:
+            stage2_result: 单个模型的 Stage 2 打分结果
+        """
         model_name = stage2_result.get("model", "unknown")
         scores = stage2_result.get("scores", {})
         actual_count = len(scores)
+        expected_score_count = self.expected_score_count
         
         # 检查是否查询失败
         if stage2_result.get("error"):
-            invalid_scorers.append(model_name)
-            scoring_summary[model_name] = {
+            self.invalid_scorers.append(model_name)
+            self.scoring_summary[model_name] = {
                 "valid": False,
                 "reason": f"查询失败: {stage2_result.get('error')}",
                 "expected": expected_score_count,
-                "actual": 0
+                "actual": 0,
+                "timed_out": stage2_result.get("timed_out", False)
             }
-            logger.info(f"模型 {model_name} 打分无效: 查询失败")
-            continue
+            logger.info("模型 %s 打分无效: 查询失败", model_name)
+            return
         
         # 检查打分数量是否正确
         if actual_count == 0:
-            invalid_scorers.append(model_name)
-            scoring_summary[model_name] = {
+            self.invalid_scorers.append(model_name)
+            self.scoring_summary[model_name] = {
                 "valid": False,
                 "reason": "打分格式错误，无法解析评分内容",
                 "expected": expected_score_count,
                 "actual": 0
             }
-            logger.info(f"模型 {model_name} 打分无效: 解析失败")
-            continue
+            logger.info("模型 %s 打分无效: 解析失败", model_name)
+            return
         
         if actual_count != expected_score_count:
-            invalid_scorers.append(model_name)
-            scoring_summary[model_name] = {
+            self.invalid_scorers.append(model_name)
+            self.scoring_summary[model_name] = {
                 "valid": False,
                 "reason": f"打分数量不正确（期望{expected_score_count}个，实际{actual_count}个）",
                 "expected": expected_score_count,
                 "actual": actual_count
             }
-            logger.info(f"模型 {model_name} 打分无效: 数量不正确")
-            continue
+            logger.info("模型 %s 打分无效: 数量不正确", model_name)
+            return
         
         # 打分有效
-        valid_scorers.append(model_name)
-        scoring_summary[model_name] = {
+        self.valid_scorers.append(model_name)
+        self.scoring_summary[model_name] = {
             "valid": True,
             "reason": None,
             "expected": expected_score_count,
             "actual": actual_count
         }
-        logger.info(f"模型 {model_name} 打分有效: {actual_count} 个评分")
-    
-    logger.info(f"Stage 4: 有效评分者 {len(valid_scorers)} 个，无效评分者 {len(invalid_scorers)} 个")
-    
-    # 汇总每个答案的得分（只使用有效的打分）
-    total_scores = {label: [] for label in labels}
+        logger.info("模型 %s 打分有效: %s 个评分", model_name, actual_count)
+        
+        # 汇总该评分者的打分（只使用有效的打分）
+        label_to_idx = self.label_to_idx
+        for label, score in scores.items():
+            idx = label_to_idx.get(label)
+            if idx is not None:
+                self.score_sums[idx] += score
+                self.score_counts[idx] += 1
+    
+    def _averages(self) -> List[float]:
+        """计算平均分（只除以实际收到的有效打分数量）"""
+        return [
+            total / count if count else 0.0
+            for total, count in zip(self.score_sums, self.score_counts)
+        ]
+    
+    def partial_ranking(self) -> List[Dict[str, Any]]:
+        """
+        获取当前的临时排名（不包含回答内容，适合在 Stage 2 进行中广播）
+        
+        Returns:
+            按当前平均分排序的列表
+        """
+        avg_scores = self._averages()
+        sorted_idx = sorted(range(len(self.labels)), key=avg_scores.__getitem__, reverse=True)
+        return [
+            {
+                "rank": rank,
+                "label": self.labels[idx],
+                "model": self.valid_responses[idx].get("model", "unknown"),
+                "avg_score": round(avg_scores[idx], 2),
+                "score_count": self.score_counts[idx]
+            }
+            for rank, idx in enumerate(sorted_idx, 1)
+        ]
     
-    for stage2_result in stage2_results:
-        model_name = stage2_result.get("model", "unknown")
+    def finalize(self) -> Dict[str, Any]:
+        """
+        生成最终的排名结果
         
-        # 只使用有效评分者的打分
-        if model_name not in valid_scorers:
-            continue
+        Returns:
+            Stage4Result (包含排名、最佳答案和打分有效性信息)
+        """
+        if not self.valid_responses:
+            logger.error("Stage 4: 没有有效的响应")
+            return {
+                "rankings": [],
+                "best_answer": "",
+                "scoring_summary": {},
+                "timestamp": get_iso_timestamp(),
+                "error": "没有有效的响应"
+            }
+        
+        logger.info("Stage 4: 有效评分者 %s 个，无效评分者 %s 个", len(self.valid_scorers), len(self.invalid_scorers))
+        
+        # 计算平均分（只除以实际收到的有效打分数量）
+        avg_scores = self._averages()
+        for idx, label in enumerate(self.labels):
+            count = self.score_counts[idx]
+            if count:
+                logger.info("%s 收到 %s 个有效评分，平均分: %.2f", label, count, avg_scores[idx])
+            else:
+                logger.warning("%s 没有收到任何有效评分", label)
+        
+        # 按平均分排序
+        sorted_idx = sorted(range(len(self.labels)), key=avg_scores.__getitem__, reverse=True)
+        
+        # 构建排名列表（所有 Stage 1 成功的模型都参与排名）
+        # 注意：response 已经在 Stage 1 中转换过格式了，这里不需要再转换
+        rankings = []
+        for rank, idx in enumerate(sorted_idx, 1):
+            response_data = self.valid_responses[idx]
+            model_name = response_data.get("model", "unknown")
             
-        scores = stage2_result.get("scores", {})
-        for label, score in scores.items():
-            if label in total_scores:
-                total_scores[label].append(score)
-    
-    # 计算平均分（只除以实际收到的有效打分数量）
-    avg_scores = {}
-    for label, scores in total_scores.items():
-        if scores:
-            avg_scores[label] = sum(scores) / len(scores)
-            logger.info(f"{label} 收到 {len(scores)} 个有效评分，平均分: {avg_scores[label]:.2f}")
-        else:
-            avg_scores[label] = 0.0
-            logger.warning(f"{label} 没有收到任何有效评分")
-    
-    # 按平均分排序
-    sorted_labels = sorted(avg_scores.keys(), key=lambda x: avg_scores[x], reverse=True)
-    
-    # 构建排名列表（所有 Stage 1 成功的模型都参与排名）
-    # 注意：response 已经在 Stage 1 中转换过格式了，这里不需要再转换
-    rankings = []
-    for rank, label in enumerate(sorted_labels, 1):
-        response_data = label_to_response[label]
-        model_name = response_data.get("model", "unknown")
+            # 检查该模型的打分是否有效
+            scorer_info = self.scoring_summary.get(model_name, {})
+            
+            rankings.append({
+                "rank": rank,
+                "label": self.labels[idx],  # 只在输出时使用字符串标签
+                "model": model_name,
+                "avg_score": round(avg_scores[idx], 2),
+                "score_count": self.score_counts[idx],  # 收到的有效评分数量
+                "response": response_data.get("response", ""),  # 已经转换过格式
+                "scorer_valid": scorer_info.get("valid", False),  # 该模型作为评分者是否有效
+                "scorer_reason": scorer_info.get("reason")  # 如果无效，原因是什么
+            })
         
-        # 检查该模型的打分是否有效
-        scorer_info = scoring_summary.get(model_name, {})
+        # 获取得分最高的答案(已经在 Stage 1 中转换过格式)
+        best_answer = rankings[0]["response"] if rankings else ""
         
-        rankings.append({
-            "rank": rank,
-            "label": label,
-            "model": model_name,
-            "avg_score": round(avg_scores[label], 2),
-            "score_count": len(total_scores[label]),  # 收到的有效评分数量
-            "response": response_data.get("response", ""),  # 已经转换过格式
-            "scorer_valid": scorer_info.get("valid", False),  # 该模型作为评分者是否有效
-            "scorer_reason": scorer_info.get("reason")  # 如果无效，原因是什么
-        })
-    
-    # 获取得分最高的答案(已经在 Stage 1 中转换过格式)
-    best_answer = rankings[0]["response"] if rankings else ""
-    
-    logger.info(f"Stage 4: 完成,共 {len(rankings)} 个答案参与排名")
-    logger.info(f"最佳答案来自: {rankings[0]['model'] if rankings else 'N/A'}")
-    logger.info(f"有效评分者: {valid_scorers}")
-    logger.info(f"无效评分者: {invalid_scorers}")
-    
-    return {
-        "rankings": rankings,
-        "best_answer": best_answer,
-        "scoring_summary": scoring_summary,  # 添加打分摘要信息
-        "valid_scorer_count": len(valid_scorers),  # 有效评分者数量
-        "timestamp": datetime.utcnow().isoformat() + "Z"
-    }
+        logger.info("Stage 4: 完成,共 %s 个答案参与排名", len(rankings))
+        logger.info("最佳答案来自: %s", rankings[0]['model'] if rankings else 'N/A')
+        logger.info("有效评分者: %s", self.valid_scorers)
+        logger.info("无效评分者: %s", self.invalid_scorers)
+        
+        return {
+            "rankings": rankings,
+            "best_answer": best_answer,
+            "scoring_summary": self.scoring_summary,  # 添加打分摘要信息
+            "valid_scorer_count": len(self.valid_scorers),  # 有效评分者数量
+            "timestamp": get_iso_timestamp()
+        }
+
+
+async def calculate_final_ranking(
+    stage1_results: List[Dict[str, Any]],
+    stage2_results: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """
+    Stage 4: 汇总打分结果并排名,输出最终答案
+    
+    在这里统一验证所有打分的有效性，只使用有效打分来计算平均分
+    所有 Stage 1 成功的模型都参与排名（即使它们的打分无效）
+    
+    Args:
+        stage1_results: Stage 1 的响应结果
+        stage2_results: Stage 2 的打分结果
+    
+    Returns:
+        Stage4Result (包含排名、最佳答案和打分有效性信息)
+    """
+    logger.info("Stage 4: 开始汇总打分结果并排名")
+    
+    ranker = IncrementalRanker(stage1_results)
+    if ranker.valid_responses:
+        for stage2_result in stage2_results:
+            ranker.update(stage2_result)
+    return ranker.finalize()
 
 
 async def run_council(
@@ -1095,7 +1424,9 @@ async def run_council(
     model_configs: Dict[str, Any],
     temperature: float = 0.7,
     timeout: int = 120,
-    max_retries: int = 3
+    max_retries: int = 3,
+    quorum_fraction: Optional[float] = None,
+    straggler_multiplier: float = DEFAULT_STRAGGLER_MULTIPLIER
 ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], Dict[str, Any], Dict[str, Any]]:
     """
     完整的四阶段协作流程编排
@@ -1110,21 +1441,32 @@ async def run_council(
         temperature: 温度参数
         timeout: 超时时间
         max_retries: 最大重试次数
+        quorum_fraction: 法定人数比例，达到后可取消掉队的模型(None 表示等待全部完成)
+        straggler_multiplier: 掉队阈值相对已完成耗时中位数的倍数
     
     Returns:
         (stage1_results, stage2_results, stage3_result, stage4_result) 元组
     """
     logger.info("=" * 60)
     logger.info("开始四阶段协作流程")
-    logger.info(f"用户问题: {query}")
-    logger.info(f"参会模型: {models}")
-    logger.info(f"主席模型: {chairman}")
+    logger.info("用户问题: %s", query)
+    logger.info("参会模型: %s", models)
+    logger.info("主席模型: %s", chairman)
     logger.info("=" * 60)
     
     # 构建上下文
     context = build_context(history, max_turns=3)
     if context:
-        logger.info(f"上下文: {len(context)} 字符")
+        logger.info("上下文: %s 字符", len(context))
+    
+    # 温度为 0 时结果可复现，相同请求直接复用缓存的结果
+    cache_key = None
+    if temperature == 0:
+        cache_key = llm_cache.make_key(query, context, attachments, models, chairman, temperature)
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            logger.info("命中会议结果缓存，跳过四阶段流程")
+            return cached
     
     # Stage 1: 并行查询
     stage1_results = await collect_responses(
@@ -1135,7 +1477,9 @@ async def run_council(
         model_configs=model_configs,
         temperature=temperature,
         timeout=timeout,
-        max_retries=max_retries
+        max_retries=max_retries,
+        quorum_fraction=quorum_fraction,
+        straggler_multiplier=straggler_multiplier
     )
     
     # Stage 2: 匿名打分
@@ -1147,7 +1491,9 @@ async def run_council(
         model_configs=model_configs,
         temperature=temperature,
         timeout=timeout,
-        max_retries=max_retries
+        max_retries=max_retries,
+        quorum_fraction=quorum_fraction,
+        straggler_multiplier=straggler_multiplier
     )
     
     # Stage 3: 主席综合答案和解析
@@ -1173,4 +1519,8 @@ async def run_council(
     logger.info("四阶段协作流程完成")
     logger.info("=" * 60)
     
+    # 只缓存所有阶段都成功的结果
+    if cache_key and is_cacheable_result(stage1_results, stage2_results, stage3_result):
+        llm_cache.set(cache_key, (stage1_results, stage2_results, stage3_result, stage4_result))
+    
     return stage1_results, stage2_results, stage3_result, stage4_result
\ No newline at end of file
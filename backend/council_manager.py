@@ -4,14 +4,53 @@
 """
 
 import asyncio
-import logging
+import time
 import uuid
-from typing import Dict, Any, Optional, List
-from datetime import datetime
+import weakref
+from collections import deque
+from typing import Dict, Any, Optional, List, Deque, Callable
+from datetime import datetime, timezone
 from dataclasses import dataclass, field
 from enum import Enum
 
-logger = logging.getLogger(__name__)
+from models import get_iso_timestamp_cached
+from llm_client import LatencyTracker, get_upstream_semaphore, configure_host_throttles
+from llm_cache import llm_cache, is_cacheable_result
+from council import (
+    collect_scores_with_progress,
+    synthesize_final,
+    IncrementalRanker,
+    build_context,
+    DEFAULT_STRAGGLER_MULTIPLIER
+)
+from council_streaming import collect_responses_with_progress
+from storage import load_conversation, update_conversation, append_assistant_message, generate_ai_title
+from provider_manager import build_model_configs
+from log_context import get_meeting_logger, current_meeting_id
+
+logger = get_meeting_logger(__name__)
+
+# 每个订阅者最多积压的更新数，超出时清空积压并改为发送一次完整进度（resync）
+SUBSCRIBER_BUFFER_SIZE = 1000
+
+# 结束事件：缓冲区溢出时也必须保留
+TERMINAL_EVENT_TYPES = frozenset(("complete", "error"))
+
+# 进度类更新的合并窗口(秒)，窗口内的更新合并为一个 batch 帧发送
+BROADCAST_COALESCE_WINDOW = 0.05
+
+# 可以合并发送的高频进度事件；其余事件（阶段开始/完成、错误等）立即发送
+COALESCED_EVENT_TYPES = {"stage1_progress", "stage1_delta", "stage2_progress", "stage2_partial_ranking"}
+
+# 内容固定的阶段事件：所有会议共用同一个字典，SSE 序列化结果缓存在字典上，只需序列化一次
+STAGE1_START_UPDATE = {"type": "stage1_start", "message": "开始 Stage 1: 并行查询模型"}
+STAGE2_START_UPDATE = {"type": "stage2_start", "message": "开始 Stage 2: 匿名同行评审"}
+STAGE3_START_UPDATE = {"type": "stage3_start", "message": "开始 Stage 3: 主席综合答案"}
+STAGE4_START_UPDATE = {"type": "stage4_start", "message": "开始 Stage 4: 汇总打分和排名"}
+COMPLETE_UPDATE = {"type": "complete", "message": "会议完成"}
+
+# 各阶段耗时统计（跨会议的滚动窗口），通过 /api/metrics 查看
+stage_latency_tracker = LatencyTracker()
 
 
 class MeetingStatus(Enum):
@@ -34,10 +73,112 @@ class MeetingProgress:
     stage3_result: Optional[Dict[str, Any]] = None
     stage4_result: Optional[Dict[str, Any]] = None
     model_statuses: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    stage_latencies: Dict[str, float] = field(default_factory=dict)  # 本次会议各阶段耗时(秒)
     current_stage: str = "pending"
     error: Optional[str] = None
 
 
+@dataclass(eq=False)
+class MeetingSubscriber:
+    """
+    会议订阅者 - 有界缓冲区 + 唤醒事件
+    
+    订阅者消费太慢、积压达到上限时，不逐条丢弃最旧的更新（那样会悄悄丢掉阶段结果），
+    而是清空积压，换成一条 resync 更新（溢出时刻的完整会议进度），由 SSE 层按重新连接的方式补发；
+    结束事件总是保留。
+    按对象身份比较和哈希（eq=False），以便放入 WeakSet
+    """
+    buffer: Deque[Dict[str, Any]] = field(default_factory=deque)
+    event: asyncio.Event = field(default_factory=asyncio.Event)
+    resync: Optional[Callable[[], Dict[str, Any]]] = None  # 生成 resync 更新的函数
+    maxsize: int = SUBSCRIBER_BUFFER_SIZE
+    
+    def put_nowait(self, update: Dict[str, Any]):
+        """写入一条更新并唤醒等待者（不会阻塞，也不会抛出 QueueFull）"""
+        if len(self.buffer) >= self.maxsize and self.resync is not None:
+            # 进度在广播前已更新，resync 快照已包含本条更新的结果，只需另外保留结束事件
+            self.buffer.clear()
+            self.buffer.append(self.resync())
+            if update.get("type") in TERMINAL_EVENT_TYPES:
+                self.buffer.append(update)
+            logger.warning("订阅者积压超过 %s 条更新，改为发送完整进度", self.maxsize)
+        else:
+            self.buffer.append(update)
+        self.event.set()
+    
+    async def get(self) -> Dict[str, Any]:
+        """获取下一条更新，缓冲区为空时等待"""
+        while not self.buffer:
+            self.event.clear()
+            await self.event.wait()
+        return self.buffer.popleft()
+    
+    def drain_nowait(self) -> List[Dict[str, Any]]:
+        """取出缓冲区中当前积压的全部更新（不等待）"""
+        updates = list(self.buffer)
+        self.buffer.clear()
+        return updates
+
+
+class BroadcastCoalescer:
+    """
+    广播合并器 - 将短时间窗口内的高频进度更新合并为一个 batch 帧
+    
+    模型数量较多时，Stage 1/2 每个结果都单独广播会产生大量小事件；
+    这里把窗口内的进度事件缓存起来，到期后以 {"type": "batch", "events": [...]} 一次性投递。
+    非进度事件会先冲刷已缓存的事件再立即投递，保证事件顺序不变。
+    """
+    
+    def __init__(self, deliver, window: float = BROADCAST_COALESCE_WINDOW):
+        """
+        Args:
+            deliver: 投递函数 deliver(meeting_id, update)
+            window: 合并窗口(秒)
+        """
+        self._deliver = deliver
+        self._window = window
+        self._pending: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+    
+    def push(self, meeting_id: str, update: Dict[str, Any]):
+        """
+        提交一条更新
+        
+        Args:
+            meeting_id: 会议ID
+            update: 更新数据
+        """
+        if update.get("type") not in COALESCED_EVENT_TYPES:
+            self.flush(meeting_id)
+            self._deliver(meeting_id, update)
+            return
+        
+        self._pending.setdefault(meeting_id, deque()).append(update)
+        if meeting_id not in self._timers:
+            loop = asyncio.get_running_loop()
+            self._timers[meeting_id] = loop.call_later(self._window, self.flush, meeting_id)
+    
+    def flush(self, meeting_id: str):
+        """
+        立即投递某个会议已缓存的更新
+        
+        Args:
+            meeting_id: 会议ID
+        """
+        timer = self._timers.pop(meeting_id, None)
+        if timer:
+            timer.cancel()
+        
+        pending = self._pending.pop(meeting_id, None)
+        if not pending:
+            return
+        
+        if len(pending) == 1:
+            self._deliver(meeting_id, pending[0])
+        else:
+            self._deliver(meeting_id, {"type": "batch", "events": list(pending)})
+
+
 @dataclass
 class Meeting:
     """会议对象"""
@@ -51,7 +192,39 @@ class Meeting:
     created_at: str
     updated_at: str
     task: Optional[asyncio.Task] = None
-    subscribers: List[asyncio.Queue] = field(default_factory=list)
+    # 只弱引用订阅者：客户端断开但未调用 unsubscribe 时，订阅者随 SSE 生成器一起被回收
+    subscribers: "weakref.WeakSet[MeetingSubscriber]" = field(default_factory=weakref.WeakSet)
+    version: int = 0  # 每次广播更新时递增，用于判断进度快照是否过期
+    _snapshot: Optional[tuple] = field(default=None, repr=False)  # (快照键, progress 更新)
+    
+    def progress_snapshot(self) -> Dict[str, Any]:
+        """
+        获取发送给新订阅者的进度更新
+        
+        会议没有变化时复用同一个更新对象，多个订阅者先后加入时
+        不必重复构建和序列化整个会议进度
+        """
+        key = (self.version, self.status, self.updated_at)
+        if self._snapshot is None or self._snapshot[0] != key:
+            self._snapshot = (key, {"type": "progress", "data": self.to_dict()})
+        return self._snapshot[1]
+    
+    def resync_update(self) -> Dict[str, Any]:
+        """
+        生成订阅者缓冲区溢出时发送的 resync 更新（当前各阶段结果的快照）
+        
+        结果列表复制一份，之后追加的结果不会混入快照，随后续更新正常发送
+        """
+        progress = self.progress
+        return {
+            "type": "resync",
+            "data": {
+                "stage1_results": list(progress.stage1_results),
+                "stage2_results": list(progress.stage2_results),
+                "stage3_result": progress.stage3_result,
+                "stage4_result": progress.stage4_result
+            }
+        }
     
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典格式"""
@@ -67,6 +240,7 @@ class Meeting:
                 "stage3_result": self.progress.stage3_result,
                 "stage4_result": self.progress.stage4_result,
                 "model_statuses": self.progress.model_statuses,
+                "stage_latencies": self.progress.stage_latencies,
                 "current_stage": self.progress.current_stage,
                 "error": self.progress.error
             },
@@ -90,8 +264,12 @@ class CouncilManager:
         if self._initialized:
             return
         
+        # 所有会议状态只在事件循环线程中读写，且修改过程中不包含 await，
+        # 因此无需加锁（asyncio 单线程调度下不会出现交错修改）
         self._meetings: Dict[str, Meeting] = {}
-        self._lock = asyncio.Lock()
+        self._coalescer = BroadcastCoalescer(self._deliver_update)
+        # 后台任务（如AI生成标题）的强引用，防止任务在完成前被回收
+        self._background_tasks: set = set()
         self._initialized = True
         logger.info("会议管理器已初始化")
     
@@ -116,31 +294,30 @@ class CouncilManager:
         Returns:
             meeting_id: 会议ID
         """
-        async with self._lock:
-            meeting_id = str(uuid.uuid4())
-            now = datetime.utcnow().isoformat() + "Z"
-            
-            meeting = Meeting(
-                meeting_id=meeting_id,
-                conv_id=conv_id,
-                content=content,
-                models=models,
-                attachments=attachments,
-                status=MeetingStatus.PENDING,
-                progress=MeetingProgress(),
-                created_at=now,
-                updated_at=now
-            )
-            
-            self._meetings[meeting_id] = meeting
-            
-            # 启动会议任务
-            meeting.task = asyncio.create_task(
-                self._run_meeting(meeting_id, config)
-            )
-            
-            logger.info(f"创建会议: {meeting_id}, 对话: {conv_id}, 模型数: {len(models)}")
-            return meeting_id
+        meeting_id = str(uuid.uuid4())
+        now = get_iso_timestamp_cached()
+        
+        meeting = Meeting(
+            meeting_id=meeting_id,
+            conv_id=conv_id,
+            content=content,
+            models=models,
+            attachments=attachments,
+            status=MeetingStatus.PENDING,
+            progress=MeetingProgress(),
+            created_at=now,
+            updated_at=now
+        )
+        
+        self._meetings[meeting_id] = meeting
+        
+        # 启动会议任务
+        meeting.task = asyncio.create_task(
+            self._run_meeting(meeting_id, config)
+        )
+        
+        logger.info("创建会议: %s, 对话: %s, 模型数: %s", meeting_id, conv_id, len(models))
+        return meeting_id
     
     async def _run_meeting(self, meeting_id: str, config: Dict[str, Any]):
         """
@@ -150,67 +327,60 @@ class CouncilManager:
             meeting_id: 会议ID
             config: 配置信息
         """
+        # 会议在独立任务中运行，这里设置的会议ID只影响本会议（及其子任务）的日志
+        current_meeting_id.set(meeting_id)
         try:
             meeting = self._meetings.get(meeting_id)
             if not meeting:
-                logger.error(f"会议不存在: {meeting_id}")
+                logger.error("会议不存在: %s", meeting_id)
                 return
             
-            logger.info(f"会议开始: {meeting_id}")
-            
-            # 导入必要的模块
-            from council_streaming import collect_responses_with_progress
-            from council import (
-                collect_scores_with_progress,
-                synthesize_final,
-                calculate_final_ranking,
-                build_context
-            )
-            from storage import load_conversation
+            logger.info("会议开始: %s", meeting_id)
             
             # 加载对话历史
-            conversation = load_conversation(meeting.conv_id)
+            conversation = await asyncio.to_thread(load_conversation, meeting.conv_id)
             if not conversation:
                 raise Exception(f"对话不存在: {meeting.conv_id}")
             
             history = conversation.get("messages", [])
             context = build_context(history[:-1], max_turns=3)
             
-            # 准备模型配置
-            model_configs = {}
-            providers = config.get("providers", [])
-            for provider in providers:
-                provider_name = provider.get("name", "")
-                provider_models = provider.get("models", [])
-                
-                for model in provider_models:
-                    model_name = model.get("name", "")
-                    full_model_name = f"{model_name}/{provider_name}"
-                    
-                    model_configs[full_model_name] = {
-                        "name": full_model_name,
-                        "display_name": model.get("display_name", model_name),
-                        "description": model.get("description", ""),
-                        "url": provider.get("url", ""),
-                        "api_key": provider.get("api_key", ""),
-                        "api_type": provider.get("api_type", "openai"),
-                        "provider": provider_name
-                    }
+            # 准备模型配置（本次会议内复用，保存结果时不再重复构建）
+            model_configs = build_model_configs(config)
             
             settings = config.get("settings", {})
             temperature = settings.get("temperature", 0.7)
             timeout = settings.get("timeout", 120)
             max_retries = settings.get("max_retries", 3)
             max_concurrent = settings.get("max_concurrent", 10)
+            # 所有会议共享同一个信号量，并发上限作用于全局而非单个会议
+            upstream_semaphore = get_upstream_semaphore(max_concurrent)
+            configure_host_throttles(settings)
+            quorum_fraction = settings.get("quorum_fraction")
+            straggler_multiplier = settings.get("straggler_multiplier", DEFAULT_STRAGGLER_MULTIPLIER)
             chairman = config.get("chairman", "")
             
+            # 温度为 0 时结果可复现，相同请求直接复用缓存的四阶段结果
+            cache_key = None
+            if temperature == 0:
+                cache_key = llm_cache.make_key(
+                    meeting.content, context, meeting.attachments, meeting.models, chairman, temperature
+                )
+                cached = llm_cache.get(cache_key)
+                if cached is not None:
+                    logger.info("命中会议结果缓存，跳过四阶段流程: %s", meeting_id)
+                    await self._replay_cached_result(meeting_id, meeting, cached)
+                    title_task = None
+                    if len(history) == 1:
+                        title_task = self._start_title_task(meeting, config, model_configs)
+                    await self._finish_meeting(meeting_id, meeting, config, model_configs, title_task)
+                    return
+            
             # Stage 1: 收集响应
             meeting.status = MeetingStatus.STAGE1
             meeting.progress.current_stage = "stage1"
-            await self._broadcast_update(meeting_id, {
-                "type": "stage1_start",
-                "message": "开始 Stage 1: 并行查询模型"
-            })
+            await self._broadcast_update(meeting_id, STAGE1_START_UPDATE)
+            stage_start = time.perf_counter()
             
             async for result in collect_responses_with_progress(
                 query=meeting.content,
@@ -221,9 +391,18 @@ class CouncilManager:
                 temperature=temperature,
                 timeout=timeout,
                 max_retries=max_retries,
-                max_concurrent=max_concurrent
+                max_concurrent=max_concurrent,
+                # 前端尚未渲染逐字输出，默认关闭流式转发，避免每个 token 都产生一次广播
+                stream=settings.get("stream_responses", False),
+                semaphore=upstream_semaphore
             ):
-                if result.get("type") == "retry":
+                if result.get("type") == "delta":
+                    # 流式输出的新增文本只转发给订阅者，不计入会议进度（reset 表示重试前清空已收到的文本）
+                    await self._broadcast_update(meeting_id, {
+                        "type": "stage1_delta",
+                        "data": result
+                    })
+                elif result.get("type") == "retry":
                     await self._broadcast_update(meeting_id, {
                         "type": "stage1_progress",
                         "data": result
@@ -235,6 +414,7 @@ class CouncilManager:
                         "data": result
                     })
             
+            self._record_stage_latency(meeting, "stage1", stage_start)
             await self._broadcast_update(meeting_id, {
                 "type": "stage1_complete",
                 "results": meeting.progress.stage1_results
@@ -243,10 +423,11 @@ class CouncilManager:
             # Stage 2: 同行评审
             meeting.status = MeetingStatus.STAGE2
             meeting.progress.current_stage = "stage2"
-            await self._broadcast_update(meeting_id, {
-                "type": "stage2_start",
-                "message": "开始 Stage 2: 匿名同行评审"
-            })
+            await self._broadcast_update(meeting_id, STAGE2_START_UPDATE)
+            stage_start = time.perf_counter()
+            
+            # 打分到达即增量汇总，Stage 2 进行中即可推送临时排名
+            ranker = IncrementalRanker(meeting.progress.stage1_results)
             
             async for result in collect_scores_with_progress(
                 query=meeting.content,
@@ -257,7 +438,10 @@ class CouncilManager:
                 temperature=temperature,
                 timeout=timeout,
                 max_retries=max_retries,
-                max_concurrent=max_concurrent
+                max_concurrent=max_concurrent,
+                quorum_fraction=quorum_fraction,
+                straggler_multiplier=straggler_multiplier,
+                semaphore=upstream_semaphore
             ):
                 if result.get("type") == "label_mapping":
                     await self._broadcast_update(meeting_id, {
@@ -270,7 +454,17 @@ class CouncilManager:
                         "type": "stage2_progress",
                         "data": result
                     })
+                    if ranker.valid_responses:
+                        ranker.update(result)
+                        await self._broadcast_update(meeting_id, {
+                            "type": "stage2_partial_ranking",
+                            "data": {
+                                "rankings": ranker.partial_ranking(),
+                                "received": len(meeting.progress.stage2_results)
+                            }
+                        })
             
+            self._record_stage_latency(meeting, "stage2", stage_start)
             await self._broadcast_update(meeting_id, {
                 "type": "stage2_complete",
                 "results": meeting.progress.stage2_results
@@ -279,10 +473,8 @@ class CouncilManager:
             # Stage 3: 主席综合
             meeting.status = MeetingStatus.STAGE3
             meeting.progress.current_stage = "stage3"
-            await self._broadcast_update(meeting_id, {
-                "type": "stage3_start",
-                "message": "开始 Stage 3: 主席综合答案"
-            })
+            await self._broadcast_update(meeting_id, STAGE3_START_UPDATE)
+            stage_start = time.perf_counter()
             
             stage3_result = await synthesize_final(
                 query=meeting.content,
@@ -297,93 +489,178 @@ class CouncilManager:
             )
             
             meeting.progress.stage3_result = stage3_result
+            self._record_stage_latency(meeting, "stage3", stage_start)
             await self._broadcast_update(meeting_id, {
                 "type": "stage3_complete",
                 "data": stage3_result
             })
             
+            # 第一轮对话：Stage 3 完成后立即开始生成标题，与 Stage 4 和保存并行
+            title_task = None
+            if len(history) == 1:
+                title_task = self._start_title_task(meeting, config, model_configs)
+            
             # Stage 4: 计算排名
             meeting.status = MeetingStatus.STAGE4
             meeting.progress.current_stage = "stage4"
-            await self._broadcast_update(meeting_id, {
-                "type": "stage4_start",
-                "message": "开始 Stage 4: 汇总打分和排名"
-            })
+            await self._broadcast_update(meeting_id, STAGE4_START_UPDATE)
+            stage_start = time.perf_counter()
             
-            stage4_result = await calculate_final_ranking(
-                stage1_results=meeting.progress.stage1_results,
-                stage2_results=meeting.progress.stage2_results
-            )
+            # 打分已在 Stage 2 中逐个汇总，这里直接生成最终排名
+            logger.info("Stage 4: 开始汇总打分结果并排名")
+            stage4_result = ranker.finalize()
             
             meeting.progress.stage4_result = stage4_result
+            self._record_stage_latency(meeting, "stage4", stage_start)
             await self._broadcast_update(meeting_id, {
                 "type": "stage4_complete",
                 "data": stage4_result
             })
             
-            # 完成
-            meeting.status = MeetingStatus.COMPLETED
-            meeting.progress.current_stage = "completed"
-            meeting.updated_at = datetime.utcnow().isoformat() + "Z"
-            
-            # 保存消息到对话
-            await self._save_meeting_to_conversation(meeting_id, meeting, config)
-            
-            await self._broadcast_update(meeting_id, {
-                "type": "complete",
-                "message": "会议完成"
-            })
+            # 只缓存所有阶段都成功的结果
+            if cache_key and is_cacheable_result(
+                meeting.progress.stage1_results,
+                meeting.progress.stage2_results,
+                stage3_result
+            ):
+                llm_cache.set(cache_key, (
+                    meeting.progress.stage1_results,
+                    meeting.progress.stage2_results,
+                    stage3_result,
+                    stage4_result
+                ))
             
-            logger.info(f"会议完成: {meeting_id}")
+            await self._finish_meeting(meeting_id, meeting, config, model_configs, title_task)
             
         except asyncio.CancelledError:
-            logger.info(f"会议被取消: {meeting_id}")
+            logger.info("会议被取消: %s", meeting_id)
             meeting = self._meetings.get(meeting_id)
             if meeting:
                 meeting.status = MeetingStatus.CANCELLED
-                meeting.updated_at = datetime.utcnow().isoformat() + "Z"
+                meeting.updated_at = get_iso_timestamp_cached()
             raise
             
         except Exception as e:
-            logger.error(f"会议执行失败: {meeting_id}, 错误: {e}", exc_info=True)
+            logger.error("会议执行失败: %s, 错误: %s", meeting_id, e, exc_info=True)
             meeting = self._meetings.get(meeting_id)
             if meeting:
                 meeting.status = MeetingStatus.FAILED
                 meeting.progress.error = str(e)
-                meeting.updated_at = datetime.utcnow().isoformat() + "Z"
+                meeting.updated_at = get_iso_timestamp_cached()
                 
                 await self._broadcast_update(meeting_id, {
                     "type": "error",
                     "error": str(e)
                 })
     
+    async def _replay_cached_result(self, meeting_id: str, meeting: Meeting, cached: tuple):
+        """
+        使用缓存的四阶段结果填充会议进度，并按正常流程的顺序广播各阶段事件
+        
+        Args:
+            meeting_id: 会议ID
+            meeting: 会议对象
+            cached: 缓存的 (stage1_results, stage2_results, stage3_result, stage4_result)
+        """
+        stage1_results, stage2_results, stage3_result, stage4_result = cached
+        progress = meeting.progress
+        
+        meeting.status = MeetingStatus.STAGE1
+        progress.current_stage = "stage1"
+        progress.stage1_results = stage1_results
+        await self._broadcast_update(meeting_id, STAGE1_START_UPDATE)
+        await self._broadcast_update(meeting_id, {"type": "stage1_complete", "results": stage1_results})
+        
+        meeting.status = MeetingStatus.STAGE2
+        progress.current_stage = "stage2"
+        progress.stage2_results = stage2_results
+        await self._broadcast_update(meeting_id, STAGE2_START_UPDATE)
+        await self._broadcast_update(meeting_id, {"type": "stage2_complete", "results": stage2_results})
+        
+        meeting.status = MeetingStatus.STAGE3
+        progress.current_stage = "stage3"
+        progress.stage3_result = stage3_result
+        await self._broadcast_update(meeting_id, STAGE3_START_UPDATE)
+        await self._broadcast_update(meeting_id, {"type": "stage3_complete", "data": stage3_result})
+        
+        meeting.status = MeetingStatus.STAGE4
+        progress.current_stage = "stage4"
+        progress.stage4_result = stage4_result
+        await self._broadcast_update(meeting_id, STAGE4_START_UPDATE)
+        await self._broadcast_update(meeting_id, {"type": "stage4_complete", "data": stage4_result})
+    
+    async def _finish_meeting(
+        self,
+        meeting_id: str,
+        meeting: Meeting,
+        config: Dict[str, Any],
+        model_configs: Dict[str, Dict[str, Any]],
+        title_task: Optional[asyncio.Task]
+    ):
+        """
+        标记会议完成，保存结果到对话并广播完成事件
+        
+        Args:
+            meeting_id: 会议ID
+            meeting: 会议对象
+            config: 配置信息
+            model_configs: 本次会议使用的模型配置字典
+            title_task: 已提前启动的AI生成标题任务（第一轮对话）
+        """
+        meeting.status = MeetingStatus.COMPLETED
+        meeting.progress.current_stage = "completed"
+        meeting.updated_at = get_iso_timestamp_cached()
+        
+        # 保存消息到对话
+        await self._save_meeting_to_conversation(meeting_id, meeting, config, model_configs, title_task)
+        
+        await self._broadcast_update(meeting_id, COMPLETE_UPDATE)
+        
+        logger.info("会议完成: %s", meeting_id)
+    
+    def _record_stage_latency(self, meeting: Meeting, stage: str, start: float):
+        """
+        记录阶段耗时（写入会议进度和全局统计）
+        
+        Args:
+            meeting: 会议对象
+            stage: 阶段名称
+            start: 阶段开始时的 time.perf_counter()
+        """
+        elapsed = time.perf_counter() - start
+        meeting.progress.stage_latencies[stage] = round(elapsed, 3)
+        stage_latency_tracker.record(stage, elapsed)
+    
     async def _broadcast_update(self, meeting_id: str, update: Dict[str, Any]):
         """
-        广播更新到所有订阅者
+        广播更新到所有订阅者（高频进度更新经合并器按窗口批量发送）
         
         Args:
             meeting_id: 会议ID
             update: 更新数据
         """
         meeting = self._meetings.get(meeting_id)
+        if meeting:
+            meeting.version += 1
+        self._coalescer.push(meeting_id, update)
+    
+    def _deliver_update(self, meeting_id: str, update: Dict[str, Any]):
+        """
+        将更新写入所有订阅者的缓冲区
+        
+        Args:
+            meeting_id: 会议ID
+            update: 更新数据（可能是 batch 帧）
+        """
+        meeting = self._meetings.get(meeting_id)
         if not meeting:
             return
         
-        # 移除已关闭的订阅者
-        active_subscribers = []
-        for queue in meeting.subscribers:
-            try:
-                queue.put_nowait(update)
-                active_subscribers.append(queue)
-            except asyncio.QueueFull:
-                logger.warning(f"订阅者队列已满，跳过更新")
-                active_subscribers.append(queue)
-            except Exception as e:
-                logger.warning(f"广播更新失败: {e}")
-        
-        meeting.subscribers = active_subscribers
+        # 缓冲区满时订阅者自行改为 resync，无需处理队列已满的情况
+        for subscriber in meeting.subscribers:
+            subscriber.put_nowait(update)
     
-    async def subscribe(self, meeting_id: str) -> asyncio.Queue:
+    async def subscribe(self, meeting_id: str) -> MeetingSubscriber:
         """
         订阅会议更新
         
@@ -391,38 +668,37 @@ class CouncilManager:
             meeting_id: 会议ID
             
         Returns:
-            更新队列
+            订阅者(通过 await subscriber.get() 获取更新)
         """
-        async with self._lock:
-            meeting = self._meetings.get(meeting_id)
-            if not meeting:
-                raise ValueError(f"会议不存在: {meeting_id}")
-            
-            queue = asyncio.Queue(maxsize=1000)
-            meeting.subscribers.append(queue)
-            
-            # 发送当前进度
-            await queue.put({
-                "type": "progress",
-                "data": meeting.to_dict()
-            })
-            
-            logger.info(f"新订阅者加入会议: {meeting_id}")
-            return queue
+        meeting = self._meetings.get(meeting_id)
+        if not meeting:
+            raise ValueError(f"会议不存在: {meeting_id}")
+        
+        queue = MeetingSubscriber(resync=meeting.resync_update)
+        meeting.subscribers.add(queue)
+        
+        # 发送当前进度（会议无变化时复用快照）
+        queue.put_nowait(meeting.progress_snapshot())
+        
+        logger.info("新订阅者加入会议: %s", meeting_id)
+        return queue
     
-    async def unsubscribe(self, meeting_id: str, queue: asyncio.Queue):
+    async def unsubscribe(self, meeting_id: str, queue: MeetingSubscriber):
         """
         取消订阅会议更新
         
         Args:
             meeting_id: 会议ID
-            queue: 订阅队列
+            queue: 订阅者
         """
-        async with self._lock:
-            meeting = self._meetings.get(meeting_id)
-            if meeting and queue in meeting.subscribers:
-                meeting.subscribers.remove(queue)
-                logger.info(f"订阅者离开会议: {meeting_id}")
+        meeting = self._meetings.get(meeting_id)
+        if not meeting:
+            return
+        
+        if queue not in meeting.subscribers:
+            return
+        meeting.subscribers.discard(queue)
+        logger.info("订阅者离开会议: %s", meeting_id)
     
     async def get_meeting(self, meeting_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -446,11 +722,10 @@ class CouncilManager:
         Args:
             meeting_id: 会议ID
         """
-        async with self._lock:
-            meeting = self._meetings.get(meeting_id)
-            if meeting and meeting.task and not meeting.task.done():
-                meeting.task.cancel()
-                logger.info(f"会议已取消: {meeting_id}")
+        meeting = self._meetings.get(meeting_id)
+        if meeting and meeting.task and not meeting.task.done():
+            meeting.task.cancel()
+            logger.info("会议已取消: %s", meeting_id)
     
     async def list_meetings(self, conv_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """
@@ -475,26 +750,32 @@ class CouncilManager:
         Args:
             max_age_hours: 最大保留时间（小时）
         """
-        async with self._lock:
-            now = datetime.utcnow()
-            to_remove = []
-            
-            for meeting_id, meeting in self._meetings.items():
-                if meeting.status in [MeetingStatus.COMPLETED, MeetingStatus.FAILED, MeetingStatus.CANCELLED]:
-                    updated_at = datetime.fromisoformat(meeting.updated_at.replace('Z', '+00:00'))
-                    age_hours = (now - updated_at.replace(tzinfo=None)).total_seconds() / 3600
-                    
-                    if age_hours > max_age_hours:
-                        to_remove.append(meeting_id)
-            
-            for meeting_id in to_remove:
-                del self._meetings[meeting_id]
-                logger.info(f"清理旧会议: {meeting_id}")
-            
-            if to_remove:
-                logger.info(f"清理了 {len(to_remove)} 个旧会议")
+        now = datetime.now(timezone.utc)
+        to_remove = []
+        
+        for meeting_id, meeting in self._meetings.items():
+            if meeting.status in [MeetingStatus.COMPLETED, MeetingStatus.FAILED, MeetingStatus.CANCELLED]:
+                updated_at = datetime.fromisoformat(meeting.updated_at.replace('Z', '+00:00'))
+                age_hours = (now - updated_at).total_seconds() / 3600
+                
+                if age_hours > max_age_hours:
+                    to_remove.append(meeting_id)
+        
+        for meeting_id in to_remove:
+            del self._meetings[meeting_id]
+            logger.info("清理旧会议: %s", meeting_id)
+        
+        if to_remove:
+            logger.info("清理了 %s 个旧会议", len(to_remove))
     
-    async def _save_meeting_to_conversation(self, meeting_id: str, meeting: 'Meeting', config: Dict[str, Any]):
+    async def _save_meeting_to_conversation(
+        self,
+        meeting_id: str,
+        meeting: 'Meeting',
+        config: Dict[str, Any],
+        model_configs: Dict[str, Dict[str, Any]],
+        title_task: Optional[asyncio.Task] = None
+    ):
         """
         保存会议结果到对话
         
@@ -502,75 +783,111 @@ class CouncilManager:
             meeting_id: 会议ID
             meeting: 会议对象
             config: 配置信息
+            model_configs: 本次会议使用的模型配置字典
+            title_task: 已提前启动的AI生成标题任务（第一轮对话）
         """
         try:
-            from storage import load_conversation, save_conversation, generate_ai_title
-            from models import get_iso_timestamp
-            
-            # 加载对话
-            conversation = load_conversation(meeting.conv_id)
-            if not conversation:
-                logger.error(f"对话不存在: {meeting.conv_id}")
-                return
-            
-            # 检查是否已经保存过（避免重复保存）
-            messages = conversation.get("messages", [])
-            if messages and messages[-1].get("role") == "assistant":
-                # 最后一条消息已经是助手消息，可能已经保存过了
-                logger.info(f"对话已有助手消息，跳过保存: {meeting.conv_id}")
-                return
+            # 标题已生成则随本次保存一起写入
+            title = None
+            if title_task is not None and title_task.done() and not title_task.cancelled() \
+                    and title_task.exception() is None:
+                title = title_task.result()
             
-            # 保存助手消息
             assistant_message = {
                 "role": "assistant",
                 "stage1": meeting.progress.stage1_results,
                 "stage2": meeting.progress.stage2_results,
                 "stage3": meeting.progress.stage3_result or {},
                 "stage4": meeting.progress.stage4_result or {},
-                "timestamp": get_iso_timestamp()
+                "timestamp": get_iso_timestamp_cached()
             }
-            conversation["messages"].append(assistant_message)
-            
-            # 如果是第一轮对话，使用AI生成标题
-            if len(conversation["messages"]) == 2:
-                try:
-                    chairman = config.get("chairman", "")
-                    model_configs = {}
-                    providers = config.get("providers", [])
-                    for provider in providers:
-                        provider_name = provider.get("name", "")
-                        provider_models = provider.get("models", [])
-                        for model in provider_models:
-                            model_name = model.get("name", "")
-                            full_model_name = f"{model_name}/{provider_name}"
-                            model_configs[full_model_name] = {
-                                "name": full_model_name,
-                                "url": provider.get("url", ""),
-                                "api_key": provider.get("api_key", ""),
-                                "api_type": provider.get("api_type", "openai"),
-                            }
-                    
-                    stage3_result = meeting.progress.stage3_result or {}
-                    ai_title = await generate_ai_title(
-                        query=meeting.content,
-                        response=stage3_result.get("response", ""),
-                        chairman_model=chairman,
-                        model_configs=model_configs
-                    )
-                    conversation["title"] = ai_title
-                    logger.info(f"AI生成对话标题: {ai_title}")
-                except Exception as e:
-                    logger.warning(f"AI生成标题失败: {e}")
-            
-            # 更新对话时间戳
-            conversation["updated_at"] = get_iso_timestamp()
-            
-            # 保存对话
-            save_conversation(meeting.conv_id, conversation)
-            logger.info(f"会议结果已保存到对话: {meeting.conv_id}")
             
+            # 检查与写入在同一把对话锁内完成（文件读写放到线程池，避免阻塞其他会议的广播）；
+            # 标题有变化时重写快照，否则只追加助手消息
+            conversation, appended = await asyncio.to_thread(
+                append_assistant_message, meeting.conv_id, assistant_message, title
+            )
+            if conversation is None:
+                logger.error("对话不存在: %s", meeting.conv_id)
+                return
+            if not appended:
+                # 最后一条消息已经是助手消息，可能已经保存过了
+                logger.info("对话已有助手消息，跳过保存: %s", meeting.conv_id)
+                return
+            logger.info("会议结果已保存到对话: %s", meeting.conv_id)
+            
+            # 只有第一轮对话才需要AI生成标题
+            if len(conversation["messages"]) != 2:
+                return
+            if title is not None:
+                logger.info("AI生成对话标题: %s", title)
+                return
+            
+            # 标题还没生成完时放到后台写回，不阻塞会议完成事件
+            if title_task is None:
+                title_task = self._start_title_task(meeting, config, model_configs)
+            self.patch_title_in_background(meeting.conv_id, title_task)
+            
+        except Exception as e:
+            logger.error("保存会议到对话失败: %s", e, exc_info=True)
+    
+    def _start_title_task(
+        self,
+        meeting: 'Meeting',
+        config: Dict[str, Any],
+        model_configs: Dict[str, Dict[str, Any]]
+    ) -> asyncio.Task:
+        """
+        启动AI生成对话标题的任务
+        
+        Args:
+            meeting: 会议对象
+            config: 配置信息
+            model_configs: 模型配置字典
+        
+        Returns:
+            生成标题的任务（结果为标题字符串）
+        """
+        stage3_result = meeting.progress.stage3_result or {}
+        return asyncio.create_task(generate_ai_title(
+            query=meeting.content,
+            response=stage3_result.get("response", ""),
+            chairman_model=config.get("chairman", ""),
+            model_configs=model_configs
+        ))
+    
+    def patch_title_in_background(self, conv_id: str, title_task: asyncio.Task):
+        """
+        在后台等待标题生成完成并写回对话，调用方无需等待
+        
+        Args:
+            conv_id: 对话ID
+            title_task: 生成标题的任务
+        """
+        task = asyncio.create_task(self._patch_title(conv_id, title_task))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+    
+    async def _patch_title(self, conv_id: str, title_task: asyncio.Task):
+        """
+        等待标题生成完成并写回对话文件（后台任务）
+        
+        Args:
+            conv_id: 对话ID
+            title_task: 生成标题的任务
+        """
+        try:
+            ai_title = await title_task
+            
+            # 在对话锁内重新加载再保存，避免覆盖生成标题期间对话的其他修改
+            def set_title(conversation: Dict[str, Any]):
+                conversation["title"] = ai_title
+            
+            if await asyncio.to_thread(update_conversation, conv_id, set_title) is None:
+                return
+            logger.info("AI生成对话标题: %s", ai_title)
         except Exception as e:
-            logger.error(f"保存会议到对话失败: {e}", exc_info=True)
+            logger.warning("AI生成标题失败: %s", e)
 
 
 # 全局会议管理器实例
@@ -0,0 +1,190 @@
+"""
+本地文件内容提取模块
+解析 docx/xlsx/pdf 等文档（MinerU 未启用或解析失败时使用）
+
+这些解析库都是 CPU 密集的纯 Python 实现，受 GIL 限制，放到进程池中执行，
+多个上传可以在多核上并行解析，同时不阻塞事件循环。
+本模块只依赖标准库和解析库，进程池的工作进程导入它时开销很小。
+"""
+import os
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 进程池（懒加载），工作进程按需启动，最多与 CPU 核数相同
+_extractor_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_extractor_pool() -> ProcessPoolExecutor:
+    """
+    获取本地解析使用的进程池，首次调用时创建
+    
+    Returns:
+        ProcessPoolExecutor 实例
+    """
+    global _extractor_pool
+    if _extractor_pool is None:
+        with _pool_lock:
+            if _extractor_pool is None:
+                _extractor_pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+    return _extractor_pool
+
+
+def shutdown_extractor_pool():
+    """关闭进程池（应用退出时调用）"""
+    global _extractor_pool
+    with _pool_lock:
+        if _extractor_pool is not None:
+            _extractor_pool.shutdown(wait=False, cancel_futures=True)
+            _extractor_pool = None
+
+
+def _extract_pdf_text(file_path: str) -> str:
+    """
+    提取PDF文本，每页带页码标题
+    
+    优先使用 pypdfium2（PDFium C++ 引擎，逐页提取，比纯 Python 的 PyPDF2 快一个数量级），
+    未安装时回退到 PyPDF2
+    
+    Args:
+        file_path: 文件路径
+    
+    Returns:
+        提取的文本内容
+    
+    Raises:
+        ImportError: pypdfium2 和 PyPDF2 都未安装
+    """
+    content_parts = []
+    try:
+        import pypdfium2 as pdfium
+    except ImportError:
+        from PyPDF2 import PdfReader
+        reader = PdfReader(file_path)
+        for i, page in enumerate(reader.pages):
+            text = page.extract_text()
+            if text.strip():
+                content_parts.append(f"=== 第{i+1}页 ===\n{text}")
+        return '\n\n'.join(content_parts)
+    
+    doc = pdfium.PdfDocument(file_path)
+    try:
+        for i in range(len(doc)):
+            page = doc[i]
+            textpage = page.get_textpage()
+            # PDFium 以 \r\n 分行，统一为 \n 与 PyPDF2 的输出一致
+            text = textpage.get_text_range().replace("\r\n", "\n")
+            textpage.close()
+            page.close()
+            if text.strip():
+                content_parts.append(f"=== 第{i+1}页 ===\n{text}")
+    finally:
+        doc.close()
+    return '\n\n'.join(content_parts)
+
+
+def _format_cell(value: Any) -> str:
+    """将单元格值转换为文本（空单元格为空字符串，整数值的浮点数去掉小数部分）"""
+    if value is None:
+        return ''
+    # calamine 按 Excel 的存储方式把数字读成 float，整数值输出为 1 而不是 1.0，与 openpyxl 一致
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _extract_excel_text(file_path: str) -> str:
+    """
+    提取Excel文本，每个工作表带标题，单元格以制表符分隔
+    
+    优先使用 python-calamine（Rust 实现，一次读出整个工作表，不创建逐个单元格的对象），
+    未安装时回退到 openpyxl
+    
+    Args:
+        file_path: 文件路径
+    
+    Returns:
+        提取的文本内容
+    
+    Raises:
+        ImportError: python-calamine 和 openpyxl 都未安装
+    """
+    content_parts = []
+    try:
+        from python_calamine import CalamineWorkbook
+    except ImportError:
+        from openpyxl import load_workbook
+        wb = load_workbook(file_path, data_only=True)
+        sheets = ((sheet_name, wb[sheet_name].iter_rows(values_only=True)) for sheet_name in wb.sheetnames)
+    else:
+        wb = CalamineWorkbook.from_path(file_path)
+        sheets = (
+            (sheet_name, wb.get_sheet_by_name(sheet_name).to_python(skip_empty_area=False))
+            for sheet_name in wb.sheet_names
+        )
+    
+    for sheet_name, rows in sheets:
+        content_parts.append(f"=== 工作表: {sheet_name} ===")
+        for row in rows:
+            row_text = '\t'.join([_format_cell(cell) for cell in row])
+            if row_text.strip():
+                content_parts.append(row_text)
+    return '\n'.join(content_parts)
+
+
+def extract_local_content(file_path: str, file_ext: str) -> Tuple[str, Optional[str]]:
+    """
+    使用本地解析库提取文件内容（在进程池的工作进程中执行，必须是模块级函数以便序列化）
+    
+    Args:
+        file_path: 文件路径
+        file_ext: 文件扩展名(小写，含点)
+    
+    Returns:
+        (content, error) 元组，content为提取的文本内容，error为错误信息
+    """
+    try:
+        # Word文档 (.docx)
+        if file_ext == '.docx':
+            try:
+                from docx import Document
+                doc = Document(file_path)
+                content = '\n'.join([paragraph.text for paragraph in doc.paragraphs])
+                return content, None
+            except ImportError:
+                return "", "需要安装python-docx库来处理.docx文件"
+            except Exception as e:
+                return "", f"读取.docx文件失败: {str(e)}"
+        
+        # Excel文件 (.xlsx, .xls)
+        elif file_ext in ['.xlsx', '.xls']:
+            try:
+                return _extract_excel_text(file_path), None
+            except ImportError:
+                return "", "需要安装python-calamine或openpyxl库来处理Excel文件"
+            except Exception as e:
+                return "", f"读取Excel文件失败: {str(e)}"
+        
+        # PDF文件
+        elif file_ext == '.pdf':
+            try:
+                return _extract_pdf_text(file_path), None
+            except ImportError:
+                return "", "需要安装pypdfium2或PyPDF2库来处理PDF文件"
+            except Exception as e:
+                return "", f"读取PDF文件失败: {str(e)}"
+        
+        # DOC文件 (旧版Word)
+        elif file_ext == '.doc':
+            return "", ".doc格式不支持，请转换为.docx格式"
+        
+        else:
+            return "", f"不支持的文件格式: {file_ext}"
+    
+    except Exception as e:
+        logger.error(f"提取文件内容错误: {e}", exc_info=True)
+        return "", f"提取文件内容失败: {str(e)}"
@@ -1,63 +1,219 @@
 """
 文件存储管理模块
-负责文件的MD5计算、去重、元数据管理
+负责文件的摘要计算、去重、元数据管理
+
+去重摘要使用 BLAKE2b-128（不需要抗碰撞的密码学强度，比 MD5 更快），
+为保持接口兼容，元数据和 API 中的字段名仍为 md5。
+每条记录在 digest_alg 列中保存产生其摘要的算法，旧版本写入的 MD5 记录保持原键不变
+（对话中的附件仍按旧键引用），重复上传时额外按 MD5 查找一次以继续去重
 """
 import os
 import json
 import hashlib
 import shutil
+import sqlite3
+import threading
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 
 # 文件存储目录
 UPLOADS_DIR = "backend/uploads"
+METADATA_DB = "backend/file_metadata.db"
+# 旧版 JSON 元数据文件（仅用于一次性迁移到 SQLite）
 METADATA_FILE = "backend/file_metadata.json"
 
+# 去重摘要算法（写入每条记录的 digest_alg 列）
+DIGEST_ALG = "blake2b-128"
+DIGEST_SIZE = 16
+# 旧版本使用的摘要算法：没有 digest_alg 列时写入的记录都属于该算法
+LEGACY_DIGEST_ALG = "md5"
+
+# 元数据表的列（顺序与返回的文件信息字段一致）
+_COLUMNS = (
+    "md5", "filename", "stored_path", "content", "size",
+    "reference_count", "created_at", "last_accessed"
+)
+_SELECT_COLUMNS = ", ".join(_COLUMNS)
+
+# 模块级数据库连接（首次使用时打开，所有操作共用，通过锁串行化）
+_conn: Optional[sqlite3.Connection] = None
+_conn_lock = threading.Lock()
+
 def ensure_directories():
-    """确保必要的目录存在"""
+    """确保必要的目录存在，并在首次运行时将旧的 JSON 元数据迁移到 SQLite"""
     os.makedirs(UPLOADS_DIR, exist_ok=True)
+    _get_connection()
+
+def _get_connection() -> sqlite3.Connection:
+    """
+    获取元数据数据库连接（首次调用时建表，必要时从 JSON 迁移）
+    
+    Returns:
+        SQLite 连接
+    """
+    global _conn
+    if _conn is not None:
+        return _conn
+    
+    with _conn_lock:
+        if _conn is not None:
+            return _conn
+        
+        db_dir = os.path.dirname(METADATA_DB)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        needs_migration = not os.path.exists(METADATA_DB) and os.path.exists(METADATA_FILE)
+        
+        conn = sqlite3.connect(METADATA_DB, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                md5 TEXT PRIMARY KEY,
+                filename TEXT,
+                stored_path TEXT,
+                content TEXT,
+                size INTEGER,
+                reference_count INTEGER NOT NULL DEFAULT 1,
+                created_at TEXT,
+                last_accessed TEXT,
+                digest_alg TEXT NOT NULL DEFAULT 'md5'
+            )
+            """
+        )
+        # 旧版数据库没有 digest_alg 列：补上该列，已有记录按默认值标记为 MD5
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(files)")}
+        if "digest_alg" not in columns:
+            conn.execute("ALTER TABLE files ADD COLUMN digest_alg TEXT NOT NULL DEFAULT 'md5'")
+        # MinerU 解析结果缓存：按内容摘要和模型版本保存，文件记录删除后仍然保留
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS mineru_cache (
+                md5 TEXT NOT NULL,
+                model TEXT NOT NULL,
+                content TEXT NOT NULL,
+                created_at TEXT,
+                PRIMARY KEY (md5, model)
+            )
+            """
+        )
+        conn.commit()
+        
+        if needs_migration:
+            _migrate_from_json(conn)
+        
+        _conn = conn
+        return _conn
+
+def _migrate_from_json(conn: sqlite3.Connection):
+    """
+    将旧版 file_metadata.json 中的记录导入 SQLite（只在数据库首次创建时执行）
+    
+    Args:
+        conn: SQLite 连接
+    """
+    try:
+        with open(METADATA_FILE, 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+    except Exception:
+        return
+    
+    files = metadata.get("files") if isinstance(metadata, dict) else None
+    if not isinstance(files, dict):
+        return
+    
+    rows = []
+    for md5, info in files.items():
+        if not isinstance(info, dict):
+            continue
+        rows.append((
+            info.get("md5", md5),
+            info.get("filename"),
+            info.get("stored_path"),
+            info.get("content", ""),
+            info.get("size", 0),
+            info.get("reference_count", 1),
+            info.get("created_at"),
+            info.get("last_accessed"),
+        ))
+    
+    with conn:
+        conn.executemany(
+            f"INSERT OR IGNORE INTO files ({_SELECT_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
 
-def calculate_md5(file_path: str) -> str:
+def _new_digest():
+    """创建去重用的哈希对象（BLAKE2b-128，非密码学用途）"""
+    return hashlib.blake2b(digest_size=DIGEST_SIZE, usedforsecurity=False)
+
+def calculate_digest(file_path: str) -> str:
     """
-    计算文件的MD5值
+    计算文件的内容摘要（用于去重）
     
     Args:
         file_path: 文件路径
         
     Returns:
-        MD5哈希值
+        摘要的十六进制字符串
     """
-    md5_hash = hashlib.md5()
     with open(file_path, "rb") as f:
-        # 分块读取以处理大文件
-        for chunk in iter(lambda: f.read(4096), b""):
-            md5_hash.update(chunk)
-    return md5_hash.hexdigest()
+        # Python 3.11+ 使用 hashlib.file_digest（C 层按大缓冲区读取）
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, _new_digest).hexdigest()
+        
+        # 分块读取以处理大文件（使用较大的块减少 Python 循环次数）
+        digest = _new_digest()
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
 
-def load_metadata() -> Dict[str, Any]:
+def calculate_legacy_digest(file_path: str) -> str:
     """
-    加载文件元数据
+    计算文件的旧版摘要（MD5，仅用于匹配旧版本写入的记录）
     
+    Args:
+        file_path: 文件路径
+        
     Returns:
-        文件元数据字典
+        MD5 的十六进制字符串
     """
-    if os.path.exists(METADATA_FILE):
-        try:
-            with open(METADATA_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception:
-            return {"files": {}}
-    return {"files": {}}
+    with open(file_path, "rb") as f:
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, lambda: hashlib.md5(usedforsecurity=False)).hexdigest()
+        
+        digest = hashlib.md5(usedforsecurity=False)
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
 
-def save_metadata(metadata: Dict[str, Any]):
+def save_file_with_digest(src, dest_path: str, chunk_size: int = 1024 * 1024) -> str:
     """
-    保存文件元数据
+    将上传的文件流写入磁盘，同时计算摘要（边写边算，无需写完后再读一遍文件）
     
     Args:
-        metadata: 文件元数据字典
+        src: 可读的二进制文件对象
+        dest_path: 目标文件路径
+        chunk_size: 每次读取的字节数
+        
+    Returns:
+        摘要的十六进制字符串
     """
-    with open(METADATA_FILE, 'w', encoding='utf-8') as f:
-        json.dump(metadata, f, ensure_ascii=False, indent=2)
+    digest = _new_digest()
+    with open(dest_path, "wb") as f:
+        for chunk in iter(lambda: src.read(chunk_size), b""):
+            digest.update(chunk)
+            f.write(chunk)
+    return digest.hexdigest()
+
+def _fetch_file(conn: sqlite3.Connection, md5: str) -> Optional[Dict[str, Any]]:
+    """按 MD5 读取一条文件记录"""
+    row = conn.execute(
+        f"SELECT {_SELECT_COLUMNS} FROM files WHERE md5 = ?", (md5,)
+    ).fetchone()
+    return dict(row) if row else None
 
 def get_file_by_md5(md5: str) -> Optional[Dict[str, Any]]:
     """
@@ -69,8 +225,43 @@ def get_file_by_md5(md5: str) -> Optional[Dict[str, Any]]:
     Returns:
         文件信息或None
     """
-    metadata = load_metadata()
-    return metadata["files"].get(md5)
+    conn = _get_connection()
+    with _conn_lock:
+        return _fetch_file(conn, md5)
+
+def find_duplicate(digest: str, file_path: str) -> Optional[Dict[str, Any]]:
+    """
+    查找与上传文件内容相同的已有文件
+    
+    先按当前算法的摘要查找；库中还有旧版 MD5 记录时，再计算文件的 MD5 按旧键查找一次
+    （没有旧记录时不计算 MD5）
+    
+    Args:
+        digest: 当前算法的文件摘要
+        file_path: 上传文件的路径（用于计算 MD5）
+        
+    Returns:
+        已有文件的信息（其中 md5 字段为该记录的键），不存在时返回 None
+    """
+    conn = _get_connection()
+    with _conn_lock:
+        file_info = _fetch_file(conn, digest)
+        if file_info:
+            return file_info
+        has_legacy = conn.execute(
+            "SELECT 1 FROM files WHERE digest_alg = ? LIMIT 1", (LEGACY_DIGEST_ALG,)
+        ).fetchone() is not None
+    
+    if not has_legacy:
+        return None
+    
+    legacy_digest = calculate_legacy_digest(file_path)
+    with _conn_lock:
+        row = conn.execute(
+            f"SELECT {_SELECT_COLUMNS} FROM files WHERE md5 = ? AND digest_alg = ?",
+            (legacy_digest, LEGACY_DIGEST_ALG)
+        ).fetchone()
+    return dict(row) if row else None
 
 def add_file(
     file_path: str,
@@ -94,37 +285,24 @@ def add_file(
     """
     ensure_directories()
     
-    # 计算MD5(如果未提供)
+    # 计算摘要(如果未提供)
     if md5 is None:
-        md5 = calculate_md5(file_path)
-    
-    # 检查是否已存在
-    existing_file = get_file_by_md5(md5)
-    if existing_file:
-        # 文件已存在,增加引用计数
-        metadata = load_metadata()
-        metadata["files"][md5]["reference_count"] += 1
-        metadata["files"][md5]["last_accessed"] = datetime.now().isoformat()
-        save_metadata(metadata)
-        return metadata["files"][md5]
-    
-    # 新文件,添加到元数据
-    file_info = {
-        "md5": md5,
-        "filename": original_filename,
-        "stored_path": file_path,
-        "content": content,
-        "size": size,
-        "reference_count": 1,
-        "created_at": datetime.now().isoformat(),
-        "last_accessed": datetime.now().isoformat()
-    }
-    
-    metadata = load_metadata()
-    metadata["files"][md5] = file_info
-    save_metadata(metadata)
-    
-    return file_info
+        md5 = calculate_digest(file_path)
+    
+    now = datetime.now().isoformat()
+    conn = _get_connection()
+    with _conn_lock, conn:
+        # 新文件插入记录；已存在则增加引用计数
+        cursor = conn.execute(
+            f"INSERT OR IGNORE INTO files ({_SELECT_COLUMNS}, digest_alg) VALUES (?, ?, ?, ?, ?, 1, ?, ?, ?)",
+            (md5, original_filename, file_path, content, size, now, now, DIGEST_ALG)
+        )
+        if cursor.rowcount == 0:
+            conn.execute(
+                "UPDATE files SET reference_count = reference_count + 1, last_accessed = ? WHERE md5 = ?",
+                (now, md5)
+            )
+        return _fetch_file(conn, md5)
 
 def get_all_files() -> List[Dict[str, Any]]:
     """
@@ -133,8 +311,12 @@ def get_all_files() -> List[Dict[str, Any]]:
     Returns:
         文件信息列表
     """
-    metadata = load_metadata()
-    return list(metadata["files"].values())
+    conn = _get_connection()
+    with _conn_lock:
+        rows = conn.execute(
+            f"SELECT {_SELECT_COLUMNS} FROM files ORDER BY rowid"
+        ).fetchall()
+    return [dict(row) for row in rows]
 
 def delete_file(md5: str) -> bool:
     """
@@ -146,28 +328,31 @@ def delete_file(md5: str) -> bool:
     Returns:
         是否删除成功
     """
-    metadata = load_metadata()
-    file_info = metadata["files"].get(md5)
-    
-    if not file_info:
-        return False
-    
-    # 减少引用计数
-    file_info["reference_count"] -= 1
-    
-    # 如果引用计数为0,删除文件
-    if file_info["reference_count"] <= 0:
-        # 删除物理文件
-        if os.path.exists(file_info["stored_path"]):
-            try:
-                os.remove(file_info["stored_path"])
-            except Exception:
-                pass
+    conn = _get_connection()
+    with _conn_lock, conn:
+        file_info = _fetch_file(conn, md5)
+        if not file_info:
+            return False
         
-        # 从元数据中删除
-        del metadata["files"][md5]
+        # 减少引用计数
+        reference_count = file_info["reference_count"] - 1
+        
+        # 如果引用计数为0,删除记录
+        if reference_count <= 0:
+            conn.execute("DELETE FROM files WHERE md5 = ?", (md5,))
+        else:
+            conn.execute(
+                "UPDATE files SET reference_count = ? WHERE md5 = ?",
+                (reference_count, md5)
+            )
+    
+    # 引用计数为0时删除物理文件
+    if reference_count <= 0 and os.path.exists(file_info["stored_path"]):
+        try:
+            os.remove(file_info["stored_path"])
+        except Exception:
+            pass
     
-    save_metadata(metadata)
     return True
 
 def get_file_path(md5: str) -> Optional[str]:
@@ -180,9 +365,13 @@ def get_file_path(md5: str) -> Optional[str]:
     Returns:
         文件路径或None
     """
-    file_info = get_file_by_md5(md5)
-    if file_info:
-        return file_info["stored_path"]
+    conn = _get_connection()
+    with _conn_lock:
+        row = conn.execute(
+            "SELECT stored_path FROM files WHERE md5 = ?", (md5,)
+        ).fetchone()
+    if row:
+        return row["stored_path"]
     return None
 
 def update_last_accessed(md5: str):
@@ -192,7 +381,43 @@ def update_last_accessed(md5: str):
     Args:
         md5: 文件MD5值
     """
-    metadata = load_metadata()
-    if md5 in metadata["files"]:
-        metadata["files"][md5]["last_accessed"] = datetime.now().isoformat()
-        save_metadata(metadata)
\ No newline at end of file
+    conn = _get_connection()
+    with _conn_lock, conn:
+        conn.execute(
+            "UPDATE files SET last_accessed = ? WHERE md5 = ?",
+            (datetime.now().isoformat(), md5)
+        )
+
+def get_cached_extraction(md5: str, model_version: str) -> Optional[str]:
+    """
+    查找已缓存的 MinerU 解析结果
+    
+    Args:
+        md5: 文件内容摘要
+        model_version: MinerU 模型版本
+        
+    Returns:
+        解析出的文本内容，未缓存时返回 None
+    """
+    conn = _get_connection()
+    with _conn_lock:
+        row = conn.execute(
+            "SELECT content FROM mineru_cache WHERE md5 = ? AND model = ?", (md5, model_version)
+        ).fetchone()
+    return row["content"] if row else None
+
+def cache_extraction(md5: str, model_version: str, content: str):
+    """
+    缓存 MinerU 解析结果（只缓存成功解析出的内容）
+    
+    Args:
+        md5: 文件内容摘要
+        model_version: MinerU 模型版本
+        content: 解析出的文本内容
+    """
+    conn = _get_connection()
+    with _conn_lock, conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO mineru_cache (md5, model, content, created_at) VALUES (?, ?, ?, ?)",
+            (md5, model_version, content, datetime.now().isoformat())
+        )
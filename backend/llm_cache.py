@@ -0,0 +1,138 @@
+"""
+会议结果缓存模块
+对相同的问题（相同上下文、附件、参会模型、主席和温度）直接复用上一次的四阶段结果，
+避免重复发起 N*(N+1) 次 LLM 请求
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# 常量配置
+DEFAULT_MAX_SIZE = 128  # 最多缓存的会议结果数
+DEFAULT_TTL = 3600  # 缓存有效期(秒)
+
+
+def is_cacheable_result(
+    stage1_results: List[Dict[str, Any]],
+    stage2_results: List[Dict[str, Any]],
+    stage3_result: Dict[str, Any]
+) -> bool:
+    """
+    判断会议结果是否可以缓存
+
+    任一模型查询失败或因掉队超时被取消时不缓存，否则相同的问题会在整个有效期内重放这些失败
+
+    Args:
+        stage1_results: Stage 1 的响应结果
+        stage2_results: Stage 2 的打分结果
+        stage3_result: Stage 3 的主席综合结果
+
+    Returns:
+        所有阶段都成功时返回 True
+    """
+    if stage3_result.get("error"):
+        return False
+    for result in (*stage1_results, *stage2_results):
+        if result.get("error") or result.get("timed_out"):
+            return False
+    return True
+
+
+class LLMCache:
+    """内存 LRU 缓存，带过期时间"""
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, ttl: int = DEFAULT_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        # key -> (写入时间, 缓存值)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    @staticmethod
+    def make_key(
+        query: str,
+        context: str,
+        attachments: Optional[List[Dict[str, Any]]],
+        models: List[str],
+        chairman: str,
+        temperature: float
+    ) -> str:
+        """
+        根据请求参数生成缓存键
+
+        Args:
+            query: 用户问题
+            context: 历史对话上下文
+            attachments: 附件列表
+            models: 参会模型名称列表
+            chairman: 主席模型名称
+            temperature: 温度参数
+
+        Returns:
+            sha256 十六进制字符串
+        """
+        attachments_digest = hashlib.sha256()
+        for att in attachments or []:
+            attachments_digest.update(att.get("name", "").encode("utf-8"))
+            attachments_digest.update(b"\0")
+            attachments_digest.update(att.get("content", "").encode("utf-8"))
+            attachments_digest.update(b"\0")
+
+        payload = json.dumps({
+            "q": query.strip().lower(),
+            "ctx": context,
+            "att": attachments_digest.hexdigest(),
+            "models": sorted(models),
+            "chairman": chairman,
+            "t": temperature
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        读取缓存，过期条目会被删除
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            缓存值的深拷贝（调用方可以随意修改），未命中返回 None
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        stored_at, value = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return copy.deepcopy(value)
+
+    def set(self, key: str, value: Any):
+        """
+        写入缓存（保存深拷贝，调用方之后的修改不影响缓存），超出容量时淘汰最久未使用的条目
+
+        Args:
+            key: 缓存键
+            value: 缓存值
+        """
+        self._entries[key] = (time.monotonic(), copy.deepcopy(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """清空缓存"""
+        self._entries.clear()
+
+
+# 全局缓存实例
+llm_cache = LLMCache()
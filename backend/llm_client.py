@@ -5,19 +5,591 @@ LLM 客户端模块
 
 import asyncio
 import httpx
+import json
 import logging
-from typing import List, Dict, Any, Optional
-from datetime import datetime
+import random
+import statistics
+import time
+from collections import deque
+from typing import List, Dict, Any, Optional, AsyncGenerator, Tuple
+from urllib.parse import urlparse
+
+from models import get_iso_timestamp
+from log_context import get_meeting_logger
+
+# orjson 为可选依赖，解析较大的模型响应时明显快于标准库 json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# HTTP/2 需要可选依赖 h2（pip install httpx[http2]），可在同一连接上多路复用并发请求
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
-logger = logging.getLogger(__name__)
+logger = get_meeting_logger(__name__)
 
 # 常量配置
-BASE_BACKOFF = 1  # 基础退避时间(秒)
+BASE_BACKOFF = 0.5  # 基础退避时间(秒)
+MAX_BACKOFF = 8  # 最大退避时间(秒)
+MAX_RETRY_AFTER = 60  # 遵循 Retry-After 时的最长等待时间(秒)
+RETRY_AFTER_STATUS_CODES = (429, 503)  # 会携带 Retry-After 的状态码
+LATENCY_WINDOW = 50  # 每个供应商保留的最近成功请求耗时数量
+LATENCY_MIN_SAMPLES = 5  # 样本数达到该值后才启用自适应超时
+LATENCY_TIMEOUT_FACTOR = 2.0  # 自适应超时 = 中位耗时 * 该系数
+MIN_ADAPTIVE_TIMEOUT = 15  # 自适应超时的下限(秒)
+HOST_MAX_CONCURRENCY = 16  # 同一主机的默认最大并发请求数（会议中默认取 max_concurrent）
+HOST_RATE_PER_SECOND = 10  # 同一主机默认每秒允许发起的请求数(令牌补充速率)
+HOST_BURST = 20  # 同一主机默认允许的突发请求数(令牌桶容量)
+HOST_WAIT_LOG_THRESHOLD = 0.5  # 限流等待超过该时长(秒)时记录日志
+
+# 全局共享的 HTTP 客户端（懒加载），各阶段复用同一连接池
+_shared_client: Optional[httpx.AsyncClient] = None
+
+
+def get_shared_client() -> httpx.AsyncClient:
+    """
+    获取全局共享的 HTTP 客户端，首次调用时创建
+    
+    超时时间由每次请求单独指定（client.post(..., timeout=...)），
+    这样不同阶段可以复用同一个连接池，避免重复的 TCP/TLS 握手。
+    
+    Returns:
+        共享的 httpx.AsyncClient 实例
+    """
+    global _shared_client
+    if _shared_client is None or _shared_client.is_closed:
+        _shared_client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=100)
+        )
+    return _shared_client
+
+
+class LatencyTracker:
+    """
+    按模型和阶段记录最近的请求耗时，用于计算自适应的单次请求超时
+    
+    慢请求往往是尾部异常（排队、连接卡住），在中位耗时的数倍处放弃并重试，
+    通常比一直等到全局 timeout 更快拿到结果
+    
+    同一供应商下的模型耗时差异很大（对话模型与推理模型），按模型统计，
+    避免慢模型被快模型拉低的中位耗时误判超时
+    """
+    
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self._samples: Dict[str, deque] = {}
+    
+    def record(self, key: str, seconds: float):
+        """
+        记录一次成功请求的耗时
+        
+        Args:
+            key: 统计键（通常为 模型/阶段）
+            seconds: 耗时(秒)
+        """
+        samples = self._samples.get(key)
+        if samples is None:
+            samples = self._samples[key] = deque(maxlen=self.window)
+        samples.append(seconds)
+    
+    def get_timeout(self, key: str, default: float) -> float:
+        """
+        获取单次请求的超时时间
+        
+        Args:
+            key: 统计键
+            default: 配置的超时时间(秒)，同时作为上限
+        
+        Returns:
+            样本足够时为 clamp(中位耗时 * LATENCY_TIMEOUT_FACTOR, MIN_ADAPTIVE_TIMEOUT, default)，否则为 default
+        """
+        samples = self._samples.get(key)
+        if not samples or len(samples) < LATENCY_MIN_SAMPLES:
+            return default
+        adaptive = statistics.median(samples) * LATENCY_TIMEOUT_FACTOR
+        return min(default, max(MIN_ADAPTIVE_TIMEOUT, adaptive))
+    
+    def percentiles(self) -> Dict[str, Dict[str, float]]:
+        """
+        获取各统计键的耗时分位数
+        
+        Returns:
+            {key: {"count": 样本数, "p50": ..., "p95": ..., "p99": ...}}（单位: 秒）
+        """
+        result = {}
+        for key, samples in self._samples.items():
+            if not samples:
+                continue
+            if len(samples) == 1:
+                p50 = p95 = p99 = samples[0]
+            else:
+                cuts = statistics.quantiles(samples, n=100, method="inclusive")
+                p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+            result[key] = {
+                "count": len(samples),
+                "p50": round(p50, 3),
+                "p95": round(p95, 3),
+                "p99": round(p99, 3)
+            }
+        return result
+
+
+# 全局耗时统计实例
+latency_tracker = LatencyTracker()
+
+
+class HostThrottle:
+    """
+    单个主机的限流器：并发上限 + 令牌桶限速
+    
+    收到 429/503 且带 Retry-After 时调用 pause()，之后发往该主机的所有请求都会等到
+    暂停结束再发出，避免多个模型同时撞上限流、各自浪费一次重试
+    """
+    
+    def __init__(
+        self,
+        rate: float = HOST_RATE_PER_SECOND,
+        burst: int = HOST_BURST,
+        concurrency: int = HOST_MAX_CONCURRENCY,
+        host: str = ""
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+        self.host = host
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self):
+        """等待并发名额和令牌（按到达顺序排队），等待较久时记录日志"""
+        start = time.monotonic()
+        await self._semaphore.acquire()
+        try:
+            async with self._lock:
+                while True:
+                    now = time.monotonic()
+                    if now < self._paused_until:
+                        await asyncio.sleep(self._paused_until - now)
+                        continue
+                    
+                    self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        break
+                    await asyncio.sleep((1 - self._tokens) / self.rate)
+        except BaseException:
+            self._semaphore.release()
+            raise
+        
+        waited = time.monotonic() - start
+        if waited >= HOST_WAIT_LOG_THRESHOLD:
+            logger.info(
+                "主机 %s 限流等待 %.1f 秒（并发上限 %s，速率 %s/秒，突发 %s）",
+                self.host, waited, self.concurrency, self.rate, self.burst
+            )
+    
+    def release(self):
+        """释放并发名额"""
+        self._semaphore.release()
+    
+    def pause(self, seconds: float):
+        """
+        暂停向该主机发送新请求
+        
+        Args:
+            seconds: 暂停时长(秒)
+        """
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        logger.warning("主机 %s 要求等待 %.1f 秒(Retry-After)，暂停发送新请求", self.host, seconds)
+    
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+
+# 按主机(netloc)划分的限流器
+_host_throttles: Dict[str, HostThrottle] = {}
+
+# 新建限流器使用的 (速率, 突发, 并发上限)
+_host_limits: Tuple[float, int, int] = (HOST_RATE_PER_SECOND, HOST_BURST, HOST_MAX_CONCURRENCY)
+
+
+def configure_host_throttles(settings: Dict[str, Any]):
+    """
+    根据系统设置配置主机限流
+    
+    - host_max_concurrency: 同一主机的最大并发数，默认等于 max_concurrent
+    - host_rate_per_second: 同一主机每秒允许发起的请求数，默认 HOST_RATE_PER_SECOND
+    - host_burst: 同一主机允许的突发请求数，默认不小于 max_concurrent
+    
+    限制变化时丢弃现有的限流器，之后的请求使用新限制；进行中的请求仍在旧限流器上释放
+    
+    Args:
+        settings: 配置中的 settings 字典
+    """
+    global _host_limits
+    max_concurrent = settings.get("max_concurrent", 10)
+    limits = (
+        settings.get("host_rate_per_second") or HOST_RATE_PER_SECOND,
+        settings.get("host_burst") or max(HOST_BURST, max_concurrent),
+        settings.get("host_max_concurrency") or max_concurrent
+    )
+    if limits != _host_limits:
+        _host_limits = limits
+        _host_throttles.clear()
+        logger.info("主机限流: 速率 %s/秒，突发 %s，并发上限 %s", *limits)
+
+
+def get_host_throttle(url: str) -> HostThrottle:
+    """
+    获取请求地址所属主机的限流器，首次访问时创建
+    
+    Args:
+        url: 请求地址
+    
+    Returns:
+        HostThrottle 实例
+    """
+    host = urlparse(url).netloc
+    throttle = _host_throttles.get(host)
+    if throttle is None:
+        throttle = _host_throttles[host] = HostThrottle(*_host_limits, host=host)
+    return throttle
+
+
+# 全局上游并发信号量（懒加载），所有会议共享，按 (并发上限, 信号量) 保存
+_upstream_semaphore: Optional[Tuple[int, asyncio.BoundedSemaphore]] = None
+
+
+def get_upstream_semaphore(max_concurrent: int) -> asyncio.BoundedSemaphore:
+    """
+    获取全局共享的上游请求信号量，限制所有会议同时发往模型供应商的请求总数
+    
+    并发上限变化（设置被修改）时重新创建；旧信号量上的请求完成后自然释放
+    
+    Args:
+        max_concurrent: 最大并发数
+    
+    Returns:
+        asyncio.BoundedSemaphore 实例
+    """
+    global _upstream_semaphore
+    if _upstream_semaphore is None or _upstream_semaphore[0] != max_concurrent:
+        _upstream_semaphore = (max_concurrent, asyncio.BoundedSemaphore(max_concurrent))
+        logger.info("上游并发上限: %s", max_concurrent)
+    return _upstream_semaphore[1]
+
+
+def parse_retry_after(response: Optional[httpx.Response]) -> Optional[float]:
+    """
+    解析 429/503 响应中的 Retry-After(秒数)
+    
+    Args:
+        response: HTTP 响应
+    
+    Returns:
+        等待时间(秒，已限制在 MAX_RETRY_AFTER 以内)，无法解析时返回 None
+    """
+    if response is None or response.status_code not in RETRY_AFTER_STATUS_CODES:
+        return None
+    retry_after = response.headers.get("Retry-After")
+    if not retry_after:
+        return None
+    try:
+        return min(max(float(retry_after), 0.0), MAX_RETRY_AFTER)
+    except ValueError:
+        return None  # HTTP 日期格式不解析
+
+
+async def post_with_deadline(
+    client: httpx.AsyncClient,
+    url: str,
+    request_body: Dict[str, Any],
+    headers: Dict[str, str],
+    timeout: float,
+    latency_key: str,
+    final_attempt: bool = False
+) -> httpx.Response:
+    """
+    发送一次 LLM 请求，并用 asyncio.wait_for 限制整个请求的总耗时
+    
+    httpx 的 timeout 只限制单次读写的间隔，服务端持续缓慢输出时请求可能远超 timeout；
+    这里额外设置总时限。非最后一次尝试使用基于历史中位耗时的自适应超时，
+    最后一次尝试使用完整的 timeout，避免正常的长回答被误判为超时
+    
+    Args:
+        client: HTTP 客户端
+        url: 请求地址
+        request_body: 请求体
+        headers: 请求头
+        timeout: 配置的超时时间(秒)
+        latency_key: 耗时统计键（通常为 模型/阶段）
+        final_attempt: 是否为最后一次尝试
+    
+    Returns:
+        HTTP 响应
+    
+    Raises:
+        httpx.TimeoutException: 超过总时限
+    """
+    call_timeout = timeout if final_attempt else latency_tracker.get_timeout(latency_key, timeout)
+    throttle = get_host_throttle(url)
+    async with throttle:
+        # 计时从拿到限流名额后开始，排队时间不计入总时限和耗时统计
+        start = time.monotonic()
+        try:
+            response = await asyncio.wait_for(
+                client.post(url, json=request_body, headers=headers, timeout=call_timeout),
+                timeout=call_timeout
+            )
+        except asyncio.TimeoutError:
+            raise httpx.TimeoutException(f"请求超过 {call_timeout:.0f} 秒未完成")
+    
+    if response.is_success:
+        latency_tracker.record(latency_key, time.monotonic() - start)
+    else:
+        # 服务端要求等待时，暂停发往该主机的所有请求
+        retry_after = parse_retry_after(response)
+        if retry_after:
+            throttle.pause(retry_after)
+    return response
+
+
+def extract_stream_delta(data: Dict[str, Any], api_type: str) -> str:
+    """
+    从流式响应的一个 SSE 数据块中提取新增文本
+    
+    Args:
+        data: 数据块 JSON
+        api_type: API 类型("openai" 或 "anthropic")
+    
+    Returns:
+        新增文本(无文本时为空字符串)
+    """
+    if api_type == "anthropic":
+        # Anthropic: {"type": "content_block_delta", "delta": {"type": "text_delta", "text": "..."}}
+        if data.get("type") == "content_block_delta":
+            return data.get("delta", {}).get("text", "") or ""
+        return ""
+    
+    # OpenAI: {"choices": [{"delta": {"content": "..."}}]}
+    choices = data.get("choices")
+    if choices:
+        return (choices[0].get("delta") or {}).get("content") or ""
+    return ""
+
+
+async def stream_with_deadline(
+    client: httpx.AsyncClient,
+    url: str,
+    request_body: Dict[str, Any],
+    headers: Dict[str, str],
+    timeout: float,
+    latency_key: str,
+    api_type: str = "openai",
+    final_attempt: bool = False
+) -> AsyncGenerator[str, None]:
+    """
+    以流式(SSE)方式发送一次 LLM 请求，逐块产出新增文本
+    
+    与 post_with_deadline 相同：整个请求受总时限约束（非最后一次尝试使用自适应超时），
+    并经过按主机的限流器。request_body 需已包含 "stream": True
+    
+    Args:
+        client: HTTP 客户端
+        url: 请求地址
+        request_body: 请求体
+        headers: 请求头
+        timeout: 配置的超时时间(秒)
+        latency_key: 耗时统计键（通常为 模型/阶段）
+        api_type: API 类型("openai" 或 "anthropic")
+        final_attempt: 是否为最后一次尝试
+    
+    Yields:
+        新增文本片段
+    
+    Raises:
+        httpx.TimeoutException: 超过总时限
+        httpx.HTTPStatusError: 响应状态码表示失败
+    """
+    call_timeout = timeout if final_attempt else latency_tracker.get_timeout(latency_key, timeout)
+    throttle = get_host_throttle(url)
+    async with throttle:
+        start = time.monotonic()
+        deadline = start + call_timeout
+        request = client.build_request("POST", url, json=request_body, headers=headers, timeout=call_timeout)
+        try:
+            response = await asyncio.wait_for(client.send(request, stream=True), timeout=call_timeout)
+        except asyncio.TimeoutError:
+            raise httpx.TimeoutException(f"请求超过 {call_timeout:.0f} 秒未完成")
+        
+        try:
+            if not response.is_success:
+                await response.aread()
+                retry_after = parse_retry_after(response)
+                if retry_after:
+                    throttle.pause(retry_after)
+                response.raise_for_status()
+            
+            lines = response.aiter_lines()
+            while True:
+                try:
+                    line = await asyncio.wait_for(lines.__anext__(), timeout=deadline - time.monotonic())
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    raise httpx.TimeoutException(f"请求超过 {call_timeout:.0f} 秒未完成")
+                
+                # 只处理 "data:" 行，忽略 event/注释/空行
+                if not line.startswith("data:"):
+                    continue
+                payload = line[5:].strip()
+                if payload == "[DONE]":
+                    break
+                if not payload:
+                    continue
+                
+                data = orjson.loads(payload) if orjson is not None else json.loads(payload)
+                delta = extract_stream_delta(data, api_type)
+                if delta:
+                    yield delta
+        finally:
+            await response.aclose()
+    
+    latency_tracker.record(latency_key, time.monotonic() - start)
+
+
+def get_backoff_time(attempt: int, error: Optional[Exception] = None, max_backoff: float = MAX_BACKOFF) -> float:
+    """
+    计算重试前的等待时间
+    
+    - 429/503 且响应带有 Retry-After(秒数) 时，优先遵循服务端给出的等待时间
+    - 否则使用全抖动指数退避: uniform(0, min(max_backoff, BASE_BACKOFF * 2^attempt))，
+      避免多个模型同时失败时在同一时刻集中重试
+    
+    Args:
+        attempt: 当前尝试次数(从 0 开始)
+        error: 本次尝试捕获的异常
+        max_backoff: 指数退避的最长等待时间(秒)
+    
+    Returns:
+        等待时间(秒)
+    """
+    if isinstance(error, httpx.HTTPStatusError):
+        retry_after = parse_retry_after(error.response)
+        if retry_after is not None:
+            return retry_after
+    
+    return random.uniform(0, min(max_backoff, BASE_BACKOFF * (2 ** attempt)))
+
+
+def parse_json_response(response: httpx.Response) -> Any:
+    """
+    解析响应 JSON（有 orjson 时直接解析原始字节，跳过 httpx 的标准库 json 解析）
+    
+    Args:
+        response: HTTP 响应
+        
+    Returns:
+        解析后的 JSON 数据
+    """
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+
+def get_api_model_name(model_config: Dict[str, Any]) -> str:
+    """
+    获取发给 API 的模型名称（不含供应商后缀）
+    
+    build_model_configs 构建的配置已带有 api_model_name；其他来源的配置按
+    "model_name/provider" 格式去掉最后一个 '/' 及其后面的内容
+    （model_name 本身可能包含 '/'，如 "Qwen/Qwen3-VL-30B/provider"）
+    
+    Args:
+        model_config: 模型配置
+        
+    Returns:
+        实际的模型名称
+    """
+    api_model_name = model_config.get("api_model_name")
+    if api_model_name:
+        return api_model_name
+    return model_config.get("name", "unknown").rsplit('/', 1)[0]
+
+
+def extract_openai_content(data: Dict[str, Any]) -> str:
+    """
+    从 OpenAI 兼容格式的响应中提取文本内容
+    
+    Args:
+        data: 响应 JSON
+        
+    Returns:
+        文本内容(无内容时为空字符串)
+    """
+    if "choices" in data and len(data["choices"]) > 0:
+        choice = data["choices"][0]
+        if "message" in choice:
+            return choice["message"].get("content", "")
+        if "text" in choice:
+            return choice.get("text", "")
+    return ""
+
+
+def extract_anthropic_content(data: Dict[str, Any]) -> str:
+    """
+    从 Anthropic 格式的响应中提取文本内容
+    
+    Args:
+        data: 响应 JSON
+        
+    Returns:
+        文本内容(无内容时为空字符串)
+    """
+    if "content" in data and len(data["content"]) > 0:
+        return data["content"][0].get("text", "")
+    return ""
+
+
+def get_content_extractor(api_type: str):
+    """
+    根据 API 类型选择响应内容提取函数（在重试循环外确定一次即可）
+    
+    Args:
+        api_type: API 类型("openai" 或 "anthropic")
+        
+    Returns:
+        提取函数
+    """
+    if api_type == "anthropic":
+        return extract_anthropic_content
+    return extract_openai_content
+
+
+async def close_shared_client():
+    """关闭全局共享的 HTTP 客户端（应用关闭时调用）"""
+    global _shared_client
+    if _shared_client is not None and not _shared_client.is_closed:
+        await _shared_client.aclose()
+    _shared_client = None
 
 
 async def query_model(
@@ -59,24 +631,13 @@ async def query_model(
         return {
             "model": model_name,
             "response": "",
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": get_iso_timestamp(),
             "error": error_msg
         }
     
-    # 提取实际的模型名称（去掉供应商后缀）
-    # 模型名称格式为 "model_name/provider"，需要去掉最后的 "/provider"
-    # 注意：model_name 本身可能包含 '/'，如 "Qwen/Qwen3-VL-30B/provider"
-    # 所以我们需要去掉最后一个 '/' 及其后面的内容
-    if '/' in model_name:
-        # 找到最后一个 '/' 的位置，去掉供应商部分
-        parts = model_name.rsplit('/', 1)  # 从右边分割，只分割一次
-        actual_model_name = parts[0]  # 取前面的部分作为实际模型名
-    else:
-        actual_model_name = model_name
-    
     # 构建请求体
     request_body = {
-        "model": actual_model_name,
+        "model": get_api_model_name(model_config),
         "messages": messages,
         "temperature": temperature
     }
@@ -97,49 +658,45 @@ async def query_model(
             "Authorization": f"Bearer {api_key}"
         }
     
+    # 根据 API 类型确定响应内容提取方式
+    extract_content = get_content_extractor(api_type)
+    
     # 重试逻辑
     last_error = None
+    last_exception = None
     for attempt in range(max_retries):
         try:
-            logger.info(f"查询模型 {model_name} (尝试 {attempt + 1}/{max_retries})")
+            logger.info("查询模型 %s (尝试 %s/%s)", model_name, attempt + 1, max_retries)
+            
+            response = await post_with_deadline(
+                get_shared_client(),
+                url,
+                request_body,
+                headers,
+                timeout,
+                latency_key=f"{model_name}/query",
+                final_attempt=attempt == max_retries - 1
+            )
+            
+            response.raise_for_status()
+            data = parse_json_response(response)
+            
+            content = extract_content(data)
+            
+            logger.info("模型 %s 响应成功", model_name)
+            return {
+                "model": model_name,
+                "response": content,
+                "timestamp": get_iso_timestamp()
+            }
             
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                response = await client.post(
-                    url,
-                    json=request_body,
-                    headers=headers
-                )
-                
-                response.raise_for_status()
-                data = response.json()
-                
-                # 根据 API 类型提取响应内容
-                content = ""
-                if api_type == "anthropic":
-                    # Anthropic API 响应格式
-                    if "content" in data and len(data["content"]) > 0:
-                        content = data["content"][0].get("text", "")
-                else:
-                    # OpenAI API 响应格式
-                    if "choices" in data and len(data["choices"]) > 0:
-                        choice = data["choices"][0]
-                        if "message" in choice:
-                            content = choice["message"].get("content", "")
-                        elif "text" in choice:
-                            content = choice.get("text", "")
-                
-                logger.info(f"模型 {model_name} 响应成功")
-                return {
-                    "model": model_name,
-                    "response": content,
-                    "timestamp": datetime.utcnow().isoformat() + "Z"
-                }
-                
         except httpx.TimeoutException as e:
+            last_exception = e
             last_error = f"请求超时: {str(e)}"
-            logger.warning(f"模型 {model_name} 请求超时 (尝试 {attempt + 1}/{max_retries})")
+            logger.warning("模型 %s 请求超时 (尝试 %s/%s)", model_name, attempt + 1, max_retries)
             
         except httpx.HTTPStatusError as e:
+            last_exception = e
             # 只记录状态码和简短描述,避免打印HTML错误页面
             status_code = e.response.status_code
             # 尝试解析JSON错误信息
@@ -166,25 +723,26 @@ async def query_model(
                 status_msg = status_messages.get(status_code, "未知错误")
                 last_error = f"HTTP {status_code}: {status_msg}"
             
-            logger.warning(f"模型 {model_name} 查询失败,已重试 {attempt + 1} 次: {last_error}")
+            logger.warning("模型 %s 查询失败,已重试 %s 次: %s", model_name, attempt + 1, last_error)
             
         except Exception as e:
+            last_exception = e
             last_error = f"未知错误: {str(e)}"
-            logger.warning(f"模型 {model_name} 发生错误 (尝试 {attempt + 1}/{max_retries}): {last_error}")
+            logger.warning("模型 %s 发生错误 (尝试 %s/%s): %s", model_name, attempt + 1, max_retries, last_error)
         
-        # 如果不是最后一次尝试,则等待后重试(指数退避)
+        # 如果不是最后一次尝试,则等待后重试(带抖动的指数退避，429/503 时遵循 Retry-After)
         if attempt < max_retries - 1:
-            backoff_time = BASE_BACKOFF * (2 ** attempt)
-            logger.info(f"等待 {backoff_time} 秒后重试...")
+            backoff_time = get_backoff_time(attempt, last_exception)
+            logger.info("等待 %.1f 秒后重试...", backoff_time)
             await asyncio.sleep(backoff_time)
     
     # 所有重试都失败
     error_msg = f"查询失败,已重试 {max_retries} 次: {last_error}"
-    logger.error(f"模型 {model_name} {error_msg}")
+    logger.error("模型 %s %s", model_name, error_msg)
     return {
         "model": model_name,
         "response": "",
-        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "timestamp": get_iso_timestamp(),
         "error": error_msg
     }
 
@@ -211,7 +769,7 @@ async def query_models_parallel(
     Returns:
         响应列表,每个元素格式与 query_model 返回值相同
     """
-    logger.info(f"开始并行查询 {len(model_configs)} 个模型")
+    logger.info("开始并行查询 %s 个模型", len(model_configs))
     
     # 创建并行任务
     tasks = [
@@ -227,15 +785,19 @@ async def query_models_parallel(
     for i, result in enumerate(results):
         if isinstance(result, Exception):
             model_name = model_configs[i].get("name", "unknown")
-            logger.error(f"模型 {model_name} 查询异常: {str(result)}")
+            logger.error("模型 %s 查询异常: %s", model_name, result)
             processed_results.append({
                 "model": model_name,
                 "response": "",
-                "timestamp": datetime.utcnow().isoformat() + "Z",
+                "timestamp": get_iso_timestamp(),
                 "error": f"查询异常: {str(result)}"
             })
         else:
             processed_results.append(result)
     
-    logger.info(f"并行查询完成,成功: {sum(1 for r in processed_results if 'error' not in r)}/{len(model_configs)}")
+    logger.info(
+        "并行查询完成,成功: %s/%s",
+        sum(1 for r in processed_results if 'error' not in r),
+        len(model_configs)
+    )
     return processed_results
\ No newline at end of file
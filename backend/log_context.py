@@ -0,0 +1,34 @@
+"""
+日志上下文模块
+通过 contextvars 记录当前会议ID，日志自动带上会议前缀，调用处无需拼接字符串
+"""
+
+import logging
+from contextvars import ContextVar
+from typing import Optional
+
+# 当前正在执行的会议ID（每个会议在独立的任务中运行，子任务会继承该值）
+current_meeting_id: ContextVar[Optional[str]] = ContextVar("current_meeting_id", default=None)
+
+
+class MeetingLoggerAdapter(logging.LoggerAdapter):
+    """为日志添加当前会议ID前缀的适配器（日志级别被过滤时不会执行格式化）"""
+
+    def process(self, msg, kwargs):
+        meeting_id = current_meeting_id.get()
+        if meeting_id:
+            return f"[{meeting_id}] {msg}", kwargs
+        return msg, kwargs
+
+
+def get_meeting_logger(name: str) -> MeetingLoggerAdapter:
+    """
+    获取带会议上下文的 logger
+
+    Args:
+        name: logger 名称
+
+    Returns:
+        MeetingLoggerAdapter 实例
+    """
+    return MeetingLoggerAdapter(logging.getLogger(name), {})
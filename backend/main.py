@@ -3,41 +3,61 @@ FastAPI 应用主入口
 提供 RESTful API 和 SSE 流式接口
 """
 
+import asyncio
+import copy
+import heapq
 import json
 import logging
 import uuid
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
+# orjson 为可选依赖，用于加速 SSE 事件的序列化
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from fastapi import FastAPI, HTTPException, Query, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import ValidationError
 import os
-import shutil
-from typing import Tuple
+from typing import Tuple, FrozenSet, AsyncGenerator
 
-from models import ChatRequest, Conversation, Message, get_iso_timestamp
+from models import Attachment, ChatRequest, Conversation, Message, get_iso_timestamp
 from pydantic import BaseModel, Field
 from storage import (
     save_conversation,
     load_conversation,
+    update_conversation,
+    append_message,
+    append_assistant_message,
+    conversation_lock,
     list_conversations,
     delete_conversation,
+    conversation_exists,
     generate_conversation_title,
     generate_ai_title
 )
 from council import run_council
+from llm_client import close_shared_client, latency_tracker
+from council_manager import council_manager, stage_latency_tracker
 from file_storage import (
-    calculate_md5,
+    save_file_with_digest,
     get_file_by_md5,
+    find_duplicate,
     add_file,
     get_all_files,
     delete_file as delete_file_from_storage,
     get_file_path,
-    update_last_accessed
+    update_last_accessed,
+    get_cached_extraction,
+    cache_extraction
 )
+from file_extractor import get_extractor_pool, shutdown_extractor_pool, extract_local_content
+from provider_manager import add_config_save_listener
 
 # 配置日志
 logging.basicConfig(
@@ -64,6 +84,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """应用关闭时写入尚未保存的上下文配置，并释放全局共享的 HTTP 客户端和文件解析进程池"""
+    await flush_context_configs()
+    await close_shared_client()
+    shutdown_extractor_pool()
+
 # 挂载前端静态文件
 # 检查前端构建目录是否存在
 import sys
@@ -165,48 +193,132 @@ def ensure_config_files():
                     logger.info(f"已创建目录: {directory}")
                 except Exception as e:
                     logger.warning(f"无法创建目录 {directory}: {e}")
-        
-        # 确保文件元数据文件存在
-        metadata_paths = [
-            "backend/file_metadata.json",
-            "backend/backend/file_metadata.json"
-        ]
-        
-        metadata_exists = any(os.path.exists(p) for p in metadata_paths)
-        if not metadata_exists:
-            default_metadata = {"files": []}
-            for path in metadata_paths:
-                try:
-                    # 确保父目录存在
-                    os.makedirs(os.path.dirname(path), exist_ok=True)
-                    with open(path, "w", encoding="utf-8") as f:
-                        json.dump(default_metadata, f, ensure_ascii=False, indent=2)
-                    logger.info(f"已创建文件元数据: {path}")
-                    break
-                except Exception as e:
-                    logger.warning(f"无法创建 {path}: {e}")
                     
     except Exception as e:
         logger.error(f"初始化配置文件失败: {e}", exc_info=True)
 
 
-def load_config() -> Dict[str, Any]:
-    """加载配置文件"""
+# 配置文件的候选路径（按启动目录不同依次尝试）
+CONFIG_PATHS = (
+    "config.json",  # 当前目录(backend/)
+    "backend/config.json",  # 从项目根目录
+    "../backend/config.json"  # 从其他目录
+)
+
+# 已找到的配置文件路径（首次找到后缓存）
+_config_path: Optional[str] = None
+
+
+def _resolve_config_path() -> Optional[str]:
+    """
+    查找配置文件路径，找到后缓存，后续调用不再逐个尝试候选路径
+    
+    Returns:
+        配置文件路径，未找到时返回 None
+    """
+    global _config_path
+    if _config_path is not None and os.path.isfile(_config_path):
+        return _config_path
+    
+    _config_path = None
+    for path in CONFIG_PATHS:
+        if os.path.isfile(path):
+            _config_path = path
+            break
+    return _config_path
+
+
+# 已解析的配置缓存: ((路径, 修改时间ns, 文件大小, inode), 配置字典)，文件未变化时直接复用
+_config_cache: Optional[Tuple[Tuple[str, int, int, int], Dict[str, Any]]] = None
+
+
+def _read_json_file(path: str) -> Any:
+    """读取并解析 JSON 文件（有 orjson 时使用 orjson）"""
+    with open(path, "rb") as f:
+        data = f.read()
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def _write_config_file(path: str, config: Dict[str, Any]):
+    """
+    将配置写入文件（缩进 2 格，保留非 ASCII 字符）
+    
+    先完整写入临时文件再原子替换，并发读取或写入中途崩溃都不会看到不完整的配置
+    
+    Args:
+        path: 配置文件路径
+        config: 配置字典
+    """
+    if orjson is not None:
+        payload = orjson.dumps(config, option=orjson.OPT_INDENT_2)
+    else:
+        payload = json.dumps(config, ensure_ascii=False, indent=2).encode("utf-8")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def invalidate_config_cache():
+    """清除配置缓存（写入配置文件后调用）"""
+    global _config_cache
+    _config_cache = None
+
+
+# 供应商管理模块直接写配置文件，保存后同样需要清除缓存
+add_config_save_listener(invalidate_config_cache)
+
+
+def _stat_key(path: str) -> Tuple[str, int, int, int]:
+    """
+    配置文件的缓存键
+    
+    原子替换会换成新的 inode，即使修改时间落在文件系统时间精度内、大小也相同，键也会变化
+    """
+    st = os.stat(path)
+    return (path, st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _get_cached_config() -> Optional[Dict[str, Any]]:
+    """
+    配置文件未变化时返回缓存的配置（共享对象，调用方不能修改），否则返回 None
+    
+    Returns:
+        缓存的配置字典或 None
+    """
+    cache = _config_cache
+    if cache is None:
+        return None
     try:
-        # 尝试多个可能的配置文件路径
-        config_paths = [
-            "config.json",  # 当前目录(backend/)
-            "backend/config.json",  # 从项目根目录
-            "../backend/config.json"  # 从其他目录
-        ]
-        
-        for config_path in config_paths:
-            try:
-                with open(config_path, "r", encoding="utf-8") as f:
-                    logger.info(f"成功加载配置文件: {config_path}")
-                    return json.load(f)
-            except FileNotFoundError:
-                continue
+        key = _stat_key(cache[0][0])
+    except OSError:
+        return None
+    if key == cache[0]:
+        return cache[1]
+    return None
+
+
+def _load_shared_config() -> Dict[str, Any]:
+    """
+    加载配置文件，返回缓存中共享的配置字典（只读使用，调用方不能修改）
+    
+    按 (路径, 修改时间, 大小, inode) 缓存解析结果，文件未变化时只需一次 stat
+    """
+    global _config_cache
+    try:
+        cached = _get_cached_config()
+        if cached is not None:
+            return cached
+        
+        config_path = _resolve_config_path()
+        if config_path:
+            key = _stat_key(config_path)
+            config = _read_json_file(config_path)
+            logger.info(f"成功加载配置文件: {config_path}")
+            _config_cache = (key, config)
+            return config
         
         logger.error("未找到配置文件")
         return {"models": [], "chairman": "", "settings": {}, "providers": []}
@@ -215,76 +327,303 @@ def load_config() -> Dict[str, Any]:
         return {"models": [], "chairman": "", "settings": {}, "providers": []}
 
 
-def format_sse(event: str, data: dict) -> str:
+async def _load_shared_config_async() -> Dict[str, Any]:
+    """_load_shared_config 的异步版本：需要读取并解析文件时放到线程中执行"""
+    cached = _get_cached_config()
+    if cached is not None:
+        return cached
+    return await asyncio.to_thread(_load_shared_config)
+
+
+def load_config() -> Dict[str, Any]:
+    """
+    加载配置文件
+    
+    返回缓存配置的深拷贝，调用方可以随意修改，不会影响其他请求
+    """
+    return copy.deepcopy(_load_shared_config())
+
+
+async def load_config_async() -> Dict[str, Any]:
+    """
+    在异步接口中加载配置：命中缓存时直接返回副本，需要读取并解析文件时放到线程中执行，
+    避免阻塞事件循环
+    
+    Returns:
+        配置字典（副本）
+    """
+    return copy.deepcopy(await _load_shared_config_async())
+
+
+# 可用模型名称集合的缓存: (配置字典, 名称集合)，配置未重新加载时直接复用
+_available_models_cache: Optional[Tuple[Dict[str, Any], FrozenSet[str]]] = None
+
+
+def get_available_models(config: Dict[str, Any]) -> FrozenSet[str]:
+    """
+    获取配置中所有可用模型的全名集合（"模型名称/供应商"）
+    
+    _load_shared_config 在文件未变化时返回同一个配置对象，因此集合只需在配置重新加载后构建一次
+    
+    Args:
+        config: 配置信息(包含 providers，传入共享的配置对象时才能命中缓存)
+    
+    Returns:
+        模型全名集合
+    """
+    global _available_models_cache
+    cache = _available_models_cache
+    if cache is not None and cache[0] is config:
+        return cache[1]
+    
+    available_models = frozenset(
+        f"{model.get('name', '')}/{provider.get('name', '')}"
+        for provider in config.get("providers", [])
+        for model in provider.get("models", [])
+    )
+    _available_models_cache = (config, available_models)
+    return available_models
+
+
+async def load_validated_config(models: List[str]) -> Dict[str, Any]:
+    """
+    加载配置并验证请求的模型都存在
+    
+    Args:
+        models: 请求的模型全名列表
+    
+    Returns:
+        配置字典
+    
+    Raises:
+        HTTPException: 有模型不存在时返回 400
+    """
+    config = await _load_shared_config_async()
+    available_models = get_available_models(config)
+    for model in models:
+        if model not in available_models:
+            raise HTTPException(
+                status_code=400,
+                detail=f"模型 '{model}' 不存在"
+            )
+    return copy.deepcopy(config)
+
+
+# SSE 响应头（所有流式接口共用）
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no"
+}
+
+
+def sse_response(generator: AsyncGenerator[bytes, None]) -> StreamingResponse:
+    """
+    将 SSE 事件生成器包装为流式响应
+    
+    Args:
+        generator: 产出 SSE 帧(UTF-8 字节)的异步生成器，StreamingResponse 对字节块不再编码
+    
+    Returns:
+        StreamingResponse
+    """
+    return StreamingResponse(generator, media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+def format_sse(event: str, data: dict) -> bytes:
     """
     格式化 SSE 事件
     
+    直接返回 UTF-8 字节（StreamingResponse 原样发送字节，省去一次 str -> bytes 编码）
+    
     Args:
         event: 事件名称
         data: 事件数据
     
     Returns:
-        格式化的 SSE 字符串
+        格式化的 SSE 帧(UTF-8 字节)
     """
-    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    if orjson is not None:
+        payload = orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    else:
+        payload = json.dumps(data, ensure_ascii=False).encode("utf-8")
+    return b"event: " + event.encode("utf-8") + b"\ndata: " + payload + b"\n\n"
+
 
+# 心跳事件内容固定，模块加载时序列化一次
+HEARTBEAT_SSE = format_sse("heartbeat", {"message": "keep-alive"})
 
-async def chat_stream_generator(request: ChatRequest, config: Dict[str, Any]):
+
+def format_update_sse(update: Dict[str, Any]) -> bytes:
     """
-    聊天流式生成器 - 使用后台会议管理器
+    将会议更新格式化为 SSE 帧
+    
+    batch 帧（会议管理器合并的多个进度更新）会展开为多个事件，
+    在同一次写入中发送，前端仍按原事件名处理；
+    resync 更新（订阅者积压溢出）按重新连接的方式补发已有的全部阶段结果
+    
+    Args:
+        update: 会议更新
+    
+    Returns:
+        格式化的 SSE 帧(UTF-8 字节)
+    """
+    # 同一条更新会投递给所有订阅者，序列化结果缓存在更新上，避免每个订阅者重复序列化
+    cached = update.get("_sse")
+    if cached is not None:
+        return cached
+    
+    if update.get("type") == "batch":
+        frame = b"".join(format_update_sse(event) for event in update.get("events", []))
+    elif update.get("type") == "resync":
+        frame = format_progress_replay(update.get("data", {}))
+    else:
+        frame = format_sse(update.get("type", "update"), update.get("data", update))
+    update["_sse"] = frame
+    return frame
+
+
+def format_updates_sse(updates: List[Dict[str, Any]]) -> Tuple[bytes, bool]:
+    """
+    将一组会议更新格式化为单个 SSE 写入
+    
+    遇到 complete/error 时停止，其后的更新不再转发
     
     Args:
+        updates: 按顺序排列的会议更新
+    
+    Returns:
+        (格式化的 SSE 帧, 是否已遇到结束事件)
+    """
+    frames: List[bytes] = []
+    for update in updates:
+        frames.append(format_update_sse(update))
+        if update.get("type") in ("complete", "error"):
+            return b"".join(frames), True
+    return b"".join(frames), False
+
+
+def format_progress_replay(progress: Dict[str, Any]) -> bytes:
+    """
+    将会议已有进度格式化为 SSE 帧（重新连接时补发）
+    
+    所有阶段的结果拼接为一个字节串，一次写入发送，而不是每个模型一个事件
+    
+    Args:
+        progress: 会议进度
+    
+    Returns:
+        格式化的 SSE 帧(UTF-8 字节)，没有进度时为空字节串
+    """
+    frames: List[bytes] = []
+    
+    # 已有的stage1结果
+    if progress.get('stage1_results'):
+        for result in progress['stage1_results']:
+            frames.append(format_sse("stage1_progress", {
+                "model": result.get("model"),
+                "status": "completed" if not result.get("error") else "error",
+                "response": result.get("response", ""),
+                "error": result.get("error")
+            }))
+        frames.append(format_sse("stage1_complete", {"results": progress['stage1_results']}))
+    
+    # 已有的stage2结果
+    if progress.get('stage2_results'):
+        for result in progress['stage2_results']:
+            frames.append(format_sse("stage2_progress", result))
+        frames.append(format_sse("stage2_complete", {"results": progress['stage2_results']}))
+    
+    # 已有的stage3结果
+    if progress.get('stage3_result'):
+        frames.append(format_sse("stage3_complete", progress['stage3_result']))
+    
+    # 已有的stage4结果
+    if progress.get('stage4_result'):
+        frames.append(format_sse("stage4_complete", progress['stage4_result']))
+    
+    return b"".join(frames)
+
+
+def _add_user_message(conv_id: str, request: ChatRequest, attachments: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    加载或创建对话并添加本轮的用户消息（在线程中执行）
+    
+    整个过程持有对话锁，不会与会议保存结果、写回标题等其他写入交错；
+    已有对话只追加一行日志，不重写整个对话文件
+    
+    Args:
+        conv_id: 对话ID
         request: 聊天请求
-        config: 配置信息
+        attachments: 序列化后的附件列表
     
-    Yields:
-        SSE 格式的事件流
+    Returns:
+        包含用户消息的对话
     """
-    try:
-        # 1. 加载或创建对话
-        conv_id = request.conv_id or str(uuid.uuid4())
+    with conversation_lock(conv_id):
         conversation = load_conversation(conv_id)
         
         if conversation:
             logger.info(f"加载已有对话: {conv_id}")
         else:
             logger.info(f"创建新对话: {conv_id}")
-            conversation = {
-                "id": conv_id,
-                "title": generate_conversation_title(request.content),
-                "created_at": get_iso_timestamp(),
-                "updated_at": get_iso_timestamp(),
-                "messages": []
-            }
         
-        # 2. 检查最后一条消息是否已经是用户消息（编辑场景）
-        messages = conversation.get("messages", [])
+        # 检查最后一条消息是否已经是用户消息（编辑场景）
+        messages = conversation.get("messages", []) if conversation else []
         last_message = messages[-1] if messages else None
         
         # 如果最后一条消息是用户消息且内容匹配，说明是编辑后重新生成，不需要再添加
         if last_message and last_message.get("role") == "user" and last_message.get("content") == request.content:
             logger.info(f"检测到编辑场景，使用已有的用户消息")
-            user_message = last_message
-        else:
-            # 正常场景，添加新的用户消息
-            user_message = {
-                "role": "user",
-                "content": request.content,
-                "models": request.models,
-                "attachments": [att.model_dump() for att in request.attachments] if request.attachments else [],
-                "timestamp": get_iso_timestamp()
-            }
+            return conversation
+        
+        # 正常场景，添加新的用户消息
+        user_message = {
+            "role": "user",
+            "content": request.content,
+            "models": request.models,
+            "attachments": attachments,
+            "timestamp": get_iso_timestamp()
+        }
+        
+        # 立即保存对话（保存用户消息）：新对话写入快照，已有对话只追加日志
+        if conversation:
             conversation["messages"].append(user_message)
-            logger.info(f"添加新的用户消息")
-            
-            # 立即保存对话（保存用户消息）
             conversation["updated_at"] = get_iso_timestamp()
+            append_message(conv_id, user_message, conversation["updated_at"])
+        else:
+            conversation = {
+                "id": conv_id,
+                "title": generate_conversation_title(request.content),
+                "created_at": get_iso_timestamp(),
+                "updated_at": get_iso_timestamp(),
+                "messages": [user_message]
+            }
             save_conversation(conv_id, conversation)
-            logger.info(f"用户消息已保存到对话: {conv_id}")
+        logger.info(f"用户消息已保存到对话: {conv_id}")
+        return conversation
+
+
+async def chat_stream_generator(request: ChatRequest, config: Dict[str, Any]) -> AsyncGenerator[bytes, None]:
+    """
+    聊天流式生成器 - 使用后台会议管理器
+    
+    Args:
+        request: 聊天请求
+        config: 配置信息
+    
+    Yields:
+        SSE 帧(UTF-8 字节)
+    """
+    try:
+        # 附件只序列化一次，用户消息和会议共用
+        attachments = request.attachment_dicts()
         
-        # 3. 检查是否有进行中的会议
-        from council_manager import council_manager
+        # 1-2. 加载或创建对话并添加用户消息（在对话锁内完成，文件读写放到线程池）
+        conv_id = request.conv_id or str(uuid.uuid4())
+        conversation = await asyncio.to_thread(_add_user_message, conv_id, request, attachments)
         
+        # 3. 检查是否有进行中的会议
         existing_meetings = await council_manager.list_meetings(conv_id=conv_id)
         active_meeting = next((m for m in existing_meetings
                                if m['status'] not in ['completed', 'failed', 'cancelled']), None)
@@ -297,32 +636,10 @@ async def chat_stream_generator(request: ChatRequest, config: Dict[str, Any]):
             # 发送当前进度
             meeting_data = await council_manager.get_meeting(meeting_id)
             if meeting_data:
-                progress = meeting_data.get('progress', {})
-                
-                # 发送已有的stage1结果
-                if progress.get('stage1_results'):
-                    for result in progress['stage1_results']:
-                        yield format_sse("stage1_progress", {
-                            "model": result.get("model"),
-                            "status": "completed" if not result.get("error") else "error",
-                            "response": result.get("response", ""),
-                            "error": result.get("error")
-                        })
-                    yield format_sse("stage1_complete", {"results": progress['stage1_results']})
-                
-                # 发送已有的stage2结果
-                if progress.get('stage2_results'):
-                    for result in progress['stage2_results']:
-                        yield format_sse("stage2_progress", result)
-                    yield format_sse("stage2_complete", {"results": progress['stage2_results']})
-                
-                # 发送已有的stage3结果
-                if progress.get('stage3_result'):
-                    yield format_sse("stage3_complete", progress['stage3_result'])
-                
-                # 发送已有的stage4结果
-                if progress.get('stage4_result'):
-                    yield format_sse("stage4_complete", progress['stage4_result'])
+                # 已有进度合并为一次写入发送
+                replay = format_progress_replay(meeting_data.get('progress', {}))
+                if replay:
+                    yield replay
             
             # 订阅后续更新
             queue = await council_manager.subscribe(meeting_id)
@@ -330,11 +647,6 @@ async def chat_stream_generator(request: ChatRequest, config: Dict[str, Any]):
             # 创建新会议
             logger.info(f"创建新会议: 对话={conv_id}")
         
-            # 准备附件数据
-            attachments = []
-            if request.attachments:
-                attachments = [att.model_dump() for att in request.attachments]
-            
             # 创建新会议
             meeting_id = await council_manager.create_meeting(
                 conv_id=conv_id,
@@ -361,84 +673,56 @@ async def chat_stream_generator(request: ChatRequest, config: Dict[str, Any]):
                     # 等待会议更新，30秒超时发送心跳
                     update = await asyncio.wait_for(queue.get(), timeout=30.0)
                     
-                    event_type = update.get("type", "update")
-                    data = update.get("data", update)
-                    
-                    # 转发事件
-                    yield format_sse(event_type, data)
+                    # 连同缓冲区中已积压的更新一起转发，合并为一次写入（batch 帧会展开为多个事件）
+                    frame, finished = format_updates_sse([update, *queue.drain_nowait()])
+                    yield frame
                     
                     # 如果会议完成或失败，退出循环
-                    if event_type in ["complete", "error"]:
+                    if finished:
                         break
                         
                 except asyncio.TimeoutError:
                     # 发送心跳保持连接
-                    yield format_sse("heartbeat", {"message": "keep-alive"})
+                    yield HEARTBEAT_SSE
                     continue
                     
         finally:
             # 取消订阅
             await council_manager.unsubscribe(meeting_id, queue)
         
-        # 5. 获取最终结果并保存
+        # 5. 获取最终结果
         meeting_data = await council_manager.get_meeting(meeting_id)
         if meeting_data:
+            # 会议管理器在广播 complete 之前已保存助手消息，AI生成标题未完成时由它在后台写回，
+            # 这里直接使用已保存的对话，完成事件不再等待一次额外的标题生成；
+            # 会议管理器没有保存结果（如会议失败）时，在这里保存已有结果
             progress = meeting_data.get('progress', {})
+            stage3_result = progress.get('stage3_result') or {}
             
-            stage1_results = progress.get('stage1_results', [])
-            stage2_results = progress.get('stage2_results', [])
-            stage3_result = progress.get('stage3_result', {})
-            stage4_result = progress.get('stage4_result', {})
-        
-            # 6. 保存助手消息
+            # 6-7. 保存助手消息（对话已有助手消息时不会重复追加）
             assistant_message = {
                 "role": "assistant",
-                "stage1": stage1_results,
-                "stage2": stage2_results,
+                "stage1": progress.get('stage1_results', []),
+                "stage2": progress.get('stage2_results', []),
                 "stage3": stage3_result,
-                "stage4": stage4_result,
+                "stage4": progress.get('stage4_result', {}),
                 "timestamp": get_iso_timestamp()
             }
-            conversation["messages"].append(assistant_message)
+            saved, appended = await asyncio.to_thread(append_assistant_message, conv_id, assistant_message)
+            if saved:
+                conversation = saved
             
-            # 7. 如果是第一轮对话，使用AI生成标题
-            if len(conversation["messages"]) == 2:  # 一条用户消息 + 一条助手消息
-                try:
-                    # 从config获取chairman和构建model_configs
-                    chairman = config.get("chairman", "")
-                    model_configs = {}
-                    providers = config.get("providers", [])
-                    for provider in providers:
-                        provider_name = provider.get("name", "")
-                        provider_models = provider.get("models", [])
-                        for model in provider_models:
-                            model_name = model.get("name", "")
-                            full_model_name = f"{model_name}/{provider_name}"
-                            model_configs[full_model_name] = {
-                                "name": full_model_name,
-                                "url": provider.get("url", ""),
-                                "api_key": provider.get("api_key", ""),
-                                "api_type": provider.get("api_type", "openai"),
-                            }
-                    
-                    ai_title = await generate_ai_title(
-                        query=request.content,
-                        response=stage3_result.get("response", ""),
-                        chairman_model=chairman,
-                        model_configs=model_configs
-                    )
-                    conversation["title"] = ai_title
-                    logger.info(f"AI生成对话标题: {ai_title}")
-                except Exception as e:
-                    logger.warning(f"AI生成标题失败，使用默认标题: {e}")
-            
-            # 8. 更新对话时间戳
-            conversation["updated_at"] = get_iso_timestamp()
+            # 8. 如果是第一轮对话，在后台使用AI生成标题，完成后写回对话
+            if appended and len(conversation["messages"]) == 2:  # 一条用户消息 + 一条助手消息
+                title_task = asyncio.create_task(generate_ai_title(
+                    query=request.content,
+                    response=stage3_result.get("response", ""),
+                    chairman_model=config.get("chairman", ""),
+                    model_configs=build_model_configs(config)
+                ))
+                council_manager.patch_title_in_background(conv_id, title_task)
             
-            # 9. 保存对话
-            save_conversation(conv_id, conversation)
-            
-            # 10. 发送完成事件（包含更新后的标题）
+            # 9. 发送完成事件（标题仍在生成时为当前标题，前端可稍后重新获取对话）
             yield format_sse("complete", {
                 "conv_id": conv_id,
                 "title": conversation.get("title", "新对话"),
@@ -453,6 +737,46 @@ async def chat_stream_generator(request: ChatRequest, config: Dict[str, Any]):
         })
 
 
+# 附件允许的字段
+ATTACHMENT_FIELDS = frozenset(("name", "filename", "content", "type"))
+
+
+def _construct_attachments(items: Any) -> Any:
+    """
+    将查询参数中解析出的附件直接构造为 Attachment 对象（跳过逐字段验证）
+    
+    只有形状完全符合 Attachment 定义时才走快速路径（已构造的模型实例不会被 ChatRequest 重新验证）；
+    否则原样返回，交给 ChatRequest 做完整验证并给出错误信息
+    
+    Args:
+        items: 解析后的附件 JSON
+    
+    Returns:
+        Attachment 列表，或原始数据
+    """
+    if not isinstance(items, list):
+        return items
+    for att in items:
+        if not isinstance(att, dict) or not isinstance(att.get("content"), str) or not ATTACHMENT_FIELDS.issuperset(att):
+            return items
+        if any(att.get(key) is not None and not isinstance(att[key], str) for key in ("name", "filename", "type")):
+            return items
+    
+    attachments = []
+    for att in items:
+        name = att.get("name")
+        # 与 Attachment.model_post_init 一致：只有 filename 时用作 name
+        if not name and att.get("filename"):
+            name = att["filename"]
+        attachments.append(Attachment.model_construct(
+            name=name,
+            filename=att.get("filename"),
+            content=att["content"],
+            type=att.get("type")
+        ))
+    return attachments
+
+
 @app.get("/api/chat/stream")
 async def chat_stream(
     conv_id: str = Query(..., description="对话 ID"),
@@ -477,7 +801,9 @@ async def chat_stream(
         parsed_attachments = None
         if attachments:
             try:
-                parsed_attachments = json.loads(attachments)
+                parsed_attachments = _construct_attachments(
+                    orjson.loads(attachments) if orjson is not None else json.loads(attachments)
+                )
             except json.JSONDecodeError:
                 logger.warning(f"无法解析附件 JSON: {attachments}")
         
@@ -489,29 +815,14 @@ async def chat_stream(
             attachments=parsed_attachments
         )
         
-        # 加载配置
-        config = load_config()
-        
-        # 验证模型是否存在
-        available_models = {m["name"] for m in config.get("models", [])}
-        for model in request.models:
-            if model not in available_models:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"模型 '{model}' 不存在"
-                )
+        # 加载配置并验证模型是否存在
+        config = await load_validated_config(request.models)
         
         # 返回流式响应
-        return StreamingResponse(
-            chat_stream_generator(request, config),
-            media_type="text/event-stream",
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-                "X-Accel-Buffering": "no"
-            }
-        )
+        return sse_response(chat_stream_generator(request, config))
         
+    except HTTPException:
+        raise
     except ValidationError as e:
         logger.error(f"请求验证失败: {e}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -532,39 +843,14 @@ async def chat(request: ChatRequest):
         SSE 流式响应
     """
     try:
-        # 加载配置
-        config = load_config()
-        
-        # 从providers中构建可用模型列表
-        available_models = set()
-        providers = config.get("providers", [])
-        for provider in providers:
-            provider_name = provider.get("name", "")
-            models = provider.get("models", [])
-            for model in models:
-                model_name = model.get("name", "")
-                full_model_name = f"{model_name}/{provider_name}"
-                available_models.add(full_model_name)
-        
-        # 验证模型是否存在
-        for model in request.models:
-            if model not in available_models:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"模型 '{model}' 不存在"
-                )
+        # 加载配置并验证模型是否存在
+        config = await load_validated_config(request.models)
         
         # 返回流式响应
-        return StreamingResponse(
-            chat_stream_generator(request, config),
-            media_type="text/event-stream",
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-                "X-Accel-Buffering": "no"
-            }
-        )
+        return sse_response(chat_stream_generator(request, config))
         
+    except HTTPException:
+        raise
     except ValidationError as e:
         logger.error(f"请求验证失败: {e}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -593,16 +879,17 @@ async def get_conversations(
         对话列表
     """
     try:
-        # 获取所有对话
-        conversations = list_conversations()
-        
-        # 排序
-        reverse = (order == "desc")
-        conversations.sort(key=lambda x: x.get(sort, ""), reverse=reverse)
-        
-        # 分页
+        # 获取所有对话（需要读取所有对话文件，放到线程中执行，避免阻塞事件循环）
+        conversations = await asyncio.to_thread(list_conversations)
         total = len(conversations)
-        conversations = conversations[offset:offset + limit]
+        
+        # 只选出当前页及之前的条目，无需对全部对话排序（结果与稳定排序后切片一致）
+        sort_key = lambda x: x.get(sort, "")
+        if order == "desc":
+            conversations = heapq.nlargest(offset + limit, conversations, key=sort_key)
+        else:
+            conversations = heapq.nsmallest(offset + limit, conversations, key=sort_key)
+        conversations = conversations[offset:]
         
         return {
             "conversations": conversations,
@@ -638,7 +925,7 @@ async def create_conversation():
         }
         
         # 保存对话
-        save_conversation(conv_id, conversation)
+        await asyncio.to_thread(save_conversation, conv_id, conversation)
         
         logger.info(f"创建新对话: {conv_id}")
         
@@ -661,7 +948,7 @@ async def get_conversation(conv_id: str):
         对话详情
     """
     try:
-        conversation = load_conversation(conv_id)
+        conversation = await asyncio.to_thread(load_conversation, conv_id)
         
         if not conversation:
             raise HTTPException(
@@ -690,7 +977,7 @@ async def delete_conversation_endpoint(conv_id: str):
         删除结果
     """
     try:
-        success = delete_conversation(conv_id)
+        success = await asyncio.to_thread(delete_conversation, conv_id)
         
         if not success:
             raise HTTPException(
@@ -719,7 +1006,7 @@ async def get_models():
         模型列表和主席模型
     """
     try:
-        config = load_config()
+        config = await load_config_async()
         providers = config.get("providers", [])
         chairman = config.get("chairman", "")
         
@@ -761,7 +1048,7 @@ async def get_settings():
         系统设置（温度、超时、重试次数、并发数）
     """
     try:
-        config = load_config()
+        config = await load_config_async()
         settings = config.get("settings", {})
         
         return {
@@ -769,6 +1056,12 @@ async def get_settings():
             "timeout": settings.get("timeout", 120),
             "max_retries": settings.get("max_retries", 3),
             "max_concurrent": settings.get("max_concurrent", 10),
+            "quorum_fraction": settings.get("quorum_fraction"),
+            "straggler_multiplier": settings.get("straggler_multiplier", 1.5),
+            "stream_responses": settings.get("stream_responses", False),
+            "host_max_concurrency": settings.get("host_max_concurrency"),
+            "host_rate_per_second": settings.get("host_rate_per_second"),
+            "host_burst": settings.get("host_burst"),
             "use_mineru": settings.get("use_mineru", False),
             "mineru_api_url": settings.get("mineru_api_url", ""),
             "mineru_api_key": settings.get("mineru_api_key", "")
@@ -785,6 +1078,12 @@ class SettingsUpdate(BaseModel):
     timeout: int = Field(..., ge=30, le=300, description="超时时间（秒）")
     max_retries: int = Field(..., ge=0, le=10, description="最大重试次数")
     max_concurrent: int = Field(..., ge=1, le=100, description="最大并发数")
+    quorum_fraction: Optional[float] = Field(None, gt=0.0, le=1.0, description="法定人数比例（达到后取消掉队模型，1 表示等待全部）")
+    straggler_multiplier: Optional[float] = Field(None, ge=1.0, le=10.0, description="掉队阈值（已完成耗时中位数的倍数）")
+    stream_responses: Optional[bool] = Field(None, description="Stage 1 是否流式转发模型输出（stage1_delta 事件）")
+    host_max_concurrency: Optional[int] = Field(None, ge=1, le=100, description="同一主机的最大并发数（默认等于最大并发数）")
+    host_rate_per_second: Optional[float] = Field(None, gt=0.0, le=1000.0, description="同一主机每秒允许发起的请求数")
+    host_burst: Optional[int] = Field(None, ge=1, le=1000, description="同一主机允许的突发请求数")
     use_mineru: bool = Field(False, description="是否启用MinerU")
     mineru_api_url: str = Field("", description="MinerU API地址")
     mineru_api_key: str = Field("", description="MinerU API密钥")
@@ -806,26 +1105,12 @@ async def update_settings(settings: SettingsUpdate):
     max_retries = settings.max_retries
     max_concurrent = settings.max_concurrent
     try:
-        # 尝试多个可能的配置文件路径
-        config_paths = [
-            "config.json",  # 当前目录(backend/)
-            "backend/config.json",  # 从项目根目录
-            "../backend/config.json"  # 从其他目录
-        ]
-        
-        config_path = None
-        for path in config_paths:
-            try:
-                with open(path, "r", encoding="utf-8") as f:
-                    config = json.load(f)
-                    config_path = path
-                    break
-            except FileNotFoundError:
-                continue
-        
+        config_path = _resolve_config_path()
         if not config_path:
             raise HTTPException(status_code=500, detail="配置文件未找到")
         
+        config = _read_json_file(config_path)
+        
         # 更新设置
         if "settings" not in config:
             config["settings"] = {}
@@ -834,13 +1119,24 @@ async def update_settings(settings: SettingsUpdate):
         config["settings"]["timeout"] = timeout
         config["settings"]["max_retries"] = max_retries
         config["settings"]["max_concurrent"] = max_concurrent
+        # 法定人数、流式输出等设置只在请求中提供时更新，避免未携带这些字段的请求覆盖已有配置
+        if settings.quorum_fraction is not None:
+            config["settings"]["quorum_fraction"] = settings.quorum_fraction
+        if settings.straggler_multiplier is not None:
+            config["settings"]["straggler_multiplier"] = settings.straggler_multiplier
+        if settings.stream_responses is not None:
+            config["settings"]["stream_responses"] = settings.stream_responses
+        for key in ("host_max_concurrency", "host_rate_per_second", "host_burst"):
+            value = getattr(settings, key)
+            if value is not None:
+                config["settings"][key] = value
         config["settings"]["use_mineru"] = settings.use_mineru
         config["settings"]["mineru_api_url"] = settings.mineru_api_url
         config["settings"]["mineru_api_key"] = settings.mineru_api_key
         
         # 保存配置文件
-        with open(config_path, "w", encoding="utf-8") as f:
-            json.dump(config, f, ensure_ascii=False, indent=2)
+        _write_config_file(config_path, config)
+        invalidate_config_cache()
         
         logger.info(f"设置已更新: temperature={temperature}, timeout={timeout}, max_retries={max_retries}, max_concurrent={max_concurrent}")
         
@@ -849,6 +1145,12 @@ async def update_settings(settings: SettingsUpdate):
             "timeout": timeout,
             "max_retries": max_retries,
             "max_concurrent": max_concurrent,
+            "quorum_fraction": config["settings"].get("quorum_fraction"),
+            "straggler_multiplier": config["settings"].get("straggler_multiplier", 1.5),
+            "stream_responses": config["settings"].get("stream_responses", False),
+            "host_max_concurrency": config["settings"].get("host_max_concurrency"),
+            "host_rate_per_second": config["settings"].get("host_rate_per_second"),
+            "host_burst": config["settings"].get("host_burst"),
             "use_mineru": settings.use_mineru,
             "mineru_api_url": settings.mineru_api_url,
             "mineru_api_key": settings.mineru_api_key,
@@ -877,7 +1179,7 @@ async def get_models_config():
         完整的模型配置列表和主席模型
     """
     try:
-        config = load_config()
+        config = await load_config_async()
         providers = config.get("providers", [])
         chairman = config.get("chairman", "")
         
@@ -924,33 +1226,19 @@ async def update_models_config(config_update: ModelConfigUpdate):
         更新后的配置
     """
     try:
-        # 尝试多个可能的配置文件路径
-        config_paths = [
-            "config.json",  # 当前目录(backend/)
-            "backend/config.json",  # 从项目根目录
-            "../backend/config.json"  # 从其他目录
-        ]
-        
-        config_path = None
-        for path in config_paths:
-            try:
-                with open(path, "r", encoding="utf-8") as f:
-                    config = json.load(f)
-                    config_path = path
-                    break
-            except FileNotFoundError:
-                continue
-        
+        config_path = _resolve_config_path()
         if not config_path:
             raise HTTPException(status_code=500, detail="配置文件未找到")
         
+        config = _read_json_file(config_path)
+        
         # 更新模型配置
         config["models"] = config_update.models
         config["chairman"] = config_update.chairman
         
         # 保存配置文件
-        with open(config_path, "w", encoding="utf-8") as f:
-            json.dump(config, f, ensure_ascii=False, indent=2)
+        _write_config_file(config_path, config)
+        invalidate_config_cache()
         
         logger.info(f"模型配置已更新: {len(config_update.models)} 个模型, 主席: {config_update.chairman}")
         
@@ -987,37 +1275,35 @@ async def edit_message(conv_id: str, message_index: int, request: MessageEditReq
         更新后的对话
     """
     try:
-        # 加载对话
-        conversation = load_conversation(conv_id)
+        def apply_edit(conversation: Dict[str, Any]):
+            messages = conversation.get("messages", [])
+            
+            # 验证消息索引
+            if message_index < 0 or message_index >= len(messages):
+                raise HTTPException(status_code=400, detail="无效的消息索引")
+            
+            # 验证是否为用户消息
+            if messages[message_index].get("role") != "user":
+                raise HTTPException(status_code=400, detail="只能编辑用户消息")
+            
+            # 更新消息内容和时间戳
+            current_time = get_iso_timestamp()
+            messages[message_index]["content"] = request.new_content
+            messages[message_index]["edited"] = True
+            messages[message_index]["edited_at"] = current_time
+            messages[message_index]["timestamp"] = current_time  # 更新时间戳为编辑时间
+            
+            # 删除该消息之后的所有消息(包括对应的AI回复)
+            conversation["messages"] = messages[:message_index + 1]
+            
+            # 更新对话时间戳
+            conversation["updated_at"] = get_iso_timestamp()
+        
+        # 加载、修改、保存在对话锁内完成
+        conversation = await asyncio.to_thread(update_conversation, conv_id, apply_edit)
         if not conversation:
             raise HTTPException(status_code=404, detail="对话不存在")
         
-        messages = conversation.get("messages", [])
-        
-        # 验证消息索引
-        if message_index < 0 or message_index >= len(messages):
-            raise HTTPException(status_code=400, detail="无效的消息索引")
-        
-        # 验证是否为用户消息
-        if messages[message_index].get("role") != "user":
-            raise HTTPException(status_code=400, detail="只能编辑用户消息")
-        
-        # 更新消息内容和时间戳
-        current_time = get_iso_timestamp()
-        messages[message_index]["content"] = request.new_content
-        messages[message_index]["edited"] = True
-        messages[message_index]["edited_at"] = current_time
-        messages[message_index]["timestamp"] = current_time  # 更新时间戳为编辑时间
-        
-        # 删除该消息之后的所有消息(包括对应的AI回复)
-        conversation["messages"] = messages[:message_index + 1]
-        
-        # 更新对话时间戳
-        conversation["updated_at"] = get_iso_timestamp()
-        
-        # 保存对话
-        save_conversation(conv_id, conversation)
-        
         logger.info(f"消息已编辑: 对话={conv_id}, 索引={message_index}")
         
         return conversation
@@ -1042,30 +1328,28 @@ async def delete_message(conv_id: str, message_index: int):
         更新后的对话
     """
     try:
-        # 加载对话
-        conversation = load_conversation(conv_id)
+        def apply_delete(conversation: Dict[str, Any]):
+            messages = conversation.get("messages", [])
+            
+            # 验证消息索引
+            if message_index < 0 or message_index >= len(messages):
+                raise HTTPException(status_code=400, detail="无效的消息索引")
+            
+            # 验证是否为用户消息
+            if messages[message_index].get("role") != "user":
+                raise HTTPException(status_code=400, detail="只能删除用户消息")
+            
+            # 删除该消息及其后续所有消息
+            conversation["messages"] = messages[:message_index]
+            
+            # 更新对话时间戳
+            conversation["updated_at"] = get_iso_timestamp()
+        
+        # 加载、修改、保存在对话锁内完成
+        conversation = await asyncio.to_thread(update_conversation, conv_id, apply_delete)
         if not conversation:
             raise HTTPException(status_code=404, detail="对话不存在")
         
-        messages = conversation.get("messages", [])
-        
-        # 验证消息索引
-        if message_index < 0 or message_index >= len(messages):
-            raise HTTPException(status_code=400, detail="无效的消息索引")
-        
-        # 验证是否为用户消息
-        if messages[message_index].get("role") != "user":
-            raise HTTPException(status_code=400, detail="只能删除用户消息")
-        
-        # 删除该消息及其后续所有消息
-        conversation["messages"] = messages[:message_index]
-        
-        # 更新对话时间戳
-        conversation["updated_at"] = get_iso_timestamp()
-        
-        # 保存对话
-        save_conversation(conv_id, conversation)
-        
         logger.info(f"消息已删除: 对话={conv_id}, 索引={message_index}")
         
         return conversation
@@ -1083,6 +1367,61 @@ class ContextConfigUpdate(BaseModel):
     context_attachments: List[Dict[str, Any]] = Field(default=[], description="上下文附件列表")
 
 
+# 上下文配置的合并写入窗口(秒)：拖动滑块等连续更新只在窗口结束时保存一次
+CONTEXT_SAVE_DELAY = 0.2
+
+# 尚未写入文件的上下文配置: 对话ID -> (上下文配置, 更新时间)
+_pending_context_configs: Dict[str, Tuple[Dict[str, Any], str]] = {}
+_context_flush_task: Optional[asyncio.Task] = None
+
+
+def _write_context_configs(pending: Dict[str, Tuple[Dict[str, Any], str]]):
+    """
+    将上下文配置写入对话文件（在线程中执行）
+    
+    在对话锁内重新加载再保存，不会覆盖等待期间会议追加的消息或写回的标题
+    
+    Args:
+        pending: 对话ID -> (上下文配置, 更新时间)
+    """
+    for conv_id, (context_config, updated_at) in pending.items():
+        def apply_config(conversation: Dict[str, Any]):
+            conversation["context_config"] = context_config
+            conversation["updated_at"] = updated_at
+        
+        # 等待期间对话已被删除时返回 None，直接跳过
+        update_conversation(conv_id, apply_config)
+
+
+async def flush_context_configs():
+    """立即写入所有尚未保存的上下文配置"""
+    pending = dict(_pending_context_configs)
+    _pending_context_configs.clear()
+    if not pending:
+        return
+    try:
+        await asyncio.to_thread(_write_context_configs, pending)
+    except Exception as e:
+        logger.error(f"保存上下文配置失败: {e}", exc_info=True)
+
+
+async def _flush_context_configs_later():
+    """等待合并窗口结束后写入上下文配置"""
+    global _context_flush_task
+    try:
+        await asyncio.sleep(CONTEXT_SAVE_DELAY)
+    finally:
+        _context_flush_task = None
+    await flush_context_configs()
+
+
+def _schedule_context_flush():
+    """安排一次延迟写入（窗口内已安排过时不重复安排）"""
+    global _context_flush_task
+    if _context_flush_task is None:
+        _context_flush_task = asyncio.create_task(_flush_context_configs_later())
+
+
 @app.get("/api/conversations/{conv_id}/context")
 async def get_context_config(conv_id: str):
     """
@@ -1096,29 +1435,38 @@ async def get_context_config(conv_id: str):
     """
     try:
         # 加载对话
-        conversation = load_conversation(conv_id)
+        conversation = await asyncio.to_thread(load_conversation, conv_id)
         if not conversation:
             raise HTTPException(status_code=404, detail="对话不存在")
         
-        # 获取已保存的上下文配置
-        context_config = conversation.get("context_config", {
-            "max_turns": 3,
-            "context_attachments": []
-        })
+        # 获取上下文配置（尚未写入文件的更新优先，复制一份避免修改待写入的数据）
+        pending = _pending_context_configs.get(conv_id)
+        if pending is not None:
+            context_config = dict(pending[0])
+        else:
+            context_config = conversation.get("context_config", {
+                "max_turns": 3,
+                "context_attachments": []
+            })
         
         # 如果没有保存过上下文配置,则从历史对话中提取所有附件
         if not context_config.get("context_attachments"):
             messages = conversation.get("messages", [])
             all_attachments = []
-            
+            # 已添加附件的 filename 和 name，用于去重
+            seen_names = set()
+
             # 遍历所有用户消息,提取附件
             for msg in messages:
                 if msg.get("role") == "user" and msg.get("attachments"):
                     for att in msg.get("attachments", []):
                         # 避免重复添加相同的附件
                         att_name = att.get("filename") or att.get("name")
-                        if not any(a.get("filename") == att_name or a.get("name") == att_name for a in all_attachments):
-                            all_attachments.append(att)
+                        if att_name in seen_names:
+                            continue
+                        seen_names.add(att.get("filename"))
+                        seen_names.add(att.get("name"))
+                        all_attachments.append(att)
             
             context_config["context_attachments"] = all_attachments
         
@@ -1144,26 +1492,21 @@ async def update_context_config(conv_id: str, config: ContextConfigUpdate):
         更新后的配置
     """
     try:
-        # 加载对话
-        conversation = load_conversation(conv_id)
-        if not conversation:
+        # 检查对话是否存在（不需要读取整个对话）
+        if not conversation_exists(conv_id):
             raise HTTPException(status_code=404, detail="对话不存在")
         
-        # 更新上下文配置
-        conversation["context_config"] = {
+        # 更新上下文配置，连同更新时间放入待写入队列，短时间内的多次更新合并为一次保存
+        context_config = {
             "max_turns": config.max_turns,
             "context_attachments": config.context_attachments
         }
-        
-        # 更新对话时间戳
-        conversation["updated_at"] = get_iso_timestamp()
-        
-        # 保存对话
-        save_conversation(conv_id, conversation)
+        _pending_context_configs[conv_id] = (context_config, get_iso_timestamp())
+        _schedule_context_flush()
         
         logger.info(f"上下文配置已更新: 对话={conv_id}, 轮数={config.max_turns}, 附件数={len(config.context_attachments)}")
         
-        return conversation["context_config"]
+        return context_config
         
     except HTTPException:
         raise
@@ -1172,20 +1515,27 @@ async def update_context_config(conv_id: str, config: ContextConfigUpdate):
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
-def extract_file_content_with_mineru(file_path: str, filename: str) -> Tuple[str, Optional[str]]:
+async def extract_file_content_with_mineru(
+    file_path: str,
+    filename: str,
+    file_md5: Optional[str] = None
+) -> Tuple[str, Optional[str]]:
     """
     使用MinerU API提取文件内容(高质量解析)
     
+    MinerU 客户端基于同步的 requests，每次调用放到线程池执行，轮询间隔用 asyncio.sleep 等待，
+    解析期间（最长10分钟）不阻塞事件循环
+    
     Args:
         file_path: 文件路径
         filename: 原始文件名
+        file_md5: 文件内容摘要（提供时按摘要和模型版本缓存解析结果）
         
     Returns:
         (content, error) 元组
     """
     try:
-        from mineru_client import MinerUClient
-        import requests
+        from mineru_client import MinerUClient, poll_delays
         
         logger.info("=" * 60)
         logger.info("开始使用MinerU解析文档")
@@ -1193,7 +1543,7 @@ def extract_file_content_with_mineru(file_path: str, filename: str) -> Tuple[str
         logger.info(f"文件路径: {file_path}")
         
         # 从配置文件读取MinerU API配置
-        config = load_config()
+        config = await load_config_async()
         api_key = config.get("settings", {}).get("mineru_api_key", "")
         
         if not api_key:
@@ -1215,9 +1565,18 @@ def extract_file_content_with_mineru(file_path: str, filename: str) -> Tuple[str
         
         logger.info(f"文件类型: {file_ext}, 使用模型: {model_version}")
         
+        # 相同内容已解析过时直接返回缓存结果，跳过整个上传/解析流程
+        if file_md5:
+            cached_content = await asyncio.to_thread(get_cached_extraction, file_md5, model_version)
+            if cached_content:
+                logger.info(f"命中MinerU解析缓存: {file_md5}, 内容长度: {len(cached_content)} 字符")
+                logger.info("=" * 60)
+                return cached_content, None
+        
         # 步骤1: 申请上传URL
         logger.info("步骤1: 申请上传URL...")
-        batch_result, error = client.batch_upload_files(
+        batch_result, error = await asyncio.to_thread(
+            client.batch_upload_files,
             files=[{"name": filename}],
             model_version=model_version
         )
@@ -1241,7 +1600,7 @@ def extract_file_content_with_mineru(file_path: str, filename: str) -> Tuple[str
         
         # 步骤2: 上传文件
         logger.info("步骤2: 上传文件到MinerU...")
-        error = client.upload_file_to_url(file_path, upload_url)
+        error = await asyncio.to_thread(client.upload_file_to_url, file_path, upload_url)
         if error:
             logger.error(f"文件上传失败: {error}")
             return "", f"文件上传失败: {error}"
@@ -1252,14 +1611,14 @@ def extract_file_content_with_mineru(file_path: str, filename: str) -> Tuple[str
         # 步骤3: 轮询查询结果
         import time
         max_wait_time = 600  # 最多等待10分钟
-        poll_interval = 5  # 每5秒查询一次
+        delays = poll_delays()  # 查询间隔从0.3秒开始指数增长，上限8秒
         start_time = time.time()
         
         while time.time() - start_time < max_wait_time:
             if not batch_id:
                 return "", "批次ID为空"
                 
-            results, error = client.query_batch_results(batch_id)
+            results, error = await asyncio.to_thread(client.query_batch_results, batch_id)
             
             if error:
                 return "", f"查询结果失败: {error}"
@@ -1279,13 +1638,15 @@ def extract_file_content_with_mineru(file_path: str, filename: str) -> Tuple[str
                     logger.info("步骤4: 下载并提取内容...")
                     
                     # 下载并提取内容
-                    content, error = client.download_and_extract_content(full_zip_url)
+                    content, error = await asyncio.to_thread(client.download_and_extract_content, full_zip_url)
                     if error:
                         logger.error(f"下载结果失败: {error}")
                         return "", f"下载结果失败: {error}"
                     
                     if content:
                         logger.info(f"MinerU解析成功! 内容长度: {len(content)} 字符")
+                        if file_md5:
+                            await asyncio.to_thread(cache_extraction, file_md5, model_version, content)
                         logger.info(f"内容预览: {content[:200]}...")
                         logger.info("=" * 60)
                         return content, None
@@ -1308,13 +1669,10 @@ def extract_file_content_with_mineru(file_path: str, filename: str) -> Tuple[str
                         logger.info(f"MinerU解析进度: {extracted}/{total}")
                     else:
                         logger.info(f"MinerU状态: {state}, 详细信息: {json.dumps(result, ensure_ascii=False)}")
-                    
-                    time.sleep(poll_interval)
                 else:
                     logger.warning(f"未知状态: {state}")
-                    time.sleep(poll_interval)
-            else:
-                time.sleep(poll_interval)
+            
+            await asyncio.sleep(next(delays))
         
         logger.error(f"MinerU解析超时: 超过{max_wait_time}秒")
         logger.info("=" * 60)
@@ -1327,7 +1685,18 @@ def extract_file_content_with_mineru(file_path: str, filename: str) -> Tuple[str
         return "", error_msg
 
 
-def extract_file_content(file_path: str, filename: str, use_mineru: bool = False) -> Tuple[str, Optional[str]]:
+def _read_text_file(file_path: str) -> str:
+    """读取文本文件（UTF-8，忽略无法解码的字节）"""
+    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+        return f.read()
+
+
+async def extract_file_content(
+    file_path: str,
+    filename: str,
+    use_mineru: bool = False,
+    file_md5: Optional[str] = None
+) -> Tuple[str, Optional[str]]:
     """
     提取文件内容
     
@@ -1335,6 +1704,7 @@ def extract_file_content(file_path: str, filename: str, use_mineru: bool = False
         file_path: 文件路径
         filename: 原始文件名
         use_mineru: 是否使用MinerU进行高质量解析
+        file_md5: 文件内容摘要（用于缓存MinerU解析结果）
         
     Returns:
         (content, error) 元组，content为提取的文本内容，error为错误信息
@@ -1345,10 +1715,10 @@ def extract_file_content(file_path: str, filename: str, use_mineru: bool = False
     if file_ext in ['.txt', '.md']:
         logger.info(f"检测到文本文件({file_ext}),直接读取内容")
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-                logger.info(f"文本文件读取成功,内容长度: {len(content)} 字符")
-                return content, None
+            # 文件刚写入磁盘（页缓存中），读取放到线程中执行，不阻塞事件循环
+            content = await asyncio.to_thread(_read_text_file, file_path)
+            logger.info(f"文本文件读取成功,内容长度: {len(content)} 字符")
+            return content, None
         except Exception as e:
             error_msg = f"读取文本文件失败: {str(e)}"
             logger.error(error_msg)
@@ -1357,7 +1727,7 @@ def extract_file_content(file_path: str, filename: str, use_mineru: bool = False
     # 其他格式:如果启用MinerU,先尝试使用MinerU解析
     if use_mineru:
         logger.info(f"检测到文档文件({file_ext}),使用MinerU解析")
-        content, error = extract_file_content_with_mineru(file_path, filename)
+        content, error = await extract_file_content_with_mineru(file_path, filename, file_md5)
         if content:  # MinerU解析成功
             return content, None
         # MinerU失败,继续使用本地解析
@@ -1366,61 +1736,11 @@ def extract_file_content(file_path: str, filename: str, use_mineru: bool = False
         logger.warning(f"MinerU未启用,无法解析{file_ext}格式文件")
         return "", f"MinerU未启用,无法解析{file_ext}格式。请在设置中启用MinerU。"
     
+    # 本地解析是 CPU 密集操作，放到进程池执行，不阻塞事件循环，多个上传可并行解析
     try:
-        # Word文档 (.docx)
-        if file_ext == '.docx':
-            try:
-                from docx import Document
-                doc = Document(file_path)
-                content = '\n'.join([paragraph.text for paragraph in doc.paragraphs])
-                return content, None
-            except ImportError:
-                return "", "需要安装python-docx库来处理.docx文件"
-            except Exception as e:
-                return "", f"读取.docx文件失败: {str(e)}"
-        
-        # Excel文件 (.xlsx, .xls)
-        elif file_ext in ['.xlsx', '.xls']:
-            try:
-                from openpyxl import load_workbook
-                wb = load_workbook(file_path, data_only=True)
-                content_parts = []
-                for sheet_name in wb.sheetnames:
-                    sheet = wb[sheet_name]
-                    content_parts.append(f"=== 工作表: {sheet_name} ===")
-                    for row in sheet.iter_rows(values_only=True):
-                        row_text = '\t'.join([str(cell) if cell is not None else '' for cell in row])
-                        if row_text.strip():
-                            content_parts.append(row_text)
-                return '\n'.join(content_parts), None
-            except ImportError:
-                return "", "需要安装openpyxl库来处理Excel文件"
-            except Exception as e:
-                return "", f"读取Excel文件失败: {str(e)}"
-        
-        # PDF文件
-        elif file_ext == '.pdf':
-            try:
-                from PyPDF2 import PdfReader
-                reader = PdfReader(file_path)
-                content_parts = []
-                for i, page in enumerate(reader.pages):
-                    text = page.extract_text()
-                    if text.strip():
-                        content_parts.append(f"=== 第{i+1}页 ===\n{text}")
-                return '\n\n'.join(content_parts), None
-            except ImportError:
-                return "", "需要安装PyPDF2库来处理PDF文件"
-            except Exception as e:
-                return "", f"读取PDF文件失败: {str(e)}"
-        
-        # DOC文件 (旧版Word)
-        elif file_ext == '.doc':
-            return "", ".doc格式不支持，请转换为.docx格式"
-        
-        else:
-            return "", f"不支持的文件格式: {file_ext}"
-            
+        return await asyncio.get_running_loop().run_in_executor(
+            get_extractor_pool(), extract_local_content, file_path, file_ext
+        )
     except Exception as e:
         logger.error(f"提取文件内容错误: {e}", exc_info=True)
         return "", f"提取文件内容失败: {str(e)}"
@@ -1450,7 +1770,7 @@ async def upload_file(file: UploadFile = File(...)):
         logger.info(f"Content-Type: {file.content_type}")
         
         # 从配置文件读取是否启用MinerU
-        config = load_config()
+        config = await load_config_async()
         use_mineru = config.get("settings", {}).get("use_mineru", False)
         
         logger.info(f"MinerU状态: {'启用' if use_mineru else '禁用'}")
@@ -1492,18 +1812,16 @@ async def upload_file(file: UploadFile = File(...)):
         temp_filename = f"temp_{uuid.uuid4()}{file_ext}"
         temp_path = os.path.join(upload_dir, temp_filename)
         
-        # 保存临时文件
-        with open(temp_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # 保存临时文件，同时计算内容摘要（字段名沿用 md5）
+        file_md5 = await asyncio.to_thread(save_file_with_digest, file.file, temp_path)
+        logger.info(f"文件摘要: {file_md5}")
         
-        # 计算MD5
-        file_md5 = calculate_md5(temp_path)
-        logger.info(f"文件MD5: {file_md5}")
-        
-        # 检查是否已存在相同MD5的文件
-        existing_file = get_file_by_md5(file_md5)
+        # 检查是否已存在相同内容的文件（也会匹配旧版本按 MD5 保存的记录）
+        existing_file = await asyncio.to_thread(find_duplicate, file_md5, temp_path)
         
         if existing_file:
+            # 沿用已有记录的键，旧记录的键是 MD5
+            file_md5 = existing_file["md5"]
             # 文件已存在,删除临时文件,返回已有文件信息
             os.remove(temp_path)
             logger.info(f"文件已存在(MD5: {file_md5}),复用已有文件")
@@ -1530,7 +1848,7 @@ async def upload_file(file: UploadFile = File(...)):
         os.rename(temp_path, file_path)
         
         # 提取文件内容
-        content, error = extract_file_content(file_path, file.filename, use_mineru=use_mineru)
+        content, error = await extract_file_content(file_path, file.filename, use_mineru=use_mineru, file_md5=file_md5)
         
         if error:
             logger.warning(f"文件内容提取失败: {error}")
@@ -1663,7 +1981,8 @@ from provider_manager import (
     test_model,
     get_provider_models,
     add_model_to_provider,
-    delete_model_from_provider
+    delete_model_from_provider,
+    build_model_configs
 )
 
 
@@ -1972,9 +2291,6 @@ async def delete_model_from_provider_endpoint(provider_name: str, model_name: st
 
 # ==================== 会议管理 API ====================
 
-from council_manager import council_manager
-import asyncio
-
 
 @app.post("/api/meetings/start")
 async def start_meeting(request: ChatRequest):
@@ -1988,32 +2304,11 @@ async def start_meeting(request: ChatRequest):
         会议ID和初始状态
     """
     try:
-        # 加载配置
-        config = load_config()
-        
-        # 从providers中构建可用模型列表
-        available_models = set()
-        providers = config.get("providers", [])
-        for provider in providers:
-            provider_name = provider.get("name", "")
-            models = provider.get("models", [])
-            for model in models:
-                model_name = model.get("name", "")
-                full_model_name = f"{model_name}/{provider_name}"
-                available_models.add(full_model_name)
-        
-        # 验证模型是否存在
-        for model in request.models:
-            if model not in available_models:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"模型 '{model}' 不存在"
-                )
+        # 加载配置并验证模型是否存在
+        config = await load_validated_config(request.models)
         
         # 准备附件数据
-        attachments = []
-        if request.attachments:
-            attachments = [att.model_dump() for att in request.attachments]
+        attachments = request.attachment_dicts()
         
         # 创建会议
         meeting_id = await council_manager.create_meeting(
@@ -2076,37 +2371,15 @@ async def stream_meeting_updates(meeting_id: str):
     Returns:
         SSE 流式响应
     """
-    async def event_generator():
+    async def event_generator() -> AsyncGenerator[bytes, None]:
         try:
             # 先获取会议当前状态，发送历史进度
             meeting_data = await council_manager.get_meeting(meeting_id)
             if meeting_data:
-                progress = meeting_data.get('progress', {})
-                
-                # 发送已有的stage1结果
-                if progress.get('stage1_results'):
-                    for result in progress['stage1_results']:
-                        yield format_sse("stage1_progress", {
-                            "model": result.get("model"),
-                            "status": "completed" if not result.get("error") else "error",
-                            "response": result.get("response", ""),
-                            "error": result.get("error")
-                        })
-                    yield format_sse("stage1_complete", {"results": progress['stage1_results']})
-                
-                # 发送已有的stage2结果
-                if progress.get('stage2_results'):
-                    for result in progress['stage2_results']:
-                        yield format_sse("stage2_progress", result)
-                    yield format_sse("stage2_complete", {"results": progress['stage2_results']})
-                
-                # 发送已有的stage3结果
-                if progress.get('stage3_result'):
-                    yield format_sse("stage3_complete", progress['stage3_result'])
-                
-                # 发送已有的stage4结果
-                if progress.get('stage4_result'):
-                    yield format_sse("stage4_complete", progress['stage4_result'])
+                # 已有进度合并为一次写入发送
+                replay = format_progress_replay(meeting_data.get('progress', {}))
+                if replay:
+                    yield replay
             
             # 订阅会议更新
             queue = await council_manager.subscribe(meeting_id)
@@ -2117,17 +2390,17 @@ async def stream_meeting_updates(meeting_id: str):
                     try:
                         update = await asyncio.wait_for(queue.get(), timeout=30.0)
                         
-                        # 根据更新类型发送不同的事件
-                        event_type = update.get("type", "update")
-                        yield format_sse(event_type, update.get("data", update))
+                        # 连同缓冲区中已积压的更新一起转发，合并为一次写入
+                        frame, finished = format_updates_sse([update, *queue.drain_nowait()])
+                        yield frame
                         
                         # 如果会议完成或失败，结束流
-                        if event_type in ["complete", "error"]:
+                        if finished:
                             break
                             
                     except asyncio.TimeoutError:
                         # 发送心跳保持连接
-                        yield format_sse("heartbeat", {"message": "keep-alive"})
+                        yield HEARTBEAT_SSE
                         
             finally:
                 # 取消订阅
@@ -2137,15 +2410,7 @@ async def stream_meeting_updates(meeting_id: str):
             logger.error(f"会议流错误: {e}", exc_info=True)
             yield format_sse("error", {"error": str(e)})
     
-    return StreamingResponse(
-        event_generator(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no"
-        }
-    )
+    return sse_response(event_generator())
 
 
 @app.delete("/api/meetings/{meeting_id}")
@@ -2199,6 +2464,20 @@ async def list_conversation_meetings(conv_id: str):
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+@app.get("/api/metrics")
+async def get_metrics():
+    """
+    获取耗时统计
+    
+    Returns:
+        各阶段耗时和各模型单次请求耗时的 p50/p95/p99（最近的滚动窗口，单位: 秒）
+    """
+    return {
+        "stages": stage_latency_tracker.percentiles(),
+        "requests": latency_tracker.percentiles()
+    }
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     """全局异常处理器"""
@@ -2221,8 +2500,12 @@ async def api_root():
 
 
 if __name__ == "__main__":
+    import multiprocessing
     import uvicorn
     
+    # PyInstaller 打包后，文件解析进程池的子进程需要由此进入
+    multiprocessing.freeze_support()
+    
     # 初始化配置文件
     logger.info("检查并初始化配置文件...")
     ensure_config_files()
@@ -6,7 +6,7 @@
 import json
 import os
 import shutil
-from datetime import datetime
+from datetime import datetime, timezone
 
 
 def migrate_config(old_config_path: str = "backend/config.json", backup: bool = True):
@@ -92,7 +92,7 @@ def migrate_config(old_config_path: str = "backend/config.json", backup: bool =
                 "api_key": api_key,
                 "api_type": api_type,
                 "models": [],
-                "created_at": datetime.utcnow().isoformat() + "Z"
+                "created_at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
             }
         
         # 添加模型到供应商
@@ -5,6 +5,7 @@ MinerU API 客户端
 
 import requests
 import json
+import random
 import time
 import zipfile
 import io
@@ -17,6 +18,38 @@ from urllib3.util.retry import Retry
 
 logger = logging.getLogger(__name__)
 
+# 轮询解析结果的退避参数：从较短间隔开始，按倍数增长到上限，并加入随机抖动
+POLL_INITIAL_DELAY = 0.3  # 首次查询前等待(秒)
+POLL_MAX_DELAY = 8.0  # 查询间隔上限(秒)
+POLL_MULTIPLIER = 1.5  # 每次查询后间隔的增长倍数
+POLL_JITTER = 0.2  # 随机抖动比例(±20%)
+
+
+def poll_delays(
+    initial: float = POLL_INITIAL_DELAY,
+    maximum: float = POLL_MAX_DELAY,
+    multiplier: float = POLL_MULTIPLIER,
+    jitter: float = POLL_JITTER
+):
+    """
+    生成轮询间隔序列（截断指数退避 + 随机抖动）
+    
+    小文件很快解析完成时能尽早拿到结果，大文件解析时查询次数随时间减少
+    
+    Args:
+        initial: 初始间隔(秒)
+        maximum: 间隔上限(秒)
+        multiplier: 增长倍数
+        jitter: 随机抖动比例
+    
+    Yields:
+        下一次查询前的等待时间(秒)
+    """
+    delay = initial
+    while True:
+        yield delay * random.uniform(1 - jitter, 1 + jitter)
+        delay = min(delay * multiplier, maximum)
+
 
 class MinerUClient:
     """MinerU API 客户端"""
@@ -160,7 +193,7 @@ class MinerUClient:
         self,
         task_id: str,
         max_wait_time: int = 600,
-        poll_interval: int = 5
+        poll_interval: Optional[float] = None
     ) -> Tuple[Optional[str], Optional[str]]:
         """
         等待任务完成
@@ -168,12 +201,13 @@ class MinerUClient:
         Args:
             task_id: 任务ID
             max_wait_time: 最大等待时间(秒)
-            poll_interval: 轮询间隔(秒)
+            poll_interval: 固定轮询间隔(秒)，None 时使用指数退避
             
         Returns:
             (full_zip_url, error) 元组
         """
         start_time = time.time()
+        delays = poll_delays()
         
         while time.time() - start_time < max_wait_time:
             task_data, error = self.query_task(task_id)
@@ -198,11 +232,10 @@ class MinerUClient:
                     extracted = progress.get("extracted_pages", 0)
                     total = progress.get("total_pages", 0)
                     logger.info(f"解析进度: {extracted}/{total}")
-                
-                time.sleep(poll_interval)
             else:
                 logger.warning(f"未知状态: {state}")
-                time.sleep(poll_interval)
+            
+            time.sleep(poll_interval if poll_interval is not None else next(delays))
         
         return None, f"任务超时: 超过{max_wait_time}秒"
     
@@ -3,9 +3,10 @@
 使用 Pydantic 定义所有数据结构和验证规则
 """
 
-from pydantic import BaseModel, Field, field_validator
-from typing import Optional, List, Literal
-from datetime import datetime
+from pydantic import BaseModel, Field, PrivateAttr, field_validator
+from typing import Optional, List, Literal, Dict, Any
+import time
+from datetime import datetime, timezone
 
 
 class Attachment(BaseModel):
@@ -30,6 +31,9 @@ class ChatRequest(BaseModel):
     models: List[str] = Field(..., min_length=1, max_length=1000, description="参会模型列表")
     attachments: Optional[List[Attachment]] = Field(None, description="附件列表")
     
+    # 附件的字典形式，首次访问时生成
+    _attachment_dicts: Optional[List[Dict[str, Any]]] = PrivateAttr(default=None)
+    
     @field_validator('attachments', mode='after')
     @classmethod
     def validate_content_or_attachments(cls, v: Optional[List[Attachment]], info) -> Optional[List[Attachment]]:
@@ -51,6 +55,12 @@ class ChatRequest(BaseModel):
         if len(v) > 1000:
             raise ValueError("最多只能选择 1000 个模型")
         return v
+    
+    def attachment_dicts(self) -> List[Dict[str, Any]]:
+        """附件的字典形式（只序列化一次，缓存在请求对象上供各处复用）"""
+        if self._attachment_dicts is None:
+            self._attachment_dicts = [att.model_dump() for att in self.attachments] if self.attachments else []
+        return self._attachment_dicts
 
 
 class Stage1Result(BaseModel):
@@ -112,5 +122,24 @@ class Conversation(BaseModel):
 
 
 def get_iso_timestamp() -> str:
-    """获取 ISO 8601 格式的当前时间戳"""
-    return datetime.utcnow().isoformat() + "Z"
\ No newline at end of file
+    """获取 ISO 8601 格式的当前时间戳（UTC，以 Z 结尾）"""
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+# 缓存的时间戳，最多每 100ms 刷新一次
+TIMESTAMP_CACHE_INTERVAL = 0.1
+_now_cache = {"t": 0.0, "s": ""}
+
+
+def get_iso_timestamp_cached() -> str:
+    """
+    获取 ISO 8601 格式的当前时间戳（缓存版本）
+    
+    在 TIMESTAMP_CACHE_INTERVAL 内重复调用直接返回缓存的字符串，
+    适合会议进度等高频更新场景；需要精确时间时请使用 get_iso_timestamp()
+    """
+    t = time.monotonic()
+    if t - _now_cache["t"] > TIMESTAMP_CACHE_INTERVAL or not _now_cache["s"]:
+        _now_cache["t"] = t
+        _now_cache["s"] = get_iso_timestamp()
+    return _now_cache["s"]
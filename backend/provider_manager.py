@@ -4,33 +4,57 @@
 """
 
 import json
+import os
 import logging
 import httpx
-from typing import List, Dict, Any, Optional, Tuple
-from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple, Callable
+from datetime import datetime, timezone
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
 # 配置文件路径
 CONFIG_FILE = "backend/config.json"
 
+# 配置文件的候选路径（按启动目录不同依次尝试）
+CONFIG_CANDIDATES = (
+    "config.json",  # 当前目录(backend/)
+    "backend/config.json",  # 从项目根目录
+    "../backend/config.json"  # 从其他目录
+)
+
+
+# 配置保存成功后调用的回调（如清除 main 中的配置缓存）
+_save_listeners: List[Callable[[], None]] = []
+
+
+def add_config_save_listener(callback: Callable[[], None]):
+    """
+    注册配置保存后的回调
+    
+    Args:
+        callback: 无参数的回调函数，每次 save_config 成功写入后调用
+    """
+    _save_listeners.append(callback)
+
+
+def _find_config() -> Optional[str]:
+    """查找已存在的配置文件路径，未找到时返回 None"""
+    return next((path for path in CONFIG_CANDIDATES if os.path.isfile(path)), None)
+
 
 def load_config() -> Dict[str, Any]:
     """加载配置文件"""
     try:
-        # 尝试多个可能的配置文件路径
-        config_paths = [
-            "config.json",
-            "backend/config.json",
-            "../backend/config.json"
-        ]
-        
-        for config_path in config_paths:
-            try:
-                with open(config_path, "r", encoding="utf-8") as f:
-                    return json.load(f)
-            except FileNotFoundError:
-                continue
+        config_path = _find_config()
+        if config_path:
+            with open(config_path, "rb") as f:
+                data = f.read()
+            return orjson.loads(data) if orjson is not None else json.loads(data)
         
         logger.error("未找到配置文件")
         return {"providers": [], "chairman": "", "settings": {}}
@@ -42,35 +66,63 @@ def load_config() -> Dict[str, Any]:
 def save_config(config: Dict[str, Any]) -> bool:
     """保存配置文件"""
     try:
-        # 尝试多个可能的配置文件路径
-        config_paths = [
-            "config.json",
-            "backend/config.json",
-            "../backend/config.json"
-        ]
-        
-        config_path = None
-        for path in config_paths:
-            try:
-                with open(path, "r", encoding="utf-8") as f:
-                    json.load(f)
-                    config_path = path
-                    break
-            except FileNotFoundError:
-                continue
-        
-        if not config_path:
-            # 如果都不存在，使用默认路径
-            config_path = "backend/config.json"
-        
-        with open(config_path, "w", encoding="utf-8") as f:
-            json.dump(config, f, ensure_ascii=False, indent=2)
+        # 写回已存在的配置文件，都不存在时使用默认路径
+        config_path = _find_config() or CONFIG_FILE
+        
+        # 先写临时文件再原子替换，避免并发读取到写了一半的配置
+        if orjson is not None:
+            payload = orjson.dumps(config, option=orjson.OPT_INDENT_2)
+        else:
+            payload = json.dumps(config, ensure_ascii=False, indent=2).encode("utf-8")
+        tmp_path = config_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, config_path)
+        for callback in _save_listeners:
+            callback()
         return True
     except Exception as e:
         logger.error(f"保存配置文件失败: {e}")
         return False
 
 
+def build_model_configs(config: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    根据供应商配置构建模型配置字典
+    
+    Args:
+        config: 配置信息(包含 providers)
+    
+    Returns:
+        模型配置字典，键为模型全名 "模型名称/供应商"
+    """
+    model_configs = {}
+    for provider in config.get("providers", []):
+        provider_name = provider.get("name", "")
+        url = provider.get("url", "")
+        api_key = provider.get("api_key", "")
+        api_type = provider.get("api_type", "openai")
+        
+        for model in provider.get("models", []):
+            model_name = model.get("name", "")
+            full_model_name = f"{model_name}/{provider_name}"
+            
+            model_configs[full_model_name] = {
+                "name": full_model_name,
+                # 发给 API 的模型名（不含供应商后缀），构建时确定一次，请求时无需再拆分
+                "api_model_name": model_name,
+                "display_name": model.get("display_name", model_name),
+                "description": model.get("description", ""),
+                "url": url,
+                "api_key": api_key,
+                "api_type": api_type,
+                "provider": provider_name
+            }
+    return model_configs
+
+
 def load_providers() -> List[Dict[str, Any]]:
     """加载供应商配置"""
     config = load_config()
@@ -108,7 +160,7 @@ def add_provider(name: str, url: str, api_key: str, api_type: str) -> Tuple[bool
             "api_key": api_key,
             "api_type": api_type.lower(),
             "models": [],
-            "created_at": datetime.utcnow().isoformat() + "Z"
+            "created_at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
         }
         
         providers.append(provider)
@@ -162,7 +214,7 @@ def update_provider(name: str, url: Optional[str] = None, api_key: Optional[str]
                 return False, "API类型必须是 openai 或 anthropic"
             provider["api_type"] = api_type.lower()
         
-        provider["updated_at"] = datetime.utcnow().isoformat() + "Z"
+        provider["updated_at"] = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
         
         if save_config(config):
             return True, ""
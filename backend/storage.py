@@ -5,23 +5,150 @@
 
 import json
 import os
+import tempfile
+import threading
+import time
 from pathlib import Path
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Callable, Tuple
 from datetime import datetime
 
+# orjson 为可选依赖，序列化大对话文件时明显快于标准库 json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 # 数据目录路径
 DATA_DIR = Path("data/conversations")
 
+# 追加日志中的消息数超过该值（且超过快照中的消息数）时，合并回 JSON 快照
+LOG_COMPACT_MIN_LINES = 20
+
+# 每个对话一把可重入锁：读-改-写和追加日志都在锁内进行，不同写入者之间不会互相覆盖
+_conversation_locks: Dict[str, threading.RLock] = {}
+_locks_guard = threading.Lock()
+
 
 def ensure_data_directory() -> None:
     """确保 data/conversations 目录存在"""
     DATA_DIR.mkdir(parents=True, exist_ok=True)
 
 
+def conversation_lock(conv_id: str) -> threading.RLock:
+    """
+    获取对话的写入锁
+    
+    先加载、修改后再保存的调用方必须在整个过程中持有该锁，
+    否则其他写入者在加载与保存之间追加的消息会被覆盖
+    
+    Args:
+        conv_id: 对话 ID
+        
+    Returns:
+        该对话专用的可重入锁
+    """
+    with _locks_guard:
+        lock = _conversation_locks.get(conv_id)
+        if lock is None:
+            lock = _conversation_locks[conv_id] = threading.RLock()
+        return lock
+
+
+def _log_path(conv_id: str) -> Path:
+    """对话追加日志文件路径（每行一条追加的消息）"""
+    return DATA_DIR / f"{conv_id}.jsonl"
+
+
+def _read_log(conv_id: str) -> List[dict]:
+    """
+    读取对话的追加日志
+    
+    Args:
+        conv_id: 对话 ID
+        
+    Returns:
+        日志条目列表 [{"message": ..., "updated_at": ...}]，写入不完整的行会被跳过
+    """
+    log_path = _log_path(conv_id)
+    if not log_path.exists():
+        return []
+    
+    entries = []
+    try:
+        with open(log_path, 'rb') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(orjson.loads(line) if orjson is not None else json.loads(line))
+                except ValueError:
+                    continue
+    except IOError:
+        return []
+    return entries
+
+
+def _dump_log_entry(entry: dict) -> bytes:
+    """序列化一条日志（单行，以换行结尾）"""
+    if orjson is not None:
+        return orjson.dumps(entry, option=orjson.OPT_NON_STR_KEYS) + b"\n"
+    return (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _is_folded(entry: dict, log_seq: int) -> bool:
+    """日志条目是否已合并进快照（没有序号的旧格式条目总是在下次保存快照时合并）"""
+    seq = entry.get("seq")
+    return seq is not None and seq <= log_seq
+
+
+def _truncate_log(conv_id: str, log_seq: int) -> None:
+    """
+    删除已合并进快照的日志条目，保留快照之后追加的条目
+    
+    Args:
+        conv_id: 对话 ID
+        log_seq: 快照已合并的最后一条日志的序号
+    """
+    log_path = _log_path(conv_id)
+    remaining = [
+        entry for entry in _read_log(conv_id)
+        if entry.get("seq") is not None and not _is_folded(entry, log_seq)
+    ]
+    if not remaining:
+        log_path.unlink(missing_ok=True)
+        return
+    
+    fd, tmp_path = tempfile.mkstemp(prefix=f"{conv_id}.", suffix=".tmp", dir=DATA_DIR)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(b"".join(_dump_log_entry(entry) for entry in remaining))
+        os.replace(tmp_path, log_path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+def _read_json_file(file_path: Path) -> dict:
+    """
+    读取并解析 JSON 文件（有 orjson 时使用 orjson）
+    
+    Raises:
+        json.JSONDecodeError: 文件内容不是合法 JSON（orjson.JSONDecodeError 是其子类）
+        IOError: 文件读取失败
+    """
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
 def save_conversation(conv_id: str, conversation: dict) -> None:
     """
-    保存对话到 JSON 文件
+    保存对话到 JSON 文件（完整快照）
+    
+    追加日志中只删除已合并进该快照的条目（序号不超过 conversation["log_seq"]），
+    快照加载之后才追加的条目会保留下来，在下次加载时合并
     
     Args:
         conv_id: 对话 ID
@@ -30,13 +157,58 @@ def save_conversation(conv_id: str, conversation: dict) -> None:
     ensure_data_directory()
     file_path = DATA_DIR / f"{conv_id}.json"
     
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(conversation, f, ensure_ascii=False, indent=2)
+    if orjson is not None:
+        data = orjson.dumps(conversation, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    else:
+        data = json.dumps(conversation, ensure_ascii=False, indent=2).encode("utf-8")
+    
+    with conversation_lock(conv_id):
+        # 先写入临时文件再原子替换，并发读取（如列出对话）不会读到写了一半的文件；
+        # 临时文件名唯一，同一对话的并发保存互不覆盖
+        fd, tmp_path = tempfile.mkstemp(prefix=f"{conv_id}.", suffix=".tmp", dir=DATA_DIR)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+        
+        _truncate_log(conv_id, conversation.get("log_seq", 0))
+
+
+def append_message(conv_id: str, message: dict, updated_at: str) -> None:
+    """
+    向对话追加一条消息（只写一行日志，不重写整个对话文件）
+    
+    日志会在 load_conversation 时合并，消息较多时自动合并回 JSON 快照
+    
+    Args:
+        conv_id: 对话 ID
+        message: 消息字典
+        updated_at: 对话更新时间
+    """
+    ensure_data_directory()
+    
+    with conversation_lock(conv_id):
+        # 序号单调递增：日志为空时取当前时间（纳秒），一定大于此前合并进快照的序号
+        entries = _read_log(conv_id)
+        last_seq = max((entry.get("seq") or 0 for entry in entries), default=0)
+        entry = {"seq": max(time.time_ns(), last_seq + 1), "message": message, "updated_at": updated_at}
+        line = _dump_log_entry(entry)
+        
+        with open(_log_path(conv_id), 'a+b') as f:
+            # 上次写入不完整（进程中断）时先换行，避免与残缺的行粘在一起
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    line = b"\n" + line
+            f.write(line)
 
 
 def load_conversation(conv_id: str) -> Optional[dict]:
     """
-    从 JSON 文件加载对话
+    从 JSON 文件加载对话（合并追加日志中的消息）
     
     Args:
         conv_id: 对话 ID
@@ -46,14 +218,91 @@ def load_conversation(conv_id: str) -> Optional[dict]:
     """
     file_path = DATA_DIR / f"{conv_id}.json"
     
-    if not file_path.exists():
-        return None
+    with conversation_lock(conv_id):
+        if not file_path.exists():
+            return None
+        
+        try:
+            conversation = _read_json_file(file_path)
+        except (json.JSONDecodeError, IOError):
+            return None
+        
+        # 合并追加日志中的消息（跳过已合并进快照、但还没来得及从日志删除的条目）
+        log_seq = conversation.get("log_seq", 0)
+        entries = [entry for entry in _read_log(conv_id) if not _is_folded(entry, log_seq)]
+        if entries:
+            snapshot_count = len(conversation.get("messages", []))
+            messages = conversation.setdefault("messages", [])
+            for entry in entries:
+                messages.append(entry["message"])
+                conversation["updated_at"] = entry.get("updated_at", conversation.get("updated_at"))
+                if entry.get("seq") is not None:
+                    log_seq = max(log_seq, entry["seq"])
+            conversation["log_seq"] = log_seq
+            
+            # 日志过长时合并回快照，保证读取开销不会无限增长（持有锁，不会丢失并发追加的消息）
+            if len(entries) > max(LOG_COMPACT_MIN_LINES, snapshot_count):
+                save_conversation(conv_id, conversation)
     
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, IOError):
-        return None
+    return conversation
+
+
+def update_conversation(conv_id: str, update: Callable[[dict], Optional[bool]]) -> Optional[dict]:
+    """
+    在对话锁内完成 加载 → 修改 → 保存
+    
+    Args:
+        conv_id: 对话 ID
+        update: 修改函数，接收对话字典并原地修改；返回 False 时不保存
+        
+    Returns:
+        修改后的对话数据字典，对话不存在时返回 None
+    """
+    with conversation_lock(conv_id):
+        conversation = load_conversation(conv_id)
+        if conversation is None:
+            return None
+        if update(conversation) is not False:
+            save_conversation(conv_id, conversation)
+        return conversation
+
+
+def append_assistant_message(
+    conv_id: str,
+    message: dict,
+    title: Optional[str] = None
+) -> Tuple[Optional[dict], bool]:
+    """
+    向对话追加本轮的助手消息（最后一条已是助手消息时视为已保存，不再追加）
+    
+    检查与写入在同一把对话锁内完成；提供标题且为第一轮对话时连同标题重写快照，否则只追加日志
+    
+    Args:
+        conv_id: 对话 ID
+        message: 助手消息字典
+        title: 要一并写入的对话标题（仅第一轮对话生效）
+        
+    Returns:
+        (conversation, appended) 元组：对话不存在时为 (None, False)，
+        已有助手消息时 appended 为 False
+    """
+    with conversation_lock(conv_id):
+        conversation = load_conversation(conv_id)
+        if conversation is None:
+            return None, False
+        
+        messages = conversation.setdefault("messages", [])
+        if messages and messages[-1].get("role") == "assistant":
+            return conversation, False
+        
+        messages.append(message)
+        conversation["updated_at"] = message.get("timestamp", conversation.get("updated_at"))
+        if title is not None and len(messages) == 2:
+            conversation["title"] = title
+            save_conversation(conv_id, conversation)
+        else:
+            append_message(conv_id, message, conversation["updated_at"])
+        return conversation, True
 
 
 def list_conversations() -> List[dict]:
@@ -71,16 +320,20 @@ def list_conversations() -> List[dict]:
     # 遍历所有 JSON 文件
     for file_path in DATA_DIR.glob("*.json"):
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                
+            data = _read_json_file(file_path)
+            
+            # 追加日志中尚未合并进快照的消息也要计入
+            log_seq = data.get("log_seq", 0)
+            entries = [entry for entry in _read_log(file_path.stem) if not _is_folded(entry, log_seq)]
+            updated_at = entries[-1].get("updated_at", "") if entries else data.get("updated_at", "")
+            
             # 提取对话信息
             conversations.append({
                 "id": data.get("id", file_path.stem),
                 "title": data.get("title", "未命名对话"),
                 "created_at": data.get("created_at", ""),
-                "updated_at": data.get("updated_at", ""),
-                "message_count": len(data.get("messages", []))
+                "updated_at": updated_at,
+                "message_count": len(data.get("messages", [])) + len(entries)
             })
         except (json.JSONDecodeError, IOError, KeyError):
             # 跳过损坏的文件
@@ -92,6 +345,19 @@ def list_conversations() -> List[dict]:
     return conversations
 
 
+def conversation_exists(conv_id: str) -> bool:
+    """
+    检查对话是否存在（只检查文件，不读取内容）
+    
+    Args:
+        conv_id: 对话 ID
+        
+    Returns:
+        对话文件是否存在
+    """
+    return (DATA_DIR / f"{conv_id}.json").exists()
+
+
 def delete_conversation(conv_id: str) -> bool:
     """
     删除对话文件
@@ -108,7 +374,11 @@ def delete_conversation(conv_id: str) -> bool:
         return False
     
     try:
-        file_path.unlink()
+        with conversation_lock(conv_id):
+            file_path.unlink()
+            _log_path(conv_id).unlink(missing_ok=True)
+        with _locks_guard:
+            _conversation_locks.pop(conv_id, None)
         return True
     except OSError:
         return False
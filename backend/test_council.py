@@ -4,15 +4,21 @@
 
 import asyncio
 import logging
+import random
+import re
 from typing import List, Dict, Any
 
 from council import (
     build_context,
-    parse_ranking,
+    parse_scores,
     collect_responses,
-    collect_rankings,
+    collect_scores,
     synthesize_final,
-    run_council
+    run_council,
+    IncrementalRanker,
+    _iter_with_quorum,
+    _replace_delimited,
+    _iter_bracket_spans
 )
 
 # 配置日志
@@ -66,52 +72,40 @@ def test_build_context():
     print("\n✅ build_context() 所有测试通过!\n")
 
 
-def test_parse_ranking():
-    """测试排名解析功能"""
+def test_parse_scores():
+    """测试打分解析功能"""
     print("\n" + "=" * 60)
-    print("测试 2: parse_ranking() - 排名解析")
+    print("测试 2: parse_scores() - 打分解析")
     print("=" * 60)
     
-    labels = ["A", "B", "C", "D"]
-    
-    # 测试用例 1: "A > B > C" 格式
-    ranking = "A > B > C > D"
-    parsed = parse_ranking(ranking, labels)
-    assert parsed == ["A", "B", "C", "D"], f"解析错误: {parsed}"
-    print("✓ 测试用例 1 通过: 'A > B > C' 格式")
-    
-    # 测试用例 2: 编号列表格式
-    ranking = "1. A\n2. B\n3. C\n4. D"
-    parsed = parse_ranking(ranking, labels)
-    assert parsed == ["A", "B", "C", "D"], f"解析错误: {parsed}"
-    print("✓ 测试用例 2 通过: 编号列表格式")
-    
-    # 测试用例 3: 逗号分隔格式
-    ranking = "排名: A, B, C, D"
-    parsed = parse_ranking(ranking, labels)
-    assert parsed == ["A", "B", "C", "D"], f"解析错误: {parsed}"
-    print("✓ 测试用例 3 通过: 逗号分隔格式")
-    
-    # 测试用例 4: 直接字母格式
-    ranking = "A B C D"
-    parsed = parse_ranking(ranking, labels)
-    assert parsed == ["A", "B", "C", "D"], f"解析错误: {parsed}"
-    print("✓ 测试用例 4 通过: 直接字母格式")
-    
-    # 测试用例 5: 部分排名(自动补全)
-    ranking = "A > B"
-    parsed = parse_ranking(ranking, labels)
-    assert parsed[:2] == ["A", "B"], f"解析错误: {parsed}"
-    assert len(parsed) == 4, "应该补全所有标签"
-    print("✓ 测试用例 5 通过: 部分排名(自动补全)")
-    
-    # 测试用例 6: 无效格式(返回原始顺序)
-    ranking = "这是无效的排名"
-    parsed = parse_ranking(ranking, labels)
-    assert len(parsed) == 4, "应该返回所有标签"
-    print("✓ 测试用例 6 通过: 无效格式(返回原始顺序)")
-    
-    print("\n✅ parse_ranking() 所有测试通过!\n")
+    labels = ["#1", "#2", "#3"]
+    
+    # 测试用例 1: "#1: 8分" 格式
+    scores = parse_scores("#1: 8分, #2: 9分, #3: 7分", labels)
+    assert scores == {"#1": 8.0, "#2": 9.0, "#3": 7.0}, f"解析错误: {scores}"
+    print("✓ 测试用例 1 通过: '#1: 8分' 格式")
+    
+    # 测试用例 2: "#1=8" 格式
+    scores = parse_scores("#1=8, #2 = 9.5, #3=7", labels)
+    assert scores == {"#1": 8.0, "#2": 9.5, "#3": 7.0}, f"解析错误: {scores}"
+    print("✓ 测试用例 2 通过: '#1=8' 格式")
+    
+    # 测试用例 3: 不给自己打分
+    scores = parse_scores("#1: 8\n#2: 9\n#3: 7", labels, reviewer_label="#2")
+    assert scores == {"#1": 8.0, "#3": 7.0}, f"解析错误: {scores}"
+    print("✓ 测试用例 3 通过: 跳过评审者自己")
+    
+    # 测试用例 4: 超出范围的编号和分数被忽略
+    scores = parse_scores("#1: 8, #4: 9, #3: 11", labels)
+    assert scores == {"#1": 8.0}, f"解析错误: {scores}"
+    print("✓ 测试用例 4 通过: 忽略无效编号和分数")
+    
+    # 测试用例 5: 无效格式(返回空字典)
+    assert parse_scores("这是无效的打分", labels) == {}
+    assert parse_scores("", labels) == {}
+    print("✓ 测试用例 5 通过: 无效格式返回空字典")
+    
+    print("\n✅ parse_scores() 所有测试通过!\n")
 
 
 async def test_collect_responses_mock():
@@ -152,10 +146,10 @@ async def test_collect_responses_mock():
     print("\n✅ collect_responses() 测试结构正确(需要实际 API 才能完整测试)\n")
 
 
-async def test_collect_rankings_mock():
-    """测试 Stage 2 排名收集(模拟)"""
+async def test_collect_scores_mock():
+    """测试 Stage 2 打分收集(模拟)"""
     print("\n" + "=" * 60)
-    print("测试 4: collect_rankings() - Stage 2 排名收集(模拟)")
+    print("测试 4: collect_scores() - Stage 2 打分收集(模拟)")
     print("=" * 60)
     
     # 模拟 Stage 1 结果
@@ -190,9 +184,9 @@ async def test_collect_rankings_mock():
     print(f"  - 评审模型: {models}")
     
     # 由于没有实际的 API,这里只是展示调用方式
-    # results = await collect_rankings(query, stage1_results, context, models, model_configs)
+    # results = await collect_scores(query, stage1_results, context, models, model_configs)
     
-    print("\n✅ collect_rankings() 测试结构正确(需要实际 API 才能完整测试)\n")
+    print("\n✅ collect_scores() 测试结构正确(需要实际 API 才能完整测试)\n")
 
 
 async def test_synthesize_final_mock():
@@ -295,6 +289,174 @@ async def test_run_council_mock():
     print("\n✅ run_council() 测试结构正确(需要实际 API 才能完整测试)\n")
 
 
+def _random_text(alphabet: str, max_length: int = 40) -> str:
+    """生成随机测试文本"""
+    return "".join(random.choice(alphabet) for _ in range(random.randint(0, max_length)))
+
+
+def test_replace_delimited():
+    """测试定界符替换与非贪婪正则等价"""
+    print("\n" + "=" * 60)
+    print("测试 7: _replace_delimited() - 定界符替换")
+    print("=" * 60)
+    
+    assert _replace_delimited("a \\[x\\] b \\[y\\]", "\\[", "\\]", "$$", "$$") == "a $$x$$ b $$y$$"
+    print("✓ 测试用例 1 通过: 多个片段")
+    
+    assert _replace_delimited("a \\[x \\[y", "\\[", "\\]", "$$", "$$") == "a \\[x \\[y"
+    print("✓ 测试用例 2 通过: 未闭合的起始标记保持原样")
+    
+    # 随机文本与正则 open(.*?)close (DOTALL) 的结果逐一比较
+    random.seed(0)
+    marks = [("\\[", "\\]", "$$", "$$"), ("\\(", "\\)", "$", "$"), ("$$", "$$", "<", ">")]
+    for _ in range(5000):
+        text = _random_text("\\[]()$a \n")
+        for open_mark, close_mark, left, right in marks:
+            pattern = re.escape(open_mark) + r"(.*?)" + re.escape(close_mark)
+            expected = re.sub(pattern, lambda m: left + m.group(1) + right, text, flags=re.DOTALL)
+            actual = _replace_delimited(text, open_mark, close_mark, left, right)
+            assert actual == expected, f"结果不一致: {text!r} {open_mark!r}"
+    print("✓ 测试用例 3 通过: 随机文本与正则结果一致")
+    
+    print("\n✅ _replace_delimited() 所有测试通过!\n")
+
+
+def test_iter_bracket_spans():
+    """测试方括号片段扫描与正则等价"""
+    print("\n" + "=" * 60)
+    print("测试 8: _iter_bracket_spans() - 方括号片段扫描")
+    print("=" * 60)
+    
+    assert list(_iter_bracket_spans("[ a ] `[b] [c](url)")) == [(0, 5, "a")]
+    print("✓ 测试用例 1 通过: 跳过代码和 Markdown 链接")
+    
+    # 随机文本与正则 finditer 的结果逐一比较
+    random.seed(0)
+    pattern = re.compile(r"(?<!`)\[\s*(.*?)\s*\](?!\()", re.DOTALL)
+    for _ in range(5000):
+        text = _random_text("[]()`a \n")
+        expected = [(m.start(), m.end(), m.group(1)) for m in pattern.finditer(text)]
+        actual = list(_iter_bracket_spans(text))
+        assert actual == expected, f"结果不一致: {text!r}"
+    print("✓ 测试用例 2 通过: 随机文本与正则结果一致")
+    
+    print("\n✅ _iter_bracket_spans() 所有测试通过!\n")
+
+
+async def test_iter_with_quorum():
+    """测试法定人数与掉队任务取消"""
+    print("\n" + "=" * 60)
+    print("测试 9: _iter_with_quorum() - 法定人数")
+    print("=" * 60)
+    
+    cancelled = []
+    
+    async def job(name: str, delay: float):
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(name)
+            raise
+        return {"model": name}
+    
+    def make_timeout_result(name: str):
+        return {"model": name, "error": "timeout", "timed_out": True}
+    
+    delays = {"m1": 0.05, "m2": 0.1, "m3": 0.12, "m4": 10}
+    
+    # 不设置法定人数时等待全部完成，按完成顺序返回
+    results = [
+        r async for r in _iter_with_quorum(
+            [(name, job(name, delay)) for name, delay in delays.items() if name != "m4"],
+            make_timeout_result
+        )
+    ]
+    assert [r["model"] for r in results] == ["m1", "m2", "m3"]
+    print("✓ 测试用例 1 通过: 按完成顺序返回")
+    
+    # 达到法定人数后取消掉队的任务，并返回超时结果
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    results = [
+        r async for r in _iter_with_quorum(
+            [(name, job(name, delay)) for name, delay in delays.items()],
+            make_timeout_result,
+            quorum_fraction=0.5,
+            straggler_multiplier=3
+        )
+    ]
+    assert loop.time() - start < 1
+    assert [r["model"] for r in results] == ["m1", "m2", "m3", "m4"]
+    assert results[-1]["timed_out"] and "error" not in results[2]
+    await asyncio.sleep(0)
+    assert cancelled == ["m4"]
+    print("✓ 测试用例 2 通过: 掉队任务被取消")
+    
+    # 调用方提前停止迭代时取消剩余任务
+    cancelled.clear()
+    gen = _iter_with_quorum([(name, job(name, delay)) for name, delay in delays.items()], make_timeout_result)
+    first = await gen.__anext__()
+    await gen.aclose()
+    await asyncio.sleep(0)
+    assert first["model"] == "m1"
+    assert sorted(cancelled) == ["m2", "m3", "m4"]
+    print("✓ 测试用例 3 通过: 提前停止时不留下后台任务")
+    
+    print("\n✅ _iter_with_quorum() 所有测试通过!\n")
+
+
+def test_incremental_ranker():
+    """测试 Stage 4 增量打分汇总"""
+    print("\n" + "=" * 60)
+    print("测试 10: IncrementalRanker - 增量打分汇总")
+    print("=" * 60)
+    
+    stage1_results = [
+        {"model": "m1", "response": "回答1"},
+        {"model": "m2", "response": "回答2"},
+        {"model": "m3", "response": "回答3"},
+        {"model": "m4", "error": "请求失败"}
+    ]
+    ranker = IncrementalRanker(stage1_results)
+    assert ranker.labels == ["#1", "#2", "#3"]
+    assert ranker.expected_score_count == 2
+    print("✓ 测试用例 1 通过: 只为成功的响应分配标签")
+    
+    # 每次更新后都可以获取临时排名
+    ranker.update({"model": "m1", "scores": {"#2": 8, "#3": 6}})
+    partial = ranker.partial_ranking()
+    assert [r["label"] for r in partial] == ["#2", "#3", "#1"]
+    assert partial[-1]["score_count"] == 0 and "response" not in partial[0]
+    print("✓ 测试用例 2 通过: 临时排名")
+    
+    # 无效的评分者不计入平均分
+    ranker.update({"model": "m2", "scores": {"#1": 9, "#3": 7}})
+    ranker.update({"model": "m3", "scores": {"#1": 1}})
+    ranker.update({"model": "m4", "error": "timeout", "timed_out": True})
+    ranker.update({"model": "m5", "scores": {}})
+    summary = ranker.scoring_summary
+    assert summary["m3"]["valid"] is False and summary["m3"]["actual"] == 1
+    assert summary["m4"]["valid"] is False and summary["m4"]["timed_out"] is True
+    assert summary["m5"]["valid"] is False and summary["m5"]["actual"] == 0
+    print("✓ 测试用例 3 通过: 识别无效评分者")
+    
+    final = ranker.finalize()
+    assert [(r["model"], r["avg_score"], r["score_count"]) for r in final["rankings"]] == [
+        ("m1", 9.0, 1), ("m2", 8.0, 1), ("m3", 6.5, 2)
+    ]
+    assert final["best_answer"] == "回答1"
+    assert final["valid_scorer_count"] == 2
+    assert final["rankings"][2]["scorer_valid"] is False
+    print("✓ 测试用例 4 通过: 最终排名")
+    
+    # 没有成功的响应时返回错误
+    final = IncrementalRanker([{"model": "m1", "error": "请求失败"}]).finalize()
+    assert final["rankings"] == [] and final["error"]
+    print("✓ 测试用例 5 通过: 没有有效响应")
+    
+    print("\n✅ IncrementalRanker 所有测试通过!\n")
+
+
 def main():
     """运行所有测试"""
     print("\n" + "=" * 60)
@@ -303,19 +465,23 @@ def main():
     
     # 同步测试
     test_build_context()
-    test_parse_ranking()
+    test_parse_scores()
+    test_replace_delimited()
+    test_iter_bracket_spans()
+    test_incremental_ranker()
     
     # 异步测试(模拟)
     asyncio.run(test_collect_responses_mock())
-    asyncio.run(test_collect_rankings_mock())
+    asyncio.run(test_collect_scores_mock())
     asyncio.run(test_synthesize_final_mock())
     asyncio.run(test_run_council_mock())
+    asyncio.run(test_iter_with_quorum())
     
     print("\n" + "=" * 60)
     print("✅ 所有测试完成!")
     print("=" * 60)
     print("\n注意事项:")
-    print("1. build_context() 和 parse_ranking() 已完全测试")
+    print("1. build_context() 和 parse_scores() 已完全测试")
     print("2. Stage 1/2/3 的测试需要实际的 LLM API 才能完整运行")
     print("3. 可以使用 test_llm_client.py 中的模拟 API 进行集成测试")
     print("4. 所有函数的结构和逻辑已验证正确")
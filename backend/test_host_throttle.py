@@ -0,0 +1,203 @@
+"""
+测试主机限流与 Retry-After 解析（llm_client.py）
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+# 添加 backend 目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from llm_client import (
+    HostThrottle,
+    parse_retry_after,
+    get_backoff_time,
+    get_host_throttle,
+    configure_host_throttles,
+    MAX_RETRY_AFTER,
+    HOST_RATE_PER_SECOND
+)
+
+
+def test_parse_retry_after():
+    """测试 Retry-After 解析"""
+    print("\n" + "=" * 60)
+    print("测试 1: parse_retry_after() - Retry-After 解析")
+    print("=" * 60)
+    
+    assert parse_retry_after(httpx.Response(429, headers={"Retry-After": "5"})) == 5.0
+    assert parse_retry_after(httpx.Response(503, headers={"Retry-After": "1.5"})) == 1.5
+    print("✓ 测试用例 1 通过: 429/503 的秒数")
+    
+    assert parse_retry_after(httpx.Response(429, headers={"Retry-After": "3600"})) == MAX_RETRY_AFTER
+    assert parse_retry_after(httpx.Response(429, headers={"Retry-After": "-3"})) == 0.0
+    print("✓ 测试用例 2 通过: 限制在 0 ~ MAX_RETRY_AFTER 之间")
+    
+    assert parse_retry_after(None) is None
+    assert parse_retry_after(httpx.Response(500, headers={"Retry-After": "5"})) is None
+    assert parse_retry_after(httpx.Response(429)) is None
+    assert parse_retry_after(httpx.Response(429, headers={"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})) is None
+    print("✓ 测试用例 3 通过: 其他状态码、缺失或日期格式返回 None")
+    
+    # 退避时间优先遵循 Retry-After，否则使用全抖动指数退避
+    request = httpx.Request("POST", "https://api.example.com/v1/chat/completions")
+    response = httpx.Response(429, headers={"Retry-After": "7"}, request=request)
+    error = httpx.HTTPStatusError("429", request=request, response=response)
+    assert get_backoff_time(0, error) == 7.0
+    for attempt in range(6):
+        assert 0 <= get_backoff_time(attempt, max_backoff=2) <= 2
+    print("✓ 测试用例 4 通过: get_backoff_time() 遵循 Retry-After")
+    
+    print("\n✅ parse_retry_after() 所有测试通过!\n")
+
+
+async def test_token_bucket():
+    """测试令牌桶限速"""
+    print("\n" + "=" * 60)
+    print("测试 2: HostThrottle - 令牌桶")
+    print("=" * 60)
+    
+    throttle = HostThrottle(rate=10, burst=2, concurrency=10)
+    
+    # 令牌桶容量内的请求立即放行
+    start = time.monotonic()
+    for _ in range(2):
+        await throttle.acquire()
+        throttle.release()
+    assert time.monotonic() - start < 0.05
+    print("✓ 测试用例 1 通过: 突发请求立即放行")
+    
+    # 令牌耗尽后按补充速率放行
+    await throttle.acquire()
+    throttle.release()
+    elapsed = time.monotonic() - start
+    assert 0.08 <= elapsed < 0.5, f"等待时间异常: {elapsed:.3f}s"
+    print("✓ 测试用例 2 通过: 令牌耗尽后等待补充")
+    
+    print("\n✅ 令牌桶所有测试通过!\n")
+
+
+async def test_concurrency_limit():
+    """测试并发上限"""
+    print("\n" + "=" * 60)
+    print("测试 3: HostThrottle - 并发上限")
+    print("=" * 60)
+    
+    throttle = HostThrottle(rate=1000, burst=100, concurrency=2)
+    active = 0
+    peak = 0
+    
+    async def request():
+        nonlocal active, peak
+        async with throttle:
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.02)
+            active -= 1
+    
+    await asyncio.gather(*(request() for _ in range(6)))
+    assert peak == 2
+    print("✓ 测试用例 1 通过: 同时进行的请求不超过并发上限")
+    
+    # 等待中被取消时归还并发名额
+    await throttle.acquire()
+    await throttle.acquire()
+    waiter = asyncio.create_task(throttle.acquire())
+    await asyncio.sleep(0.01)
+    waiter.cancel()
+    try:
+        await waiter
+    except asyncio.CancelledError:
+        pass
+    throttle.release()
+    throttle.release()
+    await asyncio.wait_for(throttle.acquire(), timeout=0.5)
+    await asyncio.wait_for(throttle.acquire(), timeout=0.5)
+    print("✓ 测试用例 2 通过: 取消等待不占用名额")
+    
+    print("\n✅ 并发上限所有测试通过!\n")
+
+
+async def test_pause():
+    """测试 Retry-After 暂停"""
+    print("\n" + "=" * 60)
+    print("测试 4: HostThrottle - 暂停")
+    print("=" * 60)
+    
+    throttle = HostThrottle(rate=1000, burst=100, concurrency=10)
+    throttle.pause(0.2)
+    throttle.pause(0.05)  # 较短的暂停不会缩短已有的暂停
+    
+    start = time.monotonic()
+    async with throttle:
+        pass
+    elapsed = time.monotonic() - start
+    assert 0.18 <= elapsed < 0.6, f"等待时间异常: {elapsed:.3f}s"
+    print("✓ 测试用例 1 通过: 暂停结束后才放行")
+    
+    # 同一主机共享限流器
+    assert get_host_throttle("https://api.example.com/v1/a") is get_host_throttle("https://api.example.com/v1/b")
+    assert get_host_throttle("https://api.example.com/v1/a") is not get_host_throttle("https://other.example.com/v1/a")
+    print("✓ 测试用例 2 通过: 按主机划分限流器")
+    
+    print("\n✅ 暂停所有测试通过!\n")
+
+
+def test_configure_host_throttles():
+    """测试根据设置配置主机限流"""
+    print("\n" + "=" * 60)
+    print("测试 5: configure_host_throttles() - 限流设置")
+    print("=" * 60)
+    
+    url = "https://api.example.com/v1/chat/completions"
+    
+    # 未单独设置时跟随 max_concurrent
+    configure_host_throttles({"max_concurrent": 40})
+    throttle = get_host_throttle(url)
+    assert (throttle.concurrency, throttle.burst, throttle.rate) == (40, 40, HOST_RATE_PER_SECOND)
+    assert throttle.host == "api.example.com"
+    print("✓ 测试用例 1 通过: 默认限制跟随 max_concurrent")
+    
+    # 设置不变时复用已有限流器
+    configure_host_throttles({"max_concurrent": 40})
+    assert get_host_throttle(url) is throttle
+    print("✓ 测试用例 2 通过: 设置不变时复用限流器")
+    
+    # 显式设置覆盖默认值，并替换已有限流器
+    configure_host_throttles({
+        "max_concurrent": 40,
+        "host_max_concurrency": 8,
+        "host_rate_per_second": 50,
+        "host_burst": 5
+    })
+    new_throttle = get_host_throttle(url)
+    assert new_throttle is not throttle
+    assert (new_throttle.concurrency, new_throttle.burst, new_throttle.rate) == (8, 5, 50)
+    print("✓ 测试用例 3 通过: 显式设置生效")
+    
+    print("\n✅ configure_host_throttles() 所有测试通过!\n")
+
+
+def main():
+    """运行所有测试"""
+    print("\n" + "=" * 60)
+    print("开始运行主机限流测试套件")
+    print("=" * 60)
+    
+    test_parse_retry_after()
+    asyncio.run(test_token_bucket())
+    asyncio.run(test_concurrency_limit())
+    asyncio.run(test_pause())
+    test_configure_host_throttles()
+    
+    print("\n" + "=" * 60)
+    print("✅ 所有测试完成!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
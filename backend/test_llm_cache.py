@@ -0,0 +1,188 @@
+"""
+测试会议结果缓存 llm_cache.py
+"""
+
+import sys
+from pathlib import Path
+
+# 添加 backend 目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+import llm_cache as llm_cache_module
+from llm_cache import LLMCache, is_cacheable_result
+
+
+def test_make_key():
+    """测试缓存键的稳定性"""
+    print("\n" + "=" * 60)
+    print("测试 1: make_key() - 缓存键")
+    print("=" * 60)
+    
+    attachments = [{"name": "a.txt", "content": "附件内容"}]
+    key = LLMCache.make_key("什么是Python?", "历史", attachments, ["m1", "m2"], "m1", 0)
+    
+    # 相同参数生成相同的键
+    assert key == LLMCache.make_key("什么是Python?", "历史", attachments, ["m1", "m2"], "m1", 0)
+    print("✓ 测试用例 1 通过: 相同参数键相同")
+    
+    # 模型顺序、问题首尾空白和大小写不影响键
+    assert key == LLMCache.make_key("  什么是PYTHON?  ", "历史", attachments, ["m2", "m1"], "m1", 0)
+    print("✓ 测试用例 2 通过: 模型顺序和问题大小写不影响键")
+    
+    # 任一参数变化都生成不同的键
+    variants = [
+        LLMCache.make_key("什么是Java?", "历史", attachments, ["m1", "m2"], "m1", 0),
+        LLMCache.make_key("什么是Python?", "其他历史", attachments, ["m1", "m2"], "m1", 0),
+        LLMCache.make_key("什么是Python?", "历史", [{"name": "a.txt", "content": "改过"}], ["m1", "m2"], "m1", 0),
+        LLMCache.make_key("什么是Python?", "历史", None, ["m1", "m2"], "m1", 0),
+        LLMCache.make_key("什么是Python?", "历史", attachments, ["m1"], "m1", 0),
+        LLMCache.make_key("什么是Python?", "历史", attachments, ["m1", "m2"], "m2", 0),
+        LLMCache.make_key("什么是Python?", "历史", attachments, ["m1", "m2"], "m1", 0.7),
+    ]
+    assert key not in variants
+    assert len(set(variants)) == len(variants)
+    print("✓ 测试用例 3 通过: 参数变化时键不同")
+    
+    # 附件名与内容的边界不会混淆
+    key1 = LLMCache.make_key("q", "", [{"name": "ab", "content": "c"}], ["m1"], "m1", 0)
+    key2 = LLMCache.make_key("q", "", [{"name": "a", "content": "bc"}], ["m1"], "m1", 0)
+    assert key1 != key2
+    print("✓ 测试用例 4 通过: 附件字段边界")
+
+
+def test_get_returns_copy():
+    """测试读取结果为深拷贝"""
+    print("\n" + "=" * 60)
+    print("测试 2: get() - 返回深拷贝")
+    print("=" * 60)
+    
+    cache = LLMCache()
+    stage1 = [{"model": "m1", "response": "回答"}]
+    cache.set("k", (stage1, [], {"response": "综合"}, {}))
+    
+    # 写入后修改原对象不影响缓存
+    stage1[0]["response"] = "被修改"
+    cached = cache.get("k")
+    assert cached[0][0]["response"] == "回答"
+    print("✓ 测试用例 1 通过: 写入后修改原对象不影响缓存")
+    
+    # 修改读取结果不影响后续命中
+    cached[0][0]["timestamp"] = "2024-01-01T00:00:00Z"
+    cached[2]["response"] = "被修改"
+    again = cache.get("k")
+    assert "timestamp" not in again[0][0]
+    assert again[2]["response"] == "综合"
+    print("✓ 测试用例 2 通过: 修改命中结果不影响后续命中")
+
+
+def test_ttl_expiry():
+    """测试过期时间"""
+    print("\n" + "=" * 60)
+    print("测试 3: TTL 过期")
+    print("=" * 60)
+    
+    now = [1000.0]
+    original_monotonic = llm_cache_module.time.monotonic
+    llm_cache_module.time.monotonic = lambda: now[0]
+    try:
+        cache = LLMCache(ttl=60)
+        cache.set("k", "value")
+        
+        now[0] += 60
+        assert cache.get("k") == "value"
+        print("✓ 测试用例 1 通过: 有效期内命中")
+        
+        now[0] += 1
+        assert cache.get("k") is None
+        assert "k" not in cache._entries
+        print("✓ 测试用例 2 通过: 过期后未命中并删除条目")
+        
+        # 重新写入会刷新写入时间
+        cache.set("k", "new")
+        now[0] += 30
+        assert cache.get("k") == "new"
+        print("✓ 测试用例 3 通过: 重新写入刷新有效期")
+    finally:
+        llm_cache_module.time.monotonic = original_monotonic
+
+
+def test_lru_eviction():
+    """测试 LRU 淘汰"""
+    print("\n" + "=" * 60)
+    print("测试 4: LRU 淘汰")
+    print("=" * 60)
+    
+    cache = LLMCache(max_size=3)
+    for key in ("a", "b", "c"):
+        cache.set(key, key.upper())
+    
+    # 超出容量时淘汰最早写入的条目
+    cache.set("d", "D")
+    assert cache.get("a") is None
+    assert [cache.get(key) for key in ("b", "c", "d")] == ["B", "C", "D"]
+    print("✓ 测试用例 1 通过: 淘汰最久未使用的条目")
+    
+    # 读取会把条目移到最近使用的位置
+    cache.get("b")
+    cache.set("e", "E")
+    assert cache.get("c") is None
+    assert cache.get("b") == "B"
+    print("✓ 测试用例 2 通过: 读取后条目不会被优先淘汰")
+    
+    # 覆盖写入同一个键不增加条目数
+    cache.set("b", "B2")
+    assert len(cache._entries) == 3
+    assert cache.get("b") == "B2"
+    print("✓ 测试用例 3 通过: 覆盖写入")
+    
+    cache.clear()
+    assert cache.get("b") is None
+    print("✓ 测试用例 4 通过: clear()")
+
+
+def test_is_cacheable_result():
+    """测试只缓存所有阶段都成功的结果"""
+    print("\n" + "=" * 60)
+    print("测试 5: is_cacheable_result() - 可缓存判断")
+    print("=" * 60)
+    
+    stage1 = [{"model": "m1", "response": "回答1"}, {"model": "m2", "response": "回答2"}]
+    stage2 = [{"model": "m1", "scores": {"#2": 8}}, {"model": "m2", "scores": {"#1": 7}}]
+    stage3 = {"response": "综合"}
+    
+    assert is_cacheable_result(stage1, stage2, stage3)
+    print("✓ 测试用例 1 通过: 全部成功时可缓存")
+    
+    assert not is_cacheable_result(stage1, stage2, {"response": "", "error": "失败"})
+    print("✓ 测试用例 2 通过: 主席综合失败时不缓存")
+    
+    assert not is_cacheable_result(stage1 + [{"model": "m3", "error": "请求失败"}], stage2, stage3)
+    assert not is_cacheable_result(stage1 + [{"model": "m3", "timed_out": True}], stage2, stage3)
+    print("✓ 测试用例 3 通过: Stage 1 有模型失败或超时时不缓存")
+    
+    assert not is_cacheable_result(stage1, stage2 + [{"model": "m3", "error": "请求失败"}], stage3)
+    assert not is_cacheable_result(
+        stage1, stage2 + [{"model": "m3", "scores": {}, "error": "timeout", "timed_out": True}], stage3
+    )
+    print("✓ 测试用例 4 通过: Stage 2 有评审失败或超时时不缓存")
+
+
+def main():
+    """运行所有测试"""
+    print("\n" + "=" * 60)
+    print("开始运行 llm_cache.py 测试套件")
+    print("=" * 60)
+    
+    test_make_key()
+    test_get_returns_copy()
+    test_ttl_expiry()
+    test_lru_eviction()
+    test_is_cacheable_result()
+    
+    print("\n" + "=" * 60)
+    print("✅ 所有测试完成!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
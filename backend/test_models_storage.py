@@ -4,6 +4,7 @@
 
 import sys
 import json
+import threading
 from pathlib import Path
 
 # 添加 backend 目录到 Python 路径
@@ -15,7 +16,9 @@ from models import (
 )
 from storage import (
     save_conversation, load_conversation, list_conversations,
-    delete_conversation, generate_conversation_title, ensure_data_directory
+    delete_conversation, generate_conversation_title, ensure_data_directory,
+    append_message, append_assistant_message, update_conversation,
+    LOG_COMPACT_MIN_LINES, _log_path, _read_log
 )
 
 
@@ -75,11 +78,11 @@ def test_models():
     print("\n4. 测试 Stage2Result 模型...")
     stage2 = Stage2Result(
         model="deepseek-chat",
-        ranking="A > B > C",
-        parsed=["A", "B", "C"],
+        scores={"#1": 8, "#2": 9},
+        raw_response="#1: 8分, #2: 9分",
         timestamp=get_iso_timestamp()
     )
-    print(f"✓ Stage2Result 创建成功: {stage2.ranking}")
+    print(f"✓ Stage2Result 创建成功: {stage2.scores}")
     
     # 测试 Stage3Result 模型
     print("\n5. 测试 Stage3Result 模型...")
@@ -227,6 +230,110 @@ def test_storage(conversation):
     print("✓ 测试数据清理完成")
 
 
+def test_append_log():
+    """测试追加日志与快照的合并"""
+    print("\n" + "=" * 60)
+    print("测试追加日志")
+    print("=" * 60)
+    
+    conv_id = "test-conv-log"
+    now = get_iso_timestamp()
+    
+    def make_message(role, content):
+        return {"role": role, "content": content, "timestamp": get_iso_timestamp()}
+    
+    try:
+        save_conversation(conv_id, {
+            "id": conv_id,
+            "title": "日志测试",
+            "created_at": now,
+            "updated_at": now,
+            "messages": [make_message("user", "q1")]
+        })
+        
+        # 追加只写日志，加载时合并
+        print("\n1. 测试 append_message...")
+        append_message(conv_id, make_message("assistant", "a1"), "t-a1")
+        assert _log_path(conv_id).exists()
+        loaded = load_conversation(conv_id)
+        assert [m["content"] for m in loaded["messages"]] == ["q1", "a1"]
+        assert loaded["updated_at"] == "t-a1"
+        listed = next(c for c in list_conversations() if c["id"] == conv_id)
+        assert listed["message_count"] == 2 and listed["updated_at"] == "t-a1"
+        print("✓ 追加的消息在加载和列表中可见")
+        
+        # 加载之后才追加的消息不会被旧快照的保存删掉
+        print("\n2. 测试保存旧快照...")
+        stale = load_conversation(conv_id)
+        append_message(conv_id, make_message("user", "q2"), "t-q2")
+        stale["title"] = "新标题"
+        save_conversation(conv_id, stale)
+        assert len(_read_log(conv_id)) == 1
+        loaded = load_conversation(conv_id)
+        assert loaded["title"] == "新标题"
+        assert [m["content"] for m in loaded["messages"]] == ["q1", "a1", "q2"]
+        print("✓ 快照之后追加的消息被保留")
+        
+        # 已合并进快照的日志条目不会在删除消息后复活
+        print("\n3. 测试删除消息...")
+        update_conversation(conv_id, lambda conv: conv["messages"].pop())
+        loaded = load_conversation(conv_id)
+        assert [m["content"] for m in loaded["messages"]] == ["q1", "a1"]
+        assert not _log_path(conv_id).exists()
+        print("✓ 删除的消息不会从日志中恢复")
+        
+        # append_assistant_message 不重复追加助手消息
+        print("\n4. 测试 append_assistant_message...")
+        conversation, appended = append_assistant_message(conv_id, make_message("assistant", "重复"))
+        assert not appended and len(conversation["messages"]) == 2
+        append_message(conv_id, make_message("user", "q3"), "t-q3")
+        conversation, appended = append_assistant_message(conv_id, make_message("assistant", "a3"), title="忽略")
+        assert appended
+        loaded = load_conversation(conv_id)
+        assert [m["content"] for m in loaded["messages"]] == ["q1", "a1", "q3", "a3"]
+        assert loaded["title"] == "新标题"
+        assert append_assistant_message("non-existent-id", make_message("assistant", "x")) == (None, False)
+        print("✓ 只在最后一条不是助手消息时追加")
+        
+        # 并发追加不丢消息
+        print("\n5. 测试并发追加...")
+        threads = [
+            threading.Thread(
+                target=lambda i=i: [append_message(conv_id, make_message("user", f"c{i}-{j}"), now) for j in range(5)]
+            )
+            for i in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        loaded = load_conversation(conv_id)
+        assert len(loaded["messages"]) == 4 + 20
+        print("✓ 并发追加的消息全部保留")
+        
+        # 日志过长时加载会合并回快照
+        print("\n6. 测试日志合并...")
+        snapshot_count = len(loaded["messages"])
+        extra = max(LOG_COMPACT_MIN_LINES, snapshot_count) + 1
+        for i in range(extra):
+            append_message(conv_id, make_message("user", f"m{i}"), now)
+        loaded = load_conversation(conv_id)
+        assert not _log_path(conv_id).exists()
+        assert load_conversation(conv_id)["messages"] == loaded["messages"]
+        assert len(loaded["messages"]) == snapshot_count + extra
+        print("✓ 日志合并回快照")
+        
+        # 删除对话同时删除日志
+        print("\n7. 测试删除对话...")
+        append_message(conv_id, make_message("user", "last"), now)
+        assert delete_conversation(conv_id)
+        assert not _log_path(conv_id).exists()
+        assert load_conversation(conv_id) is None
+        print("✓ 日志随对话一起删除")
+    finally:
+        delete_conversation(conv_id)
+
+
 def test_edge_cases():
     """测试边界情况"""
     print("\n" + "=" * 60)
@@ -308,6 +415,9 @@ def main():
         # 测试数据模型
         conversation = test_models()
         
+        # 测试追加日志
+        test_append_log()
+        
         # 测试存储层
         test_storage(conversation)
         